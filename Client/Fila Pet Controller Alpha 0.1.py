@@ -1,18 +1,53 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
-import serial
-import threading
-import platform
-from serial.tools import list_ports
-import ctypes
 import sys
 import os
 
+# Módulos compartilhados com o cliente Android ficam na raiz do repositório
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# Antes de qualquer outra importação: marca o início e, se pedido, mede as importações
+from filabottle.partida import perfil
+if "--profile-startup" in sys.argv:
+    perfil.instalar()
+
+# pyserial, NumPy (gravação), ctypes e winreg só são importados por quem usa
+import argparse
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk, messagebox
+from filabottle.anomalias import EMERGENCIA, Detector
+from filabottle.binario import BAUD_TEXTO, ProtocoloAutomatico
+from filabottle.captura import abrir_porta, nova_captura
+from filabottle.comandos import FilaComandos
+from filabottle.conexao import ENDERECO_PADRAO, ConexaoServico, ParserAssinante, e_servico
+from filabottle.descoberta import Descoberta, Reconexao
+from filabottle.grafico import HistoricoGrafico, quadro
+from filabottle.metricas import Pipeline
+from filabottle.perfis import Configurador, Perfis, descrever
+from filabottle.tela import COR_HEX, Tela, indice_cor
+
+# Onde ficam as gravações da telemetria
+DIRETORIO_GRAVACOES = os.path.join(os.path.expanduser("~"), "FilaBottle", "gravacoes")
+# Perfis de material versionados (python -m filabottle.perfis)
+CAMINHO_PERFIS = os.path.join(os.path.expanduser("~"), "FilaBottle", "perfis.json")
+
 # Configurações iniciais
 temperatura = 0.0
 porta_serial = None
 arduino = None
+leitor = None
+gravador = None
+gravacao_disponivel = True
+# Bytes crus da serial (--captura), para reproduzir depois com replay:arquivo.fbcap
+captura = None
 leitura_ativa = True
+sair_apos_leitura = False
+# Contadores e tempos de cada etapa (Prometheus com --metricas; F12 mostra na tela)
+metricas = Pipeline()
+depuracao = False
+tique = 0
+# Dispositivo conectado (VID/PID/série) para reencontrá-lo se o cabo cair
+dispositivo = None
+reconexao = Reconexao()
 
 # Valores de controle
 velocidade_motor = 40  # mm/s
@@ -20,58 +55,425 @@ temp_min_motor = 180.0
 temperatura_minima = 245.0
 temperatura_maxima = 260.0
 
-# Função para encontrar portas seriais
+# A varredura de portas é lenta com muitos dispositivos USB: roda numa thread própria
+# (iniciada no main)
+descoberta = Descoberta()
+versao_portas = None
+
+# Função para encontrar portas seriais (lê o cache da descoberta, não bloqueia)
 def listar_portas():
-    return [port.device for port in list_ports.comports()]
+    # A última opção é o serviço (python -m filabottle.servico), que pode ser dono da porta
+    return descoberta.nomes() + [ENDERECO_PADRAO]
+
+# Buffer circular de amostras (um produtor: a thread de leitura; um consumidor: o Tk).
+# O produtor grava no slot e só depois avança o contador, então o leitor nunca
+# precisa de lock: basta conferir o contador antes e depois de copiar.
+class BufferCircular:
+    def __init__(self, capacidade=1024):
+        self.capacidade = capacidade
+        self._itens = [None] * capacidade
+        self._escritos = 0
+
+    @property
+    def recebidas(self):
+        return self._escritos
+
+    def inserir(self, item):
+        self._itens[self._escritos % self.capacidade] = item
+        self._escritos += 1
+
+    def ultimo(self):
+        n = self._escritos
+        if n == 0:
+            return None
+        return self._itens[(n - 1) % self.capacidade]
+
+    def ler_desde(self, seq):
+        """Retorna (itens, nova_seq, perdidos) com tudo que chegou depois de seq."""
+        n = self._escritos
+        inicio = max(seq, n - self.capacidade)
+        itens = [self._itens[i % self.capacidade] for i in range(inicio, n)]
+        # Se o produtor deu a volta enquanto copiávamos, os primeiros itens
+        # podem ter sido sobrescritos: descarta os que não são mais válidos.
+        # O +1 é o slot que o produtor pode estar gravando agora: o item
+        # _escritos ainda não foi contado, mas o seu slot (o de _escritos -
+        # capacidade) já pode ter o valor novo.
+        # (Se deu mais de uma volta, tudo que foi copiado se perdeu, mas só até n.)
+        validos_desde = min(self._escritos - self.capacidade + 1, n)
+        if validos_desde > inicio:
+            itens = itens[validos_desde - inicio:]
+            inicio = validos_desde
+        return itens, n, inicio - seq
+
+
+# Thread que lê a serial em blocos e alimenta o buffer circular
+class LeitorSerial(threading.Thread):
+    def __init__(self, porta, buffer, parser, gravar=False):
+        super().__init__(daemon=True)
+        self.porta = porta
+        self.buffer = buffer
+        self.parser = parser
+        self.gravar = gravar
+        self.caiu = False
+        self._parar = threading.Event()
+
+    @property
+    def falhas(self):
+        return self.parser.falhas
+
+    def parar(self):
+        self._parar.set()
+
+    def run(self):
+        while not self._parar.is_set():
+            try:
+                # Bloqueia até o timeout por 1 byte e depois pega tudo que já chegou
+                esperando = self.porta.in_waiting
+                inicio = time.perf_counter()
+                dados = self.porta.read(max(1, esperando))
+                # Só mede a leitura do que já estava lá: o read de 1 byte bloqueia à espera do Arduino
+                if esperando:
+                    metricas.leitura.observar(time.perf_counter() - inicio)
+            except Exception as e:
+                print("Erro na leitura:", e)
+                metricas.erro("leitura")
+                self.caiu = True  # o Tk percebe e reconecta
+                break
+            # Chamado mesmo sem dados para a negociação poder expirar
+            lote = metricas.alimentar(self.parser, dados)
+            for amostra in lote:
+                self.buffer.inserir(amostra)
+            if self.gravar and lote:
+                # Só depois do lote já estar no buffer: importar o NumPy não atrasa a tela
+                try:
+                    g = obter_gravador()
+                    if g:
+                        # O dialeto de texto não traz os ajustes: grava os da tela
+                        g.anexar(lote, velocidade=velocidade_motor,
+                                 temp_alvo=temperatura_maxima, temp_motor=temp_min_motor)
+                except Exception as e:  # disco cheio etc.: perde a gravação, não a leitura
+                    print("Erro na gravação:", e)
+                    metricas.erro("gravacao")
+
+# A gravação (e o NumPy) só é criada quando chega a primeira amostra
+def obter_gravador():
+    global gravador, gravacao_disponivel
+    if gravador is None and gravacao_disponivel:
+        try:
+            from filabottle.gravador import Gravador
+        except ImportError:  # sem NumPy o controlador funciona, só não grava
+            gravacao_disponivel = False
+            return None
+        try:
+            gravador = Gravador(DIRETORIO_GRAVACOES)
+        except OSError:  # sem diretório: não tenta de novo a cada leitura
+            gravacao_disponivel = False
+            raise
+    return gravador
+
+amostras = BufferCircular()
+seq_lida = 0
+perdidas = 0
+historico = HistoricoGrafico()
+# Último estado desenhado: o tique só toca nos widgets cujo texto ou cor mudou
+tela = Tela()
+# Cliques repetidos em Aplicar viram um único CFG com os valores mais novos
+fila_comandos = FilaComandos(lambda linha: arduino.write((linha + "\n").encode()))
+metricas.comandos(fila_comandos)
+perfis = None
+
+# Cada troca de configuração (com o RTT) vai para o terminal, as métricas e a gravação
+def registrar_troca(troca):
+    print("Troca:", descrever(troca))
+    metricas.troca_config(troca)
+    if gravador:
+        gravador.anotar_troca(troca)
+    if troca.rtt is None:
+        status_label.config(text=f"❌ {descrever(troca)}", fg="red")
+    else:
+        status_label.config(text=f"✔ {descrever(troca)}", fg="green")
+
+# Só o que difere do último estado do Arduino sai, num único CFG
+configurador = Configurador(fila_comandos, ao_concluir=registrar_troca)
+# Disparo térmico, termistor solto, oscilação... Emergência desliga o sistema (--sem-desligar evita)
+detector = Detector(desligar=lambda: fila_comandos.enviar("SET_STATE", "SET_STATE,OFF"))
+# Experimento de relé ou PID no host (filabottle.autoajuste); None = histerese do firmware
+autoajuste = None
+ganhos_ajustados = None
+
+# Para a leitura e fecha a porta e a gravação atuais
+def desconectar():
+    global arduino, leitor, gravador
+    reconexao.cancelar()
+    if leitor:
+        leitor.parar()
+        leitor.join(timeout=2)
+        leitor = None
+    if gravador:
+        gravador.fechar()
+        gravador = None
+    if arduino and arduino.is_open:
+        arduino.close()
+
+# Abre a porta e começa a ler; numa reconexão a gravação atual continua
+def abrir(porta):
+    global arduino, leitor
+    if e_servico(porta):
+        # O serviço é dono da serial e da gravação; aqui só assinamos a telemetria
+        arduino = ConexaoServico(porta)
+        parser = ParserAssinante()
+    else:
+        arduino = abrir_porta(porta, BAUD_TEXTO, timeout=1, captura=captura)
+        # Tenta o modo binário e cai para texto se o firmware não responder
+        parser = ProtocoloAutomatico(arduino)
+    leitor = LeitorSerial(arduino, amostras, parser, gravar=not e_servico(porta))
+    leitor.start()
 
 # Conectar com a porta selecionada
 def conectar():
-    global arduino, porta_serial
+    global porta_serial, dispositivo
     porta_serial = porta_var.get()
-    if arduino and arduino.is_open:
-        arduino.close()
+    desconectar()
+    fila_comandos.limpar()
+    configurador.esquecer()
+    encerrar_autoajuste(avisar=False)  # o UNO reinicia ao abrir a porta: volta à histerese
+    detector.rearmar()  # o UNO reinicia ao abrir a porta: volta ligado
+    dispositivo = descoberta.identidade(porta_serial)
     try:
-        arduino = serial.Serial(porta_serial, 9600, timeout=1)
+        abrir(porta_serial)
+        perfil.marcar("conectado")
     except Exception as e:
         print("Erro ao conectar:", e)
-
-# Enviar configurações para o Arduino
-def aplicar_configuracoes():
-    global velocidade_motor, temperatura_maxima, temp_min_motor
+        metricas.erro("conexao")
+
+# Chamado pelo atualizar_display: percebe a queda e tenta de novo com espera exponencial
+def reconectar():
+    global arduino, leitor, porta_serial
+    agora = time.monotonic()
+    if leitor and leitor.caiu:
+        leitor = None
+        arduino.close()
+        reconexao.iniciar(agora)
+    if not reconexao.pronta(agora):
+        return
+    # O Arduino pode voltar com outro nome (COM3 -> COM5): procura pelo VID/PID/série
+    porta = porta_serial if e_servico(porta_serial) else descoberta.localizar(dispositivo, porta_serial)
+    try:
+        if porta is None:
+            raise OSError("dispositivo ausente")
+        abrir(porta)
+    except Exception:
+        reconexao.falhou(agora)
+        descoberta.atualizar()
+        return
+    porta_serial = porta
+    porta_var.set(porta)
+    fila_comandos.limpar()
+    configurador.esquecer()
+    detector.reconectou()
+    duracao = reconexao.conseguiu()
+    if gravador:
+        gravador.anotar_queda(reconexao.inicio, duracao)
+    print(f"Reconectado a {porta} em {duracao:.1f} s")
+
+# Fechar a janela grava o que falta antes de sair
+def ao_fechar():
+    desconectar()
+    if captura:
+        captura.fechar()
+    descoberta.parar()
+    root.destroy()
+
+# Enviar configurações para o Arduino (a confirmação chega no registrar_troca)
+def aplicar_configuracoes(nome="manual", versao=None):
     try:
         if arduino and arduino.is_open:
-            comando = f"SET,{velocidade_motor},{temperatura_maxima},{temp_min_motor}\n"
-            arduino.write(comando.encode())
-            status_label.config(text="✔ Configurações aplicadas com sucesso!", fg="green")
+            alterados = configurador.aplicar({"velocidade": velocidade_motor, "temp_alvo": temperatura_maxima,
+                                              "temp_motor": temp_min_motor}, perfil=nome, versao=versao)
+            if autoajuste:
+                autoajuste.alvo = temperatura_maxima
+            if alterados:
+                status_label.config(text=f"Enviando {', '.join(alterados)}...", fg="orange")
+            else:
+                status_label.config(text="✔ O Arduino já está com esses valores", fg="green")
         else:
             status_label.config(text="❌ Porta serial não conectada!", fg="red")
-    except ValueError:
-        messagebox.showerror("Erro", "Certifique-se de que todos os campos estão preenchidos corretamente.")
+    except ValueError as e:
+        messagebox.showerror("Erro", f"Valor fora da faixa do firmware: {e}")
         status_label.config(text="❌ Erro ao aplicar configurações.", fg="red")
 
     root.after(5000, lambda: status_label.config(text=""))
 
+# Carrega o perfil escolhido nos controles e aplica
+def usar_perfil():
+    global velocidade_motor, temperatura_maxima, temp_min_motor
+    nome = perfil_var.get()
+    if not nome:
+        return
+    try:
+        escolhido = perfis.obter(nome)
+    except (KeyError, ValueError) as e:  # nome digitado que não existe, ou "NOME@x"
+        status_label.config(text=f"❌ Perfil {nome} não encontrado ({e})", fg="red")
+        return
+    velocidade_motor = escolhido.parametros["velocidade"]
+    temperatura_maxima = escolhido.parametros["temp_alvo"]
+    temp_min_motor = escolhido.parametros["temp_motor"]
+    vel_label.config(text=f"{velocidade_motor:g}")
+    temp_maxima_label.config(text=f"{temperatura_maxima:.0f}")
+    min_label.config(text=f"{temp_min_motor:.0f}")
+    aplicar_configuracoes(escolhido.nome, escolhido.versao)
+
+# Os valores dos controles viram uma versão nova do perfil escolhido
+def salvar_perfil():
+    nome = perfil_var.get().strip()
+    if not nome:
+        return
+    salvo = perfis.salvar(nome, {"velocidade": velocidade_motor, "temp_alvo": temperatura_maxima,
+                                 "temp_motor": temp_min_motor})
+    perfil_menu.config(values=perfis.nomes())
+    status_label.config(text=f"✔ Perfil {salvo.nome} v{salvo.versao} salvo", fg="green")
+
+# Autoajuste: experimento de relé -> ganhos propostos -> PID no host -> volta à histerese
+def alternar_autoajuste():
+    global autoajuste
+    if autoajuste:
+        encerrar_autoajuste()
+        return
+    if not (arduino and arduino.is_open):
+        status_label.config(text="❌ Porta serial não conectada!", fg="red")
+        return
+    from filabottle.autoajuste import ControlePID, ExperimentoRele  # NumPy só aqui
+    if ganhos_ajustados is None:
+        autoajuste = ExperimentoRele(enviar_aquecedor, temperatura_maxima)
+        autoajuste_btn.config(text="Parar autoajuste")
+    else:
+        autoajuste = ControlePID(enviar_aquecedor, temperatura_maxima, ganhos_ajustados)
+        autoajuste_btn.config(text="Parar PID")
+
+def enviar_aquecedor(linha):
+    fila_comandos.enviar("SET_HEATER", linha, rastrear=False)
+
+def encerrar_autoajuste(avisar=True):
+    global autoajuste
+    if autoajuste and avisar:
+        autoajuste.parar()
+    autoajuste = None
+    autoajuste_btn.config(text="Autoajuste" if ganhos_ajustados is None else "Ligar PID")
+
+# Chamado pelo atualizar_display com as amostras novas
+def avancar_autoajuste(novas, alarmes):
+    global autoajuste, ganhos_ajustados
+    if any(alarme.gravidade == EMERGENCIA for alarme in alarmes):
+        encerrar_autoajuste()
+        return
+    autoajuste.alimentar(novas, time.monotonic())
+    if not autoajuste.terminou:
+        return
+    from filabottle.autoajuste import relatorio
+    try:
+        resultado = autoajuste.resultado()
+    except ValueError as e:
+        status_label.config(text=f"❌ Autoajuste: {e}", fg="red")
+    else:
+        print(relatorio(resultado, autoajuste.alvo))
+        ganhos_ajustados = resultado["ganhos"]
+        m = resultado["modelo"]
+        status_label.config(text=f"✔ Autoajuste: tau {m.tau:.0f} s, tempo morto {m.atraso:.0f} s. Ligar PID?",
+                            fg="green")
+    encerrar_autoajuste(avisar=False)
+
+# Alarme novo: vai para o terminal, para as métricas e para a tela
+def mostrar_alarme(alarme):
+    print("Alarme:", alarme.mensagem)
+    metricas.alarme(alarme.tipo)
+    status_label.config(text=alarme.mensagem, fg="red" if alarme.gravidade == EMERGENCIA else "orange")
+
 # Atualizar exibição da temperatura e status do motor
 def atualizar_display():
+    global seq_lida, perdidas, versao_portas, tique
+    inicio = time.perf_counter()
     try:
-        if arduino and arduino.in_waiting:
-            linha = arduino.readline().decode().strip()
-            if linha.startswith("Temperatura:"):
-                valor = float(linha.split(":")[1].strip().replace(" °C", ""))
-                cor = "#00FF00"  # verde
-                if valor > 36:
-                    intensidade = min(int((valor - 36) * 4), 255)
-                    cor = f"#{intensidade:02x}{(255-intensidade):02x}00"
-                temperatura_var.set(f"{valor:.2f} °C")
-                display.config(fg=cor)
-
-                if valor >= temp_min_motor:
-                    motor_status_var.set(f"{velocidade_motor:.2f} mm/s")
-                else:
-                    motor_status_var.set("OFF")
+        if descoberta.versao != versao_portas:
+            versao_portas = descoberta.versao
+            porta_menu.config(values=listar_portas())
+        reconectar()
+        # Todas as amostras novas vão para o gráfico; o display só mostra a mais nova
+        novas, seq_lida, perdidos_agora = amostras.ler_desde(seq_lida)
+        perdidas += perdidos_agora
+        for nova in novas:
+            motor = nova.motor if nova.motor is not None else nova.temperatura >= temp_min_motor
+            historico.anexar(nova.instante, nova.temperatura, motor)
+        # Todas as amostras passam pelo detector aqui, fora da thread de leitura
+        alarmes = detector.alimentar(novas, temp_alvo=temperatura_maxima,
+                                     aquecedor=autoajuste.ligado if autoajuste else None)
+        if leitor and not leitor.caiu:
+            alarmes += detector.verificar(time.monotonic())
+        for alarme in alarmes:
+            mostrar_alarme(alarme)
+        if autoajuste:
+            avancar_autoajuste(novas, alarmes)
+        if novas and perfil.marcar("primeira temperatura") and perfil.ativo:
+            perfil.desinstalar()
+            print(perfil.relatorio())
+            if sair_apos_leitura:
+                root.after(0, ao_fechar)
+        if novas:
+            inicio_grafico = time.perf_counter()
+            redesenhar_grafico()
+            metricas.grafico.observar(time.perf_counter() - inicio_grafico)
+        if leitor:
+            configurador.observar(novas)
+            fila_comandos.observar(novas, leitor.parser.confirmacoes)
+            fila_comandos.bombear()
+        amostra = amostras.ultimo()
+        if amostra is not None:
+            valor = amostra.temperatura
+            tela.definir("temperatura", f"{valor:.2f} °C", temperatura_var.set)
+            tela.definir("cor", indice_cor(valor), pintar_display)  # verde -> vermelho
+            tela.definir("motor", f"{velocidade_motor:.2f} mm/s" if valor >= temp_min_motor else "OFF",
+                         motor_status_var.set)
+        tela.definir("contadores",
+                     f"Amostras: {amostras.recebidas}  Perdidas: {perdidas}\n{fila_comandos.resumo()}\n"
+                     f"{reconexao.resumo()}" + (f"\n⚠ {detector.resumo()}" if detector.ativos else "")
+                     + (f"\n{autoajuste.progresso}" if autoajuste else ""), contadores_var.set)
+        # Todas as mudanças do tique de uma vez
+        tela.desenhar()
+        if novas:
+            metricas.exibida(novas[-1])
+        tique += 1
+        if depuracao and tique % 5 == 0:  # 1 vez por segundo
+            depuracao_var.set(metricas.resumo())
+        metricas.ui.observar(time.perf_counter() - inicio)
     except Exception as e:
         print("Erro na leitura:", e)
-    root.after(500, atualizar_display)
+        metricas.erro("ui")
+    root.after(200, atualizar_display)  # no máximo 5 quadros/s
+
+def pintar_display(indice):
+    display.config(fg=COR_HEX[indice])
+
+# Redesenhar o gráfico: só atualiza as coordenadas dos itens que já existem
+def redesenhar_grafico():
+    q = quadro(historico, grafico.winfo_width(), grafico.winfo_height(),
+               (temperatura_minima, temperatura_maxima))
+    if q is None:
+        return
+    y_min, y_max = q["faixa"]
+    grafico.coords(grafico_faixa, 0, y_max, grafico.winfo_width(), y_min)
+    if len(q["temperatura"]) >= 4:
+        grafico.coords(grafico_temperatura, *q["temperatura"])
+    grafico.coords(grafico_motor, *q["motor"])
+
+# F12 liga/desliga a sobreposição com as métricas do caminho serial -> tela
+def alternar_depuracao(event=None):
+    global depuracao
+    depuracao = not depuracao
+    if depuracao:
+        depuracao_var.set(metricas.resumo())
+        depuracao_label.place(x=0, rely=1.0, anchor="sw")
+        depuracao_label.lift()
+    else:
+        depuracao_label.place_forget()
 
 # Função de ajuste de valores com suporte a pressionar e segurar
 class BotaoPressionado:
@@ -95,16 +497,6 @@ class BotaoPressionado:
             alterar_valor(self.tipo, self.delta)
             root.after(100, self.repeat)
 
-# Construção da interface
-root = tk.Tk()
-root.title("Fila Pet Controller Alpha 0.1")
-root.geometry("320x500")
-
-# Configurar ícone da janela
-icon_path = r"C:\\Users\\luana\\Downloads\\Fila Pet Controller\\FilaPetController.ico"
-if os.path.exists(icon_path):
-    root.iconbitmap(icon_path)
-
 # Detectar e aplicar tema do sistema (escuro ou claro) no Windows
 def is_dark_mode_windows():
     try:
@@ -118,101 +510,12 @@ def is_dark_mode_windows():
     except Exception:
         return False  # padrão: claro
 
-modo_escuro = is_dark_mode_windows()
-
-# Aplicar cores com base no tema
-tema_sistema = "clam"
-if platform.system() == "Windows":
-    tema_sistema = "vista"
-
-style = ttk.Style()
-style.theme_use(tema_sistema)
-
-bg_color = "#1e1e1e" if modo_escuro else "SystemButtonFace"
-fg_color = "white" if modo_escuro else "black"
-
-root.configure(bg=bg_color)
-
-# Tentar alterar a barra de título para escura (Windows 10+)
-if modo_escuro and sys.platform == "win32":
-    try:
-        HWND = ctypes.windll.user32.GetParent(root.winfo_id())
-        DWMWA_USE_IMMERSIVE_DARK_MODE = 20
-        ctypes.windll.dwmapi.DwmSetWindowAttribute(HWND, DWMWA_USE_IMMERSIVE_DARK_MODE, ctypes.byref(ctypes.c_int(1)), ctypes.sizeof(ctypes.c_int(1)))
-    except Exception:
-        pass
-
-# Porta Serial
-porta_var = tk.StringVar(value="Selecione a porta")
-porta_menu = ttk.Combobox(root, textvariable=porta_var, values=listar_portas(), state="readonly")
-porta_menu.pack(pady=10)
-conectar_btn = ttk.Button(root, text="Conectar", command=conectar)
-conectar_btn.pack(pady=5)
-
-# Display de temperatura
-temperatura_var = tk.StringVar(value="--.-- °C")
-display = tk.Label(root, textvariable=temperatura_var, font=("Courier", 32, "bold"), bg="black", fg="green", width=12)
-display.pack(pady=20)
-
-# Display status do motor
-motor_status_var = tk.StringVar(value="OFF")
-motor_status_label = tk.Label(root, textvariable=motor_status_var, font=("Courier", 20, "bold"), bg="black", fg="blue", width=12)
-motor_status_label.pack(pady=(0, 20))
-
-# Controles de velocidade
-frame_vel = tk.LabelFrame(root, text="Velocidade", bg=bg_color, fg=fg_color)
-frame_vel.pack(pady=5)
-vel_btn_menos = tk.Button(frame_vel, text="-", width=4)
-vel_btn_menos.pack(side=tk.LEFT, padx=5)
-vel_label = tk.Label(frame_vel, text=f"{velocidade_motor}", width=5, bg=bg_color, fg=fg_color)
-vel_label.pack(side=tk.LEFT)
-vel_btn_mais = tk.Button(frame_vel, text="+", width=4)
-vel_btn_mais.pack(side=tk.LEFT, padx=5)
-
-# Controles de temperatura de acionamento do motor
-frame_motor = tk.LabelFrame(root, text="Motor Ativa em C°", bg=bg_color, fg=fg_color)
-frame_motor.pack(pady=5)
-motor_btn_menos = tk.Button(frame_motor, text="-", width=4)
-motor_btn_menos.pack(side=tk.LEFT, padx=5)
-min_label = tk.Label(frame_motor, text=f"{temp_min_motor:.0f}", width=5, bg=bg_color, fg=fg_color)
-min_label.pack(side=tk.LEFT)
-motor_btn_mais = tk.Button(frame_motor, text="+", width=4)
-motor_btn_mais.pack(side=tk.LEFT, padx=5)
-
-# Controles de temperatura mínima
-frame_temp_min = tk.LabelFrame(root, text="Temperatura Mínima C°", bg=bg_color, fg=fg_color)
-frame_temp_min.pack(pady=5)
-temp_min_btn_menos = tk.Button(frame_temp_min, text="-", width=4)
-temp_min_btn_menos.pack(side=tk.LEFT, padx=5)
-temp_minima_label = tk.Label(frame_temp_min, text=f"{temperatura_minima:.0f}", width=5, bg=bg_color, fg=fg_color)
-temp_minima_label.pack(side=tk.LEFT)
-temp_min_btn_mais = tk.Button(frame_temp_min, text="+", width=4)
-temp_min_btn_mais.pack(side=tk.LEFT, padx=5)
-
-# Controles de temperatura máxima
-frame_temp_max = tk.LabelFrame(root, text="Temperatura Máxima C°", bg=bg_color, fg=fg_color)
-frame_temp_max.pack(pady=5)
-temp_max_btn_menos = tk.Button(frame_temp_max, text="-", width=4)
-temp_max_btn_menos.pack(side=tk.LEFT, padx=5)
-temp_maxima_label = tk.Label(frame_temp_max, text=f"{temperatura_maxima:.0f}", width=5, bg=bg_color, fg=fg_color)
-temp_maxima_label.pack(side=tk.LEFT)
-temp_max_btn_mais = tk.Button(frame_temp_max, text="+", width=4)
-temp_max_btn_mais.pack(side=tk.LEFT, padx=5)
-
-# Botão aplicar
-aplicar_btn = ttk.Button(root, text="Aplicar", command=aplicar_configuracoes)
-aplicar_btn.pack(pady=10)
-
-# Status de aplicação
-status_label = tk.Label(root, text="", fg="green", font=("Arial", 10))
-status_label.pack(pady=(10, 0))
-
 # Função de ajuste de valores
 def alterar_valor(tipo, delta):
     global velocidade_motor, temp_min_motor, temperatura_minima, temperatura_maxima
     if tipo == "vel":
         velocidade_motor = max(0, min(velocidade_motor + delta, 100))
-        vel_label.config(text=f"{velocidade_motor}")
+        vel_label.config(text=f"{velocidade_motor:g}")
     elif tipo == "min":
         temp_min_motor = max(0, min(temp_min_motor + delta, 250))
         min_label.config(text=f"{temp_min_motor:.0f}")
@@ -223,16 +526,197 @@ def alterar_valor(tipo, delta):
         temperatura_maxima = max(0, min(temperatura_maxima + delta, 300))
         temp_maxima_label.config(text=f"{temperatura_maxima:.0f}")
 
-# Aplicando comportamento pressionar e segurar
-BotaoPressionado(vel_btn_menos, "vel", -1)
-BotaoPressionado(vel_btn_mais, "vel", 1)
-BotaoPressionado(motor_btn_menos, "min", -1)
-BotaoPressionado(motor_btn_mais, "min", 1)
-BotaoPressionado(temp_min_btn_menos, "temp_minima", -1)
-BotaoPressionado(temp_min_btn_mais, "temp_minima", 1)
-BotaoPressionado(temp_max_btn_menos, "temp_maxima", -1)
-BotaoPressionado(temp_max_btn_mais, "temp_maxima", 1)
-
-# Iniciar leitura
-atualizar_display()
-root.mainloop()
+# Construção da interface (os widgets que as funções acima usam ficam globais)
+def construir_interface():
+    global root, porta_var, porta_menu, temperatura_var, display, motor_status_var, contadores_var
+    global grafico, grafico_faixa, grafico_temperatura, grafico_motor, status_label
+    global vel_label, min_label, temp_minima_label, temp_maxima_label, depuracao_var, depuracao_label
+    global autoajuste_btn, perfil_var, perfil_menu
+    root = tk.Tk()
+    root.title("Fila Pet Controller Alpha 0.1")
+    root.geometry("320x660")
+
+    # Configurar ícone da janela
+    icon_path = r"C:\\Users\\luana\\Downloads\\Fila Pet Controller\\FilaPetController.ico"
+    if os.path.exists(icon_path):
+        root.iconbitmap(icon_path)
+
+    modo_escuro = is_dark_mode_windows()
+
+    # Aplicar cores com base no tema
+    tema_sistema = "clam"
+    if sys.platform == "win32":
+        tema_sistema = "vista"
+
+    style = ttk.Style()
+    style.theme_use(tema_sistema)
+
+    bg_color = "#1e1e1e" if modo_escuro else "SystemButtonFace"
+    fg_color = "white" if modo_escuro else "black"
+
+    root.configure(bg=bg_color)
+
+    # Tentar alterar a barra de título para escura (Windows 10+)
+    if modo_escuro and sys.platform == "win32":
+        try:
+            import ctypes
+            HWND = ctypes.windll.user32.GetParent(root.winfo_id())
+            DWMWA_USE_IMMERSIVE_DARK_MODE = 20
+            ctypes.windll.dwmapi.DwmSetWindowAttribute(HWND, DWMWA_USE_IMMERSIVE_DARK_MODE, ctypes.byref(ctypes.c_int(1)), ctypes.sizeof(ctypes.c_int(1)))
+        except Exception:
+            pass
+
+    # Porta Serial
+    porta_var = tk.StringVar(value="Selecione a porta")
+    porta_menu = ttk.Combobox(root, textvariable=porta_var, values=listar_portas(), state="readonly")
+    porta_menu.pack(pady=10)
+    conectar_btn = ttk.Button(root, text="Conectar", command=conectar)
+    conectar_btn.pack(pady=5)
+
+    # Display de temperatura
+    temperatura_var = tk.StringVar(value="--.-- °C")
+    display = tk.Label(root, textvariable=temperatura_var, font=("Courier", 32, "bold"), bg="black", fg="green", width=12)
+    display.pack(pady=20)
+
+    # Display status do motor
+    motor_status_var = tk.StringVar(value="OFF")
+    motor_status_label = tk.Label(root, textvariable=motor_status_var, font=("Courier", 20, "bold"), bg="black", fg="blue", width=12)
+    motor_status_label.pack(pady=(0, 20))
+
+    # Gráfico: faixa de histerese, temperatura e motor ligado (linha azul na base)
+    grafico = tk.Canvas(root, width=300, height=120, bg="black", highlightthickness=0)
+    grafico.pack(pady=(0, 5))
+    grafico_faixa = grafico.create_rectangle(0, 0, 0, 0, fill="#333333", outline="")
+    grafico_temperatura = grafico.create_line(0, 0, 0, 0, fill="orange", width=1)
+    grafico_motor = grafico.create_line(0, 0, 0, 0, fill="#3399ff", width=1)
+
+    # Contadores de amostras recebidas e perdidas
+    contadores_var = tk.StringVar(value=f"Amostras: 0  Perdidas: 0\n{fila_comandos.resumo()}\n{reconexao.resumo()}")
+    contadores_label = tk.Label(root, textvariable=contadores_var, bg=bg_color, fg=fg_color, font=("Arial", 8),
+                                wraplength=300)
+    contadores_label.pack(pady=(0, 5))
+
+    # Controles de velocidade
+    frame_vel = tk.LabelFrame(root, text="Velocidade", bg=bg_color, fg=fg_color)
+    frame_vel.pack(pady=5)
+    vel_btn_menos = tk.Button(frame_vel, text="-", width=4)
+    vel_btn_menos.pack(side=tk.LEFT, padx=5)
+    vel_label = tk.Label(frame_vel, text=f"{velocidade_motor}", width=5, bg=bg_color, fg=fg_color)
+    vel_label.pack(side=tk.LEFT)
+    vel_btn_mais = tk.Button(frame_vel, text="+", width=4)
+    vel_btn_mais.pack(side=tk.LEFT, padx=5)
+
+    # Controles de temperatura de acionamento do motor
+    frame_motor = tk.LabelFrame(root, text="Motor Ativa em C°", bg=bg_color, fg=fg_color)
+    frame_motor.pack(pady=5)
+    motor_btn_menos = tk.Button(frame_motor, text="-", width=4)
+    motor_btn_menos.pack(side=tk.LEFT, padx=5)
+    min_label = tk.Label(frame_motor, text=f"{temp_min_motor:.0f}", width=5, bg=bg_color, fg=fg_color)
+    min_label.pack(side=tk.LEFT)
+    motor_btn_mais = tk.Button(frame_motor, text="+", width=4)
+    motor_btn_mais.pack(side=tk.LEFT, padx=5)
+
+    # Controles de temperatura mínima
+    frame_temp_min = tk.LabelFrame(root, text="Temperatura Mínima C°", bg=bg_color, fg=fg_color)
+    frame_temp_min.pack(pady=5)
+    temp_min_btn_menos = tk.Button(frame_temp_min, text="-", width=4)
+    temp_min_btn_menos.pack(side=tk.LEFT, padx=5)
+    temp_minima_label = tk.Label(frame_temp_min, text=f"{temperatura_minima:.0f}", width=5, bg=bg_color, fg=fg_color)
+    temp_minima_label.pack(side=tk.LEFT)
+    temp_min_btn_mais = tk.Button(frame_temp_min, text="+", width=4)
+    temp_min_btn_mais.pack(side=tk.LEFT, padx=5)
+
+    # Controles de temperatura máxima
+    frame_temp_max = tk.LabelFrame(root, text="Temperatura Máxima C°", bg=bg_color, fg=fg_color)
+    frame_temp_max.pack(pady=5)
+    temp_max_btn_menos = tk.Button(frame_temp_max, text="-", width=4)
+    temp_max_btn_menos.pack(side=tk.LEFT, padx=5)
+    temp_maxima_label = tk.Label(frame_temp_max, text=f"{temperatura_maxima:.0f}", width=5, bg=bg_color, fg=fg_color)
+    temp_maxima_label.pack(side=tk.LEFT)
+    temp_max_btn_mais = tk.Button(frame_temp_max, text="+", width=4)
+    temp_max_btn_mais.pack(side=tk.LEFT, padx=5)
+
+    # Perfis de material: escolher aplica só o que mudou; digitar um nome novo e salvar cria o perfil
+    frame_perfil = tk.LabelFrame(root, text="Perfil de material", bg=bg_color, fg=fg_color)
+    frame_perfil.pack(pady=5)
+    perfil_var = tk.StringVar()
+    perfil_menu = ttk.Combobox(frame_perfil, textvariable=perfil_var, values=perfis.nomes(), width=12)
+    perfil_menu.pack(side=tk.LEFT, padx=5)
+    ttk.Button(frame_perfil, text="Usar", command=usar_perfil).pack(side=tk.LEFT, padx=5)
+    ttk.Button(frame_perfil, text="Salvar", command=salvar_perfil).pack(side=tk.LEFT, padx=5)
+
+    # Botões aplicar e autoajuste
+    frame_botoes = tk.Frame(root, bg=bg_color)
+    frame_botoes.pack(pady=10)
+    aplicar_btn = ttk.Button(frame_botoes, text="Aplicar", command=aplicar_configuracoes)
+    aplicar_btn.pack(side=tk.LEFT, padx=5)
+    autoajuste_btn = ttk.Button(frame_botoes, text="Autoajuste", command=alternar_autoajuste)
+    autoajuste_btn.pack(side=tk.LEFT, padx=5)
+
+    # Status de aplicação
+    status_label = tk.Label(root, text="", fg="green", font=("Arial", 10))
+    status_label.pack(pady=(10, 0))
+
+    # Aplicando comportamento pressionar e segurar
+    BotaoPressionado(vel_btn_menos, "vel", -1)
+    BotaoPressionado(vel_btn_mais, "vel", 1)
+    BotaoPressionado(motor_btn_menos, "min", -1)
+    BotaoPressionado(motor_btn_mais, "min", 1)
+    BotaoPressionado(temp_min_btn_menos, "temp_minima", -1)
+    BotaoPressionado(temp_min_btn_mais, "temp_minima", 1)
+    BotaoPressionado(temp_max_btn_menos, "temp_maxima", -1)
+    BotaoPressionado(temp_max_btn_mais, "temp_maxima", 1)
+
+    # Sobreposição de depuração (fica escondida até o F12)
+    depuracao_var = tk.StringVar(value="")
+    depuracao_label = tk.Label(root, textvariable=depuracao_var, bg="black", fg="#00ff00",
+                               font=("Courier", 8), justify=tk.LEFT)
+    root.bind("<F12>", alternar_depuracao)
+
+def main():
+    global sair_apos_leitura, captura, perfis
+    parser = argparse.ArgumentParser(description="Fila Pet Controller")
+    parser.add_argument("--porta", help="conecta a esta porta (ou ao serviço, ou a replay:arquivo.fbcap@100) ao abrir")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="mostra o tempo das importações e até a primeira temperatura")
+    parser.add_argument("--sair", action="store_true", help="com --profile-startup: fecha após a primeira temperatura")
+    parser.add_argument("--metricas", type=int, metavar="PORTA", help="serve as métricas em http://127.0.0.1:PORTA/metrics")
+    parser.add_argument("--metricas-arquivo", metavar="CAMINHO", help="grava as métricas (formato Prometheus) a cada 10 s")
+    parser.add_argument("--debug", action="store_true", help="abre com a sobreposição de métricas (F12)")
+    parser.add_argument("--captura", metavar="DIRETORIO", help="grava os bytes crus da serial (ver filabottle.captura)")
+    parser.add_argument("--sem-desligar", action="store_true",
+                        help="alarmes de emergência só avisam, sem mandar SET_STATE,OFF")
+    args = parser.parse_args()
+    if args.sem_desligar:
+        detector.desligar = None
+    sair_apos_leitura = args.sair
+    if args.captura:
+        captura = nova_captura(args.captura)
+    try:
+        perfis = Perfis(CAMINHO_PERFIS)
+        erro_perfis = None
+    except ValueError as e:  # JSON corrompido ou de uma versão mais nova: segue com os padrões
+        perfis = Perfis(None)
+        erro_perfis = f"⚠ {CAMINHO_PERFIS} ignorado ({e}); perfis padrão, salvar não grava no arquivo"
+        print(erro_perfis)
+    if args.metricas:
+        metricas.servir(args.metricas)
+    if args.metricas_arquivo:
+        metricas.gravar_periodicamente(args.metricas_arquivo)
+
+    descoberta.start()
+    construir_interface()
+    if args.debug:
+        alternar_depuracao()
+    if erro_perfis:
+        status_label.config(text=erro_perfis, fg="orange")
+    perfil.marcar("janela")
+    if args.porta:
+        porta_var.set(args.porta)
+        conectar()
+    root.protocol("WM_DELETE_WINDOW", ao_fechar)
+    atualizar_display()
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
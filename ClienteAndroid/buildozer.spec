@@ -6,7 +6,7 @@ package.domain = org.test
 source.dir = .
 source.include_exts = py,png,jpg,kv,atlas,ttf
 version = 0.1
-requirements = python3,kivy,pyserial-for-android,usb4a,pyjnius
+requirements = python3,kivy,pyserial-for-android,usb4a,pyjnius,numpy
 orientation = portrait
 icon.filename = %(source.dir)s/icon.png
 fullscreen = 0
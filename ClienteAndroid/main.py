@@ -1,3 +1,21 @@
+import argparse
+import os
+import sys
+import time
+
+# Antes de qualquer outra importação: marca o início e, se pedido, mede as importações.
+# No Android não há linha de comando; FILABOTTLE_PERFIL=1 faz o mesmo.
+from filabottle.partida import perfil
+if "--profile-startup" in sys.argv or os.environ.get('FILABOTTLE_PERFIL') == '1':
+    perfil.instalar()
+# As opções são do app (main()), não do Kivy, que leria sys.argv ao ser importado
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+# pyserial, NumPy (gravação) e usb4a só são importados por quem usa.
+# O Kivy fica no topo: tudo abaixo é usado pelo build() antes do primeiro quadro.
+# Os ~170 ms do Spinner são do kivy.core.window (via DropDown), que o App.run()
+# importa de qualquer forma para abrir a janela; kivy.app (~210 ms) já traz
+# Widget e kivy.graphics; Label, Button e os layouts somam ~15 ms.
 import kivy
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
@@ -5,17 +23,36 @@ from kivy.uix.gridlayout import GridLayout
 from kivy.uix.label import Label
 from kivy.uix.button import Button
 from kivy.uix.spinner import Spinner
+from kivy.uix.widget import Widget
+from kivy.graphics import Color, Line, Rectangle, PushMatrix, PopMatrix, Translate
 from kivy.clock import Clock
 from kivy.properties import StringProperty, NumericProperty, ListProperty
 from kivy.utils import platform
 
-import serial
-# Importa a exceção específica para tratar desconexões
-from serial.serialutil import SerialException
-
-# A listagem de portas padrão só funciona no Desktop
-if platform != 'android':
-    import serial.tools.list_ports
+from filabottle.anomalias import Detector
+from filabottle.binario import BAUD_TEXTO, ProtocoloAutomatico
+from filabottle.captura import abrir_porta, nova_captura
+from filabottle.comandos import FilaComandos
+from filabottle.descoberta import Descoberta, Dispositivo, Reconexao, listar_seriais
+from filabottle.grafico import HistoricoGrafico, quadro
+from filabottle.metricas import Pipeline
+from filabottle.perfis import Configurador, Perfis, descrever
+from filabottle.conexao import ENDERECO_PADRAO, ConexaoServico, ParserAssinante, e_servico
+from filabottle.protocolo import Parser
+from filabottle.tela import COR_RGBA, indice_cor
+
+
+def listar_usb():
+    """Dispositivos USB do Android como (nome, Dispositivo)."""
+    from usb4a import usb
+    portas = []
+    for d in usb.get_usb_device_list():
+        try:
+            serie = d.getSerialNumber()
+        except Exception:  # Android 10+ só mostra o número de série com permissão
+            serie = None
+        portas.append((d.getDeviceName(), Dispositivo(d.getVendorId(), d.getProductId(), serie)))
+    return portas
 
 # A classe ParameterControl não mudou
 class ParameterControl(BoxLayout):
@@ -53,6 +90,11 @@ class ParameterControl(BoxLayout):
     def update_value_label(self):
         self.value_label.text = self.get_formatted_value()
 
+    def show_value(self, value):
+        """Valor vindo do Arduino: só a tela muda, sem mandar comando."""
+        self.param_value = value
+        self.update_value_label()
+
     def start_update(self, instance):
         self.stop_update(instance)
         self.update_param(instance.text)
@@ -76,16 +118,97 @@ class ParameterControl(BoxLayout):
         self.callback(self.param_name, self.param_value)
 
 
+class TemperatureChart(Widget):
+    """Gráfico de temperatura, faixa de histerese e motor (linha azul na base)."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        with self.canvas:
+            PushMatrix()
+            self._origin = Translate(0, 0)
+            Color(0.2, 0.2, 0.2, 1)
+            self._band = Rectangle(pos=(0, 0), size=(0, 0))
+            Color(1, 0.6, 0, 1)
+            self._temperature = Line(points=[], width=1)
+            Color(0.2, 0.6, 1, 1)
+            self._motor = Line(points=[], width=1)
+            PopMatrix()
+        self.bind(pos=self._move)
+
+    def _move(self, *args):
+        self._origin.xy = self.pos
+
+    def redraw(self, history, band):
+        """Só troca as coordenadas das três instruções; o custo não depende do histórico."""
+        frame = quadro(history, self.width, self.height, band, inverter_y=False)
+        if frame is None:
+            return
+        y_min, y_max = frame['faixa']
+        self._band.pos = (0, y_min)
+        self._band.size = (self.width, y_max - y_min)
+        self._temperature.points = frame['temperatura']
+        self._motor.points = frame['motor']
+
+
 class FilaBottleApp(App):
     COLOR_ON = ListProperty([0.2, 0.8, 0.2, 1])
     COLOR_OFF = ListProperty([0.8, 0.2, 0.2, 1])
     COLOR_NEUTRAL = ListProperty([0.2, 0.2, 0.2, 1])
+    # Quanto a UI está atrás do Arduino: linhas drenadas no último tick e
+    # idade (s) da linha mais antiga que ainda não tinha sido lida.
+    queue_depth = NumericProperty(0)
+    backlog_age = NumericProperty(0)
+    # Definido pelo main() antes do run(); o build() roda dentro do run()
+    start_port = None  # --porta: conecta ao abrir
+    metrics_port = metrics_file = None  # --metricas / --metricas-arquivo
+    # --captura; no Android, FILABOTTLE_CAPTURA com o diretório
+    capture_dir = os.environ.get('FILABOTTLE_CAPTURA')
+    shutdown_on_alarm = True  # --sem-desligar: emergência só avisa
+    material_profile = None  # --perfil: NOME ou NOME@VERSAO aplicado ao ligar o sistema
 
     def build(self):
         self.arduino = None
         self.system_is_on = False
         self.heater_is_on = False
         self.motor_is_on = False
+        self.parser = Parser()
+        self.recorder = None
+        self.capture = None
+        self._record = False
+        self._unrecorded = []
+        # Segurar +/- gera um comando a cada 100 ms: a fila agrupa e limita a taxa
+        self.commands = FilaComandos(self.send_command)
+        # Contadores e tempos de cada etapa (Prometheus com --metricas; F12 ou --debug mostram na tela)
+        self.metrics = Pipeline()
+        self.metrics.comandos(self.commands)
+        # Perfis de material: ligar o sistema só manda os SET_* que diferem do estado do Arduino
+        profiles_path = os.path.join(self.user_data_dir, 'perfis.json')
+        try:
+            self.profiles = Perfis(profiles_path)
+            profiles_error = None
+        except ValueError as e:  # JSON corrompido ou de uma versão mais nova: segue com os padrões
+            self.profiles = Perfis(None)
+            profiles_error = f"perfis.json ignorado ({e}); usando os perfis padrão"
+            print(profiles_error)
+        self.configurator = Configurador(self.commands, dialeto='kivy', ao_concluir=self.on_config_switch)
+        # Disparo térmico, termistor solto, oscilação...; emergência manda SET_STATE,OFF
+        self.detector = Detector(desligar=self.emergency_off if self.shutdown_on_alarm else None)
+        self._undetected = []  # o check_anomalies consome, fora da leitura
+        self.debug = False
+        self._debug_event = None
+        self.history = HistoricoGrafico()
+        self._chart_dirty = False
+        self._pending_since = None
+        self._last_read = None
+        # Último estado desenhado, por grupo: o Kivy já junta as mudanças num redesenho por quadro
+        self.forget_ui()
+        # Varredura de portas fora da thread da UI; o cabo que cai é reencontrado por VID/PID/série
+        self.discovery = Descoberta(listar_usb if platform == 'android' else listar_seriais)
+        self.discovery.start()
+        self._ports_version = None
+        self.port = None
+        self.device = None
+        self.reconnect = Reconexao()
 
         self.main_layout = BoxLayout(orientation='vertical', padding=20, spacing=15)
 
@@ -104,8 +227,14 @@ class FilaBottleApp(App):
         # --- O resto do layout continua igual ---
         self.temp_display = Label(text='--.-- °C', font_size='48sp', size_hint_y=0.3)
         self.main_layout.add_widget(self.temp_display)
-        self.status_label = Label(text='Desconectado', size_hint_y=0.1)
+        self.chart = TemperatureChart(size_hint_y=0.25)
+        self.main_layout.add_widget(self.chart)
+        self.status_label = Label(text=profiles_error or 'Desconectado', size_hint_y=0.1)
         self.main_layout.add_widget(self.status_label)
+        self.lag_label = Label(text='', font_size='12sp', size_hint_y=0.05)
+        self.main_layout.add_widget(self.lag_label)
+        self.debug_label = Label(text='', font_size='10sp', size_hint_y=0.12, halign='left',
+                                 color=(0, 1, 0, 1))
         self.vel_control = ParameterControl('Velocidade', 40.0, 'mm/s', self.send_param_update, step=0.5)
         self.temp_control = ParameterControl('Temp. Alvo', 120.0, '°C', self.send_param_update, step=1)
         self.motor_temp_control = ParameterControl('Temp. Motor', 90.0, '°C', self.send_param_update, step=1)
@@ -122,43 +251,136 @@ class FilaBottleApp(App):
         self.main_layout.add_widget(individual_controls_layout)
 
         Clock.schedule_interval(self.read_from_arduino, 0.1)
+        Clock.schedule_interval(self.redraw_chart, 0.2)  # no máximo 5 quadros/s
+        Clock.schedule_interval(self.check_anomalies, 0.2)
+        from kivy.core.window import Window
+        Window.bind(on_key_down=self._on_key_down)
+        if os.environ.get('FILABOTTLE_DEBUG') == '1':
+            self.toggle_debug()
         return self.main_layout
+
+    def emergency_off(self):
+        self.commands.enviar("SET_STATE", "SET_STATE,OFF", esperado=('sistema', False))
+
+    def show_alarm(self, alarm):
+        print(f"Alarme: {alarm.mensagem}")
+        self.metrics.alarme(alarm.tipo)
+        self.status_label.text = f"ALARME: {alarm.mensagem}"
+
+    def _on_key_down(self, window, key, *args):
+        if key == 293:  # F12
+            self.toggle_debug()
+
+    def toggle_debug(self, *args):
+        """Mostra/esconde as métricas do caminho serial -> tela, atualizadas 1 vez por segundo."""
+        self.debug = not self.debug
+        if self.debug:
+            self.main_layout.add_widget(self.debug_label)
+            self._debug_event = Clock.schedule_interval(self._update_debug, 1.0)
+            self._update_debug(0)
+        else:
+            self.main_layout.remove_widget(self.debug_label)
+            self._debug_event.cancel()
+
+    def _update_debug(self, dt):
+        self.debug_label.text = self.metrics.resumo()
     
     def on_start(self):
         """ Pede permissões necessárias no Android ao iniciar o app. """
+        perfil.marcar('janela')
+        if self.metrics_port:
+            self.metrics.servir(self.metrics_port)
+        if self.metrics_file:
+            self.metrics.gravar_periodicamente(self.metrics_file)
+        if self.capture_dir:
+            self.capture = nova_captura(self.capture_dir)
         if platform == 'android':
             try:
                 from android.permissions import request_permissions, Permission
                 request_permissions([Permission.USB_HOST])
             except ImportError:
                 self.status_label.text = "Erro ao importar permissões."
+        if self.start_port:
+            self.port_spinner.text = self.start_port
+            self.conectar(None)
+
+    def on_stop(self):
+        """Grava o que falta antes de sair."""
+        self.discovery.parar()
+        if self.recorder:
+            self.recorder.fechar()
+            self.recorder = None
+        if self.capture:
+            self.capture.fechar()
 
     # SUA NOVA FUNÇÃO
     def refresh_ports(self, instance):
         """Atualiza a lista de portas seriais disponíveis no spinner."""
+        self.discovery.atualizar()  # a lista nova chega pelo read_from_arduino
         self.port_spinner.values = self.listar_portas()
         self.port_spinner.text = 'Selecione a Porta'
 
     def listar_portas(self):
-        """ Lista as portas seriais disponíveis. Usa um método diferente para Android. """
+        """ Lista as portas da última varredura em segundo plano (não bloqueia). """
+        portas = self.discovery.nomes()
         if platform == 'android':
-            try:
-                from usb4a import usb
-                devices = usb.get_usb_device_list()
-                portas = [d.getDeviceName() for d in devices]
-                return portas if portas else ['Nenhuma Porta USB']
-            except Exception as e:
-                return [f'Erro USB: {str(e)[:20]}']
+            if self.discovery.erro:
+                return [f'Erro USB: {self.discovery.erro[:20]}']
+            return portas if portas else ['Nenhuma Porta USB']
+        # O serviço (python -m filabottle.servico) pode ser dono da porta no desktop
+        return portas + [ENDERECO_PADRAO]
+
+    def _open(self, port):
+        """Abre a porta; numa reconexão a gravação atual continua."""
+        if e_servico(port):
+            # O serviço é dono da serial e da gravação; aqui só assinamos
+            self.arduino = ConexaoServico(port)
+            self.parser = ParserAssinante()
+            self._record = False
         else:
-            ports = [port.device for port in serial.tools.list_ports.comports()]
-            return ports if ports else ['Nenhuma Porta']
+            self.arduino = abrir_porta(port, BAUD_TEXTO, timeout=1, captura=self.capture)
+            # Tenta o modo binário e cai para texto se o firmware não responder
+            self.parser = ProtocoloAutomatico(self.arduino)
+            self._record = True
+        self.commands.limpar()
+        self.configurator.esquecer()  # o UNO reinicia ao abrir a porta
+        self._pending_since = None
+        self._last_read = time.monotonic()
+        self.port = port
+
+    def try_reconnect(self):
+        """Nova tentativa quando a espera acaba; o Arduino pode voltar com outro nome."""
+        now = time.monotonic()
+        if not self.reconnect.pronta(now):
+            return
+        port = self.port if e_servico(self.port) else self.discovery.localizar(self.device, self.port)
+        try:
+            if port is None:
+                raise OSError('dispositivo ausente')
+            self._open(port)
+        except Exception:
+            self.reconnect.falhou(now)
+            self.discovery.atualizar()
+            self.status_label.text = (f"Reconectando... tentativa {self.reconnect.tentativas + 1}"
+                                      f" em {self.reconnect.espera(now):.1f} s")
+            return
+        duration = self.reconnect.conseguiu()
+        if self.recorder:
+            self.recorder.anotar_queda(self.reconnect.inicio, duration)
+        self._show_alarms(self._detect_pending())  # o que chegou antes da queda
+        self.detector.reconectou()
+        self.port_spinner.text = port
+        self.status_label.text = f"Reconectado a {port} em {duration:.1f} s"
 
     def conectar(self, instance):
         if self.connect_btn.text == 'Conectar':
             port = self.port_spinner.text
             if port not in ['Nenhuma Porta', 'Selecione a Porta', 'Nenhuma Porta USB'] and not port.startswith('Erro USB'):
                 try:
-                    self.arduino = serial.Serial(port, 9600, timeout=1)
+                    self.device = self.discovery.identidade(port)
+                    self._open(port)
+                    self.rearm_detector()
+                    perfil.marcar('conectado')
                     self.status_label.text = f"Conectado a {port}"
                     self.connect_btn.text = 'Desconectar'
                 except Exception as e:
@@ -166,90 +388,307 @@ class FilaBottleApp(App):
         else:
             if self.arduino: self.arduino.close()
             # SUA NOVA LÓGICA CENTRALIZADA
-            self.handle_disconnection()
+            self.handle_disconnection(retry=False)
 
     # SUA NOVA FUNÇÃO
-    def handle_disconnection(self):
-        """Função chamada quando a comunicação serial falha."""
+    def handle_disconnection(self, retry=True):
+        """Função chamada quando a comunicação serial falha (ou o usuário desconecta).
+
+        Numa falha o botão continua em 'Desconectar' e o read_from_arduino
+        tenta reabrir a porta com espera exponencial; a gravação segue aberta.
+        """
         if self.arduino:
             self.arduino.close()
             self.arduino = None
-        self.status_label.text = "Arduino Desconectado!"
-        self.connect_btn.text = 'Conectar'
-        # Reseta a UI para o estado desligado
-        self.update_ui(-1, '0', '0', '0', 0, 0, 0)
+        if retry:
+            self.reconnect.iniciar()
+            self.status_label.text = "Arduino Desconectado! Reconectando..."
+        else:
+            self.reconnect.cancelar()
+            self._record = False
+            self._unrecorded = []
+            if self.recorder:
+                self.recorder.fechar()
+                self.recorder = None
+            self.status_label.text = "Arduino Desconectado!"
+            self.connect_btn.text = 'Conectar'
+        self.parser.limpar()
+        self.commands.limpar()  # o que ficou na fila iria para uma porta fechada
+        self._pending_since = None
+        # Reseta a UI para o estado desligado (força redesenhar tudo)
+        self.forget_ui()
+        self.update_ui(-1, False, False, False, 0, 0, 0)
 
     # SUA FUNÇÃO ALTERADA
     def send_command(self, cmd):
         if self.arduino and self.arduino.is_open:
             try:
                 self.arduino.write(f"{cmd}\n".encode('utf-8'))
-            except SerialException:
+            except OSError:  # SerialException herda de OSError; a queda do serviço também
+                self.metrics.erro('escrita')
                 self.handle_disconnection()
 
     # SUAS FUNÇÕES DE TOGGLE ALTERADAS
     def toggle_system(self, instance):
         new_state = "ON" if not self.system_is_on else "OFF"
         if new_state == "ON":
-            self.send_command("SET_TEMP,120.0")
-            self.send_command("SET_MOTOR_TEMP,90.0")
-        self.send_command(f"SET_STATE,{new_state}")
+            self.rearm_detector()  # religar é a resposta do operador aos alarmes
+            self.apply_profile()
+        self.commands.enviar("SET_STATE", f"SET_STATE,{new_state}", esperado=('sistema', new_state == "ON"))
+
+    def apply_profile(self):
+        """O perfil do --perfil, ou os valores de sempre; sai só o que o Arduino ainda não tem."""
+        if self.material_profile:
+            try:
+                chosen = self.profiles.obter(self.material_profile)
+                self.configurator.aplicar(chosen.parametros, perfil=chosen.nome, versao=chosen.versao)
+            except KeyError as e:
+                self.status_label.text = f"Perfil não encontrado: {e}"
+            except ValueError as e:  # "NOME@x", ou valores fora das faixas do firmware
+                self.status_label.text = f"Perfil {self.material_profile}: {e}"
+        else:
+            self.configurator.aplicar({'temp_alvo': 120.0, 'temp_motor': 90.0}, perfil='padrão')
+
+    def on_config_switch(self, switch):
+        """Cada troca confirmada (ou não) vai com o RTT para a gravação e as métricas."""
+        print(f"Troca: {descrever(switch)}")
+        self.metrics.troca_config(switch)
+        if self.recorder:
+            self.recorder.anotar_troca(switch)
+        self.status_label.text = descrever(switch)
 
     def toggle_heater(self, instance):
         """Agora o botão pode desligar o aquecedor mesmo com o sistema ligado."""
         new_state = "ON" if not self.heater_is_on else "OFF"
-        self.send_command(f"SET_HEATER,{new_state}")
+        self.commands.enviar("SET_HEATER", f"SET_HEATER,{new_state}", rastrear=False)
 
     def toggle_motor(self, instance):
         """Agora o botão pode desligar o motor mesmo com o sistema ligado (se a temp permitir)."""
         new_state = "ON" if not self.motor_is_on else "OFF"
-        self.send_command(f"SET_MOTOR,{new_state}")
+        self.commands.enviar("SET_MOTOR", f"SET_MOTOR,{new_state}", rastrear=False)
     
     def send_param_update(self, name, value):
-        cmd_map = {'Velocidade': 'SET_VEL', 'Temp. Alvo': 'SET_TEMP', 'Temp. Motor': 'SET_MOTOR_TEMP'}
-        command = cmd_map.get(name)
-        if command: self.send_command(f"{command},{value:.2f}")
+        cmd_map = {'Velocidade': ('SET_VEL', 'velocidade'),
+                   'Temp. Alvo': ('SET_TEMP', 'temp_alvo'),
+                   'Temp. Motor': ('SET_MOTOR_TEMP', 'temp_motor')}
+        if name in cmd_map:
+            command, field = cmd_map[name]
+            self.commands.enviar(command, f"{command},{value:.2f}", esperado=(field, value))
 
-    # SUA FUNÇÃO ALTERADA
     def read_from_arduino(self, dt):
-        if self.arduino and self.arduino.in_waiting > 0:
-            try:
-                line = self.arduino.readline().decode('utf-8').strip()
-                if line.startswith("DATA,"):
-                    parts = line.split(',')
-                    if len(parts) == 8: self.update_ui(*parts[1:])
-            except SerialException:
-                self.handle_disconnection()
-            except Exception as e:
-                print(f"Erro inesperado lendo serial: {e}")
+        """Drena tudo que chegou na serial sem bloquear e mostra só o estado mais novo."""
+        if self.discovery.versao != self._ports_version:
+            self._ports_version = self.discovery.versao
+            self.port_spinner.values = self.listar_portas()
+        if self.reconnect.ativa:
+            self.try_reconnect()
+        if not (self.arduino and self.arduino.is_open):
+            return
+        try:
+            start = time.perf_counter()
+            waiting = self.arduino.in_waiting
+            data = self.arduino.read(waiting) if waiting else b''
+            if data:
+                self.metrics.leitura.observar(time.perf_counter() - start)
+            now = time.monotonic()
+            lines_before = self.parser.linhas
+            # Chamado mesmo sem dados para a negociação do modo binário poder expirar
+            samples = self.metrics.alimentar(self.parser, data, now)
+        except OSError:  # SerialException herda de OSError; a queda do serviço também
+            self.metrics.erro('leitura')
+            self.handle_disconnection()
+            return
+        lines = self.parser.linhas - lines_before
+        if self._record and samples:
+            if self.recorder is None:
+                # A gravação (e o NumPy) começa depois que a primeira temperatura já foi para a tela
+                if not self._unrecorded:
+                    Clock.schedule_once(self._start_recorder)
+                self._unrecorded.extend(samples)
+            else:
+                try:
+                    self.recorder.anexar(samples)
+                except Exception as e:  # disco cheio etc.: perde a gravação, não a leitura
+                    print(f"Erro na gravação: {e}")
+                    self.metrics.erro('gravacao')
+        self.configurator.observar(samples)
+        self.commands.observar(samples, self.parser.confirmacoes, now)
+        self.commands.bombear(now)
+        if not self.arduino:  # a escrita pode ter derrubado a conexão
+            return
+        # Todas as amostras vão para o gráfico; o UNO em texto não manda o motor, que sai da temperatura (como no Tk)
+        motor_min = self.motor_temp_control.param_value
+        for sample in samples:
+            motor = sample.motor
+            if motor is None:
+                motor = sample.temperatura >= (sample.temp_motor if sample.temp_motor is not None else motor_min)
+            self.history.anexar(sample.instante, sample.temperatura, motor)
+            self._chart_dirty = True
+
+        # Nenhuma linha completa pode ter chegado antes da última leitura,
+        # exceto a que ficou pela metade no tick anterior.
+        oldest = self._pending_since if self._pending_since is not None else self._last_read
+        if not self.parser.pendentes:
+            self._pending_since = None
+        elif lines or self._pending_since is None:
+            self._pending_since = self._last_read
+        self._last_read = now
+        self.queue_depth = lines
+        self.backlog_age = (now - oldest) if lines and oldest is not None else 0
+
+        if lines:
+            self.metrics.espera.observar(self.backlog_age)
+            self.lag_label.text = (f'Fila: {self.queue_depth} linhas | atraso: {self.backlog_age * 1000:.0f} ms'
+                                   f' | {self.commands.resumo()} | {self.reconnect.resumo()}')
+        # Só a amostra DATA mais nova vai para a tela
+        for sample in reversed(samples):
+            if sample.sistema is not None:
+                start = time.perf_counter()
+                self.update_ui(sample.temperatura, sample.aquecedor, sample.motor, sample.sistema,
+                               sample.velocidade, sample.temp_alvo, sample.temp_motor)
+                self.metrics.ui.observar(time.perf_counter() - start)
+                self.metrics.exibida(sample)
+                if perfil.marcar('primeira temperatura') and perfil.ativo:
+                    perfil.desinstalar()
+                    print(perfil.relatorio())
+                break
+        # O detector vê todas as amostras, mas no check_anomalies: não atrasa a próxima leitura
+        self._undetected.extend(samples)
+
+    def _detect_pending(self):
+        samples, self._undetected = self._undetected, []
+        return self.detector.alimentar(samples, temp_alvo=self.temp_control.param_value) if samples else []
+
+    def _show_alarms(self, alarms):
+        for alarm in alarms:
+            self.show_alarm(alarm)
+
+    def check_anomalies(self, dt):
+        """A cada 0,2 s (como o tique do Tk), com todas as amostras que chegaram desde o anterior."""
+        alarms = self._detect_pending()
+        if self.arduino and self.arduino.is_open:
+            alarms += self.detector.verificar(time.monotonic())
+        self._show_alarms(alarms)
+
+    def rearm_detector(self):
+        """Esquece os alarmes e as amostras de antes ainda não vistas."""
+        self._undetected = []
+        self.detector.rearmar()
+
+    def _start_recorder(self, dt):
+        """Cria a gravação fora do caminho da primeira leitura (importar o NumPy é lento)."""
+        samples, self._unrecorded = self._unrecorded, []
+        if not self._record or self.recorder is not None:
+            return
+        try:
+            from filabottle.gravador import Gravador
+        except ImportError:  # sem NumPy o app funciona, só não grava
+            self._record = False
+            return
+        try:
+            self.recorder = Gravador(os.path.join(self.user_data_dir, 'gravacoes'))
+            self.recorder.anexar(samples)
+        except Exception as e:
+            print(f"Erro na gravação: {e}")
+            self.metrics.erro('gravacao')
+            if self.recorder is None:  # sem diretório: não tenta de novo a cada leitura
+                self._record = False
+
+    def redraw_chart(self, dt):
+        if not self._chart_dirty:
+            return
+        self._chart_dirty = False
+        # Mesma histerese do firmware: liga em alvo - 5, desliga no alvo
+        target = self.temp_control.param_value
+        start = time.perf_counter()
+        self.chart.redraw(self.history, (target - 5, target))
+        self.metrics.grafico.observar(time.perf_counter() - start)
+
+    def forget_ui(self):
+        """Esquece o que está na tela: a próxima update_ui redesenha tudo."""
+        self._shown_text = self._shown_color = None
+        self._shown_setpoints = self._shown_states = (None, None, None)
 
     def update_ui(self, temp, heater_state, motor_state, sys_state, vel, temp_alvo, temp_motor_min):
+        """Escreve só os widgets que mudaram.
+
+        Compara por grupo (temperatura, ajustes, estados): no caso comum só a
+        temperatura mudou e os outros grupos custam uma comparação de tupla.
+        """
         try:
+            temp = float(temp)
             # SUA LÓGICA ALTERADA para resetar o display
-            if float(temp) == -1.0 and not self.arduino:
-                 self.temp_display.text = '--.-- °C'
-            else:
-                 self.temp_display.text = f"{float(temp):.2f} °C"
-
-            self.vel_control.param_value = float(vel)
-            self.vel_control.update_value_label()
-            self.temp_control.param_value = float(temp_alvo)
-            self.temp_control.update_value_label()
-            self.motor_temp_control.param_value = float(temp_motor_min)
-            self.motor_temp_control.update_value_label()
-
-            self.system_is_on = sys_state == '1'
-            self.heater_is_on = heater_state == '1'
-            self.motor_is_on = motor_state == '1'
-
-            self.master_btn.background_color = self.COLOR_ON if self.system_is_on else self.COLOR_NEUTRAL
-            self.master_btn.text = 'Desligar Tudo' if self.system_is_on else 'Ligar Sistema'
-            self.heater_btn.background_color = self.COLOR_ON if self.heater_is_on else self.COLOR_OFF
-            self.heater_btn.text = 'Desligar Aquecedor' if self.heater_is_on else 'Ligar Aquecedor'
-            self.motor_btn.background_color = self.COLOR_ON if self.motor_is_on else self.COLOR_OFF
-            self.motor_btn.text = 'Desligar Motor' if self.motor_is_on else 'Ligar Motor'
+            text = '--.-- °C' if temp == -1.0 and not self.arduino else f"{temp:.2f} °C"
+            if text != self._shown_text:
+                self._shown_text = self.temp_display.text = text
+                color = indice_cor(temp)
+                if color != self._shown_color:
+                    self._shown_color = color
+                    self.temp_display.color = COR_RGBA[color]
+
+            setpoints = (vel, temp_alvo, temp_motor_min)
+            if setpoints != self._shown_setpoints:
+                for control, value, shown in zip((self.vel_control, self.temp_control, self.motor_temp_control),
+                                                 setpoints, self._shown_setpoints):
+                    if value != shown:
+                        control.show_value(float(value))
+                self._shown_setpoints = setpoints
+
+            states = (sys_state, heater_state, motor_state)
+            if states != self._shown_states:
+                self.system_is_on = bool(sys_state)
+                self.heater_is_on = bool(heater_state)
+                self.motor_is_on = bool(motor_state)
+                for paint, on, shown in zip((self._paint_master, self._paint_heater, self._paint_motor),
+                                            states, self._shown_states):
+                    if shown is None or bool(on) != bool(shown):
+                        paint(bool(on))
+                self._shown_states = states
         except (ValueError, IndexError) as e:
+            # Valor inválido não pode ficar registrado como "já desenhado"
+            self.forget_ui()
             print(f"Erro ao processar dados do Arduino: {e}")
+            self.metrics.erro('ui')
+
+    def _paint_master(self, on):
+        self.master_btn.background_color = self.COLOR_ON if on else self.COLOR_NEUTRAL
+        self.master_btn.text = 'Desligar Tudo' if on else 'Ligar Sistema'
+
+    def _paint_heater(self, on):
+        self.heater_btn.background_color = self.COLOR_ON if on else self.COLOR_OFF
+        self.heater_btn.text = 'Desligar Aquecedor' if on else 'Ligar Aquecedor'
+
+    def _paint_motor(self, on):
+        self.motor_btn.background_color = self.COLOR_ON if on else self.COLOR_OFF
+        self.motor_btn.text = 'Desligar Motor' if on else 'Ligar Motor'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='FilaBottle')
+    parser.add_argument('--porta', help='conecta a esta porta (ou ao serviço, ou a replay:arquivo.fbcap@100) ao abrir')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='mostra o tempo das importações e até a primeira temperatura')
+    parser.add_argument('--metricas', type=int, metavar='PORTA', help='serve as métricas em http://127.0.0.1:PORTA/metrics')
+    parser.add_argument('--metricas-arquivo', metavar='CAMINHO', help='grava as métricas (formato Prometheus) a cada 10 s')
+    parser.add_argument('--debug', action='store_true', help='abre com a sobreposição de métricas (F12)')
+    parser.add_argument('--captura', metavar='DIRETORIO', help='grava os bytes crus da serial (ver filabottle.captura)')
+    parser.add_argument('--sem-desligar', action='store_true',
+                        help='alarmes de emergência só avisam, sem mandar SET_STATE,OFF')
+    parser.add_argument('--perfil', help='perfil de material (NOME ou NOME@VERSAO) aplicado ao ligar o sistema')
+    args = parser.parse_args()
+    if args.perfil and '@' in args.perfil and not args.perfil.rpartition('@')[2].isdigit():
+        parser.error(f"--perfil {args.perfil}: depois do @ vem o número da versão")
+    if args.debug:
+        os.environ['FILABOTTLE_DEBUG'] = '1'
+    app = FilaBottleApp()
+    app.start_port = args.porta
+    app.metrics_port = args.metricas
+    app.metrics_file = args.metricas_arquivo
+    if args.captura:
+        app.capture_dir = args.captura
+    app.shutdown_on_alarm = not args.sem_desligar
+    app.material_profile = args.perfil
+    app.run()
 
 if __name__ == "__main__":
-    FilaBottleApp().run()
+    main()
@@ -7,6 +7,17 @@
 #define STEP_PIN 3
 #define DIR_PIN 4
 
+// Serial: sempre começa em texto a 9600 (o UNO reinicia a cada conexão).
+// O host pode pedir o modo binário com "BIN,<baud>".
+#define BAUD_INICIAL 9600
+const unsigned long INTERVALO_TEXTO_MS = 500;
+const unsigned long INTERVALO_BINARIO_MS = 50;
+// Relé e motor andam sempre neste ritmo (o do delay original), em qualquer modo:
+// o BIN muda só o formato e a frequência da telemetria
+const unsigned long INTERVALO_CONTROLE_MS = 500;
+unsigned long ultimoControle = 0;
+unsigned long ultimaTelemetria = 0;
+
 // Constantes do termistor
 const float R_SERIE = 100000.0;
 const float VREF = 5.0;
@@ -30,6 +41,44 @@ unsigned long INTERVALO_PULSOS;
 
 bool aquecedorLigado = false;
 bool motorAtivo = false;
+// SET_STATE,OFF (parada de emergência do host): relé e motor desligados até
+// SET_STATE,ON ou um reset. Não vai para a EEPROM.
+bool sistemaLigado = true;
+// SET_HEATER,ON|OFF: o host aciona o relé direto (autoajuste e controle PID no
+// host). Sem comando por WATCHDOG_HOST_MS, ou com SET_HEATER,AUTO, a histerese
+// volta; o host nunca aquece além de TEMP_ALVO_MAX + LIMITE_HOST_C.
+bool controleHost = false;
+bool aquecedorHost = false;
+unsigned long ultimoComandoHost = 0;
+const unsigned long WATCHDOG_HOST_MS = 2000;
+const float LIMITE_HOST_C = 10.0;
+
+// Modo binário: quadros little-endian + CRC-16/CCITT, codificados em COBS e
+// terminados por 0x00 (ver filabottle/binario.py no host)
+bool modoBinario = false;
+uint8_t seqQuadro = 0;
+
+#define QUADRO_TELEMETRIA 1
+#define QUADRO_CONFIRMACAO 2
+#define ESTADO_AQUECEDOR 0x01
+#define ESTADO_MOTOR 0x02
+#define ESTADO_SISTEMA 0x04
+
+struct __attribute__((packed)) QuadroTelemetria {
+  uint8_t tipo;
+  uint8_t seq;
+  uint32_t ms;
+  float temperatura;
+  uint8_t estados;
+  float velocidade;
+  float tempAlvo;
+  float tempMotor;
+};
+
+struct __attribute__((packed)) QuadroConfirmacao {
+  uint8_t tipo;
+  uint8_t seq;
+};
 
 void salvarConfiguracoes() {
   EEPROM.put(0, VELOCIDADE_MM_S);
@@ -37,6 +86,43 @@ void salvarConfiguracoes() {
   EEPROM.put(8, TEMP_MIN_MOTOR);
 }
 
+// Aplica os três valores de uma vez; a EEPROM só é gravada se algum mudou
+void aplicarConfiguracoes(float velocidade, float tempAlvo, float tempMotor) {
+  bool mudou = velocidade != VELOCIDADE_MM_S || tempAlvo != TEMP_ALVO_MAX || tempMotor != TEMP_MIN_MOTOR;
+  VELOCIDADE_MM_S = velocidade;
+  TEMP_ALVO_MAX = tempAlvo;
+  TEMP_MIN_MOTOR = tempMotor;
+  TEMP_ALVO_MIN = TEMP_ALVO_MAX - 5;
+  passosPorMM = (PASSOS_POR_REV * MICROSTEPS) / PASSO_DO_FUSO;
+  INTERVALO_PULSOS = (1000000.0 / (VELOCIDADE_MM_S * passosPorMM));
+  if (mudou) salvarConfiguracoes();
+}
+
+// CFG,VEL=40,TMAX=260,TMOTOR=180 com qualquer subconjunto das chaves (ver
+// filabottle/perfis.py): tudo ou nada, uma confirmação e uma gravação
+bool processarCfg(const String &comando) {
+  float velocidade = VELOCIDADE_MM_S, tempAlvo = TEMP_ALVO_MAX, tempMotor = TEMP_MIN_MOTOR;
+  int inicio = 4;
+  while (inicio < (int)comando.length()) {
+    int fim = comando.indexOf(',', inicio);
+    if (fim < 0) fim = comando.length();
+    int igual = comando.indexOf('=', inicio);
+    if (igual <= inicio || igual > fim) return false;
+    String chave = comando.substring(inicio, igual);
+    float valor = comando.substring(igual + 1, fim).toFloat();
+    if (chave == "VEL") velocidade = valor;
+    else if (chave == "TMAX") tempAlvo = valor;
+    else if (chave == "TMOTOR") tempMotor = valor;
+    else return false;
+    inicio = fim + 1;
+  }
+  // As mesmas faixas do carregarConfiguracoes
+  if (velocidade < 1 || velocidade > 100 || tempAlvo < 100 || tempAlvo > 300 ||
+      tempMotor < 100 || tempMotor > 300) return false;
+  aplicarConfiguracoes(velocidade, tempAlvo, tempMotor);
+  return true;
+}
+
 void carregarConfiguracoes() {
   EEPROM.get(0, VELOCIDADE_MM_S);
   EEPROM.get(4, TEMP_ALVO_MAX);
@@ -51,8 +137,70 @@ void carregarConfiguracoes() {
   INTERVALO_PULSOS = (1000000.0 / (VELOCIDADE_MM_S * passosPorMM));
 }
 
+uint16_t crc16(const uint8_t *dados, size_t n) {
+  uint16_t crc = 0xFFFF;
+  for (size_t i = 0; i < n; i++) {
+    crc ^= (uint16_t)dados[i] << 8;
+    for (uint8_t b = 0; b < 8; b++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+// Acrescenta o CRC, codifica em COBS e envia com o 0x00 final.
+// Os quadros têm bem menos de 254 bytes, então o código 0xFF nunca aparece.
+void enviarQuadro(const uint8_t *carga, size_t n) {
+  uint8_t bruto[32];
+  uint8_t saida[36];
+  memcpy(bruto, carga, n);
+  uint16_t crc = crc16(bruto, n);
+  bruto[n++] = crc & 0xFF;
+  bruto[n++] = crc >> 8;
+
+  size_t posCodigo = 0, pos = 1;
+  uint8_t codigo = 1;
+  for (size_t i = 0; i < n; i++) {
+    if (bruto[i] == 0) {
+      saida[posCodigo] = codigo;
+      posCodigo = pos++;
+      codigo = 1;
+    } else {
+      saida[pos++] = bruto[i];
+      codigo++;
+    }
+  }
+  saida[posCodigo] = codigo;
+  saida[pos++] = 0;
+  Serial.write(saida, pos);
+}
+
+void enviarTelemetria(float temperatura) {
+  QuadroTelemetria q;
+  q.tipo = QUADRO_TELEMETRIA;
+  q.seq = seqQuadro++;
+  q.ms = millis();
+  q.temperatura = temperatura;
+  q.estados = (aquecedorLigado ? ESTADO_AQUECEDOR : 0) | (motorAtivo ? ESTADO_MOTOR : 0) |
+              (sistemaLigado ? ESTADO_SISTEMA : 0);
+  q.velocidade = VELOCIDADE_MM_S;
+  q.tempAlvo = TEMP_ALVO_MAX;
+  q.tempMotor = TEMP_MIN_MOTOR;
+  enviarQuadro((const uint8_t *)&q, sizeof(q));
+}
+
+void enviarConfirmacao() {
+  QuadroConfirmacao q = { QUADRO_CONFIRMACAO, seqQuadro++ };
+  enviarQuadro((const uint8_t *)&q, sizeof(q));
+}
+
+bool baudSuportado(long baud) {
+  return baud == 19200 || baud == 38400 || baud == 57600 || baud == 115200 ||
+         baud == 250000 || baud == 500000 || baud == 1000000;
+}
+
 void setup() {
-  Serial.begin(9600);
+  Serial.begin(BAUD_INICIAL);
   Serial.setTimeout(100);
 
   pinMode(RELE_PIN, OUTPUT);
@@ -77,21 +225,46 @@ float calcularTemperatura(int leituraADC) {
 }
 
 void controlarRele(float temperatura) {
-  if (temperatura == -1) return;
+  if (!sistemaLigado) {
+    digitalWrite(RELE_PIN, HIGH); // Desliga o aquecedor (relé NF: HIGH = DESLIGADO)
+    aquecedorLigado = false;
+    return;
+  }
+  if (controleHost && millis() - ultimoComandoHost > WATCHDOG_HOST_MS) controleHost = false;
+  if (temperatura == -1) {
+    // Termistor solto: o host para de receber telemetria, mas ainda pode estar
+    // renovando o SET_HEATER,ON. Sem leitura, o relé do host não fica ligado.
+    if (controleHost && aquecedorLigado) {
+      digitalWrite(RELE_PIN, HIGH); // relé NF: HIGH = DESLIGADO
+      aquecedorLigado = false;
+    }
+    return;
+  }
+
+  if (controleHost) {
+    bool ligar = aquecedorHost && temperatura < TEMP_ALVO_MAX + LIMITE_HOST_C;
+    if (ligar != aquecedorLigado) {
+      digitalWrite(RELE_PIN, ligar ? LOW : HIGH); // relé NF: LOW = LIGADO
+      aquecedorLigado = ligar;
+    }
+    return;
+  }
 
   if (!aquecedorLigado && temperatura <= TEMP_ALVO_MIN) {
     digitalWrite(RELE_PIN, LOW); // Liga o aquecedor (relé NF: LOW = LIGADO)
     aquecedorLigado = true;
-    Serial.println("Aquecedor LIGADO: Temperatura abaixo do mínimo.");
+    if (modoBinario) enviarTelemetria(temperatura);
+    else Serial.println("Aquecedor LIGADO: Temperatura abaixo do mínimo.");
   } else if (aquecedorLigado && temperatura >= TEMP_ALVO_MAX) {
     digitalWrite(RELE_PIN, HIGH); // Desliga o aquecedor (relé NF: HIGH = DESLIGADO)
     aquecedorLigado = false;
-    Serial.println("Aquecedor DESLIGADO: Temperatura acima do máximo.");
+    if (modoBinario) enviarTelemetria(temperatura);
+    else Serial.println("Aquecedor DESLIGADO: Temperatura acima do máximo.");
   }
 }
 
 void controlarMotor(float temperatura) {
-  motorAtivo = temperatura >= TEMP_MIN_MOTOR;
+  motorAtivo = sistemaLigado && temperatura >= TEMP_MIN_MOTOR;
   if (motorAtivo) {
     static unsigned long ultimaEtapa = 0;
     if (micros() - ultimaEtapa >= INTERVALO_PULSOS) {
@@ -107,20 +280,45 @@ void processarComandoSerial() {
   if (Serial.available()) {
     String comando = Serial.readStringUntil('\n');
     comando.trim();
-    if (comando.startsWith("SET")) {
+    if (comando.startsWith("BIN,")) {
+      long baud = comando.substring(4).toInt();
+      if (baudSuportado(baud)) {
+        Serial.print("BIN,OK,");
+        Serial.println(baud);
+        Serial.flush(); // espera o OK sair antes de trocar a velocidade
+        Serial.end();
+        Serial.begin(baud);
+        modoBinario = true;
+      } else {
+        Serial.println("BIN,ERRO");
+      }
+    } else if (comando.startsWith("SET_HEATER,")) {
+      // Repetido a taxa fixa pelo host (é o que mantém o watchdog); sem resposta
+      controleHost = !comando.endsWith(",AUTO");
+      aquecedorHost = comando.endsWith(",ON");
+      ultimoComandoHost = millis();
+    } else if (comando.startsWith("CFG,")) {
+      if (processarCfg(comando)) {
+        if (modoBinario) enviarConfirmacao();
+        else Serial.println("Configurações atualizadas.");
+      } else if (!modoBinario) {
+        Serial.println("CFG,ERRO"); // no modo binário o host percebe pela falta de confirmação
+      }
+    } else if (comando.startsWith("SET_STATE,")) {
+      sistemaLigado = comando.endsWith(",ON");
+      if (modoBinario) enviarConfirmacao();
+      else Serial.println("Configurações atualizadas."); // a mesma confirmação do SET
+    } else if (comando.startsWith("SET")) {
       int primeiro = comando.indexOf(',');
       int segundo = comando.indexOf(',', primeiro + 1);
       int terceiro = comando.indexOf(',', segundo + 1);
 
       if (primeiro > 0 && segundo > primeiro && terceiro > segundo) {
-        VELOCIDADE_MM_S = comando.substring(primeiro + 1, segundo).toFloat();
-        TEMP_ALVO_MAX = comando.substring(segundo + 1, terceiro).toFloat();
-        TEMP_MIN_MOTOR = comando.substring(terceiro + 1).toFloat();
-        TEMP_ALVO_MIN = TEMP_ALVO_MAX - 5;
-        passosPorMM = (PASSOS_POR_REV * MICROSTEPS) / PASSO_DO_FUSO;
-        INTERVALO_PULSOS = (1000000.0 / (VELOCIDADE_MM_S * passosPorMM));
-        salvarConfiguracoes();
-        Serial.println("Configurações atualizadas.");
+        aplicarConfiguracoes(comando.substring(primeiro + 1, segundo).toFloat(),
+                             comando.substring(segundo + 1, terceiro).toFloat(),
+                             comando.substring(terceiro + 1).toFloat());
+        if (modoBinario) enviarConfirmacao();
+        else Serial.println("Configurações atualizadas.");
       }
     }
   }
@@ -129,17 +327,28 @@ void processarComandoSerial() {
 void loop() {
   processarComandoSerial();
 
+  unsigned long agora = millis();
+  bool controlar = agora - ultimoControle >= INTERVALO_CONTROLE_MS;
+  bool telemetria = agora - ultimaTelemetria >= (modoBinario ? INTERVALO_BINARIO_MS : INTERVALO_TEXTO_MS);
+  if (!controlar && !telemetria) return;
+
   int leituraADC = analogRead(TERMISTOR_PIN);
   float temperatura = calcularTemperatura(leituraADC);
 
-  controlarRele(temperatura);
-  controlarMotor(temperatura);
-
-  if (temperatura != -1) {
-    Serial.print("Temperatura: ");
-    Serial.print(temperatura, 2);
-    Serial.println(" °C");
+  if (controlar) {
+    ultimoControle = agora;
+    controlarRele(temperatura);
+    controlarMotor(temperatura);
   }
 
-  delay(500); // frequência de leitura do termistor
+  if (telemetria) ultimaTelemetria = agora;
+  if (telemetria && temperatura != -1) {
+    if (modoBinario) {
+      enviarTelemetria(temperatura);
+    } else {
+      Serial.print("Temperatura: ");
+      Serial.print(temperatura, 2);
+      Serial.println(" °C");
+    }
+  }
 }
@@ -0,0 +1 @@
+"""Código compartilhado pelos clientes do FilaBottle (Tk no desktop e Kivy no Android)."""
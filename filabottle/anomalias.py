@@ -0,0 +1,320 @@
+"""Detecção de anomalias na telemetria, amostra a amostra.
+
+O firmware só tem a histerese do controlarRele; o Detector olha o que ela
+não vê e levanta alarmes:
+
+    disparo             temperatura acima do alvo + margem, ou subindo com o
+                        aquecedor desligado há tempo (relé colado)
+    aquecimento_parado  aquecedor ligado abaixo da faixa e a temperatura não
+                        sobe (termistor fora do bloco, resistência queimada)
+    termistor           leitura -1 (termistor desconectado) ou impossível
+    sem_leitura         nenhuma amostra há `silencio` s com a porta aberta (o
+                        FilaBottle_UNO para de mandar quando lê -1)
+    travado             sensor sem variação nenhuma durante a janela
+    oscilacao           pico a pico além da faixa de histerese + margem
+    aquecimento_lento   subida de alvo - 30 até alvo - 5 mais lenta que a
+                        referência (a primeira medida, se não for informada)
+
+Tudo é incremental: média móvel exponencial para achar picos e vales,
+variância de Welford e inclinação por mínimos quadrados numa janela de
+tempo deslizante (somas centradas que entram e saem em O(1)). Alarmes de
+gravidade "emergencia" chamam `desligar()` uma vez (ex.: SET_STATE,OFF) até
+`rearmar()`.
+
+    detector = Detector(desligar=lambda: fila.enviar("SET_STATE", "SET_STATE,OFF"))
+    for alarme in detector.alimentar(amostras, temp_alvo=260.0):
+        print(alarme.mensagem)
+"""
+import collections
+
+BANDA = 5.0  # TEMP_ALVO_MIN = TEMP_ALVO_MAX - 5 no firmware
+EMERGENCIA = "emergencia"
+ALERTA = "alerta"
+
+Alarme = collections.namedtuple("Alarme", "tipo gravidade instante temperatura mensagem")
+
+
+class Janela:
+    """Média, variância e inclinação de (t, y) nos últimos `segundos`, em O(1) por ponto.
+
+    Welford com remoção: guarda as médias e os co-momentos centrados em vez
+    de somas cruas, que perderiam precisão com o relógio monotônico.
+    """
+
+    __slots__ = ("segundos", "pontos", "n", "media_t", "media", "stt", "syy", "sty")
+
+    def __init__(self, segundos):
+        self.segundos = segundos
+        self.pontos = collections.deque()
+        self.n = 0
+        self.media_t = self.media = self.stt = self.syy = self.sty = 0.0
+
+    def anexar(self, t, y):
+        self.pontos.append((t, y))
+        self.n += 1
+        dt = t - self.media_t
+        dy = y - self.media
+        self.media_t += dt / self.n
+        self.media += dy / self.n
+        self.stt += dt * (t - self.media_t)
+        self.syy += dy * (y - self.media)
+        self.sty += dt * (y - self.media)
+        limite = t - self.segundos
+        pontos = self.pontos
+        while pontos[0][0] < limite:
+            self._remover(*pontos.popleft())
+
+    def _remover(self, t, y):
+        self.n -= 1
+        if self.n == 0:
+            self.media_t = self.media = self.stt = self.syy = self.sty = 0.0
+            return
+        dt = t - self.media_t
+        dy = y - self.media
+        self.media_t -= dt / self.n
+        self.media -= dy / self.n
+        self.stt -= dt * (t - self.media_t)
+        self.syy -= dy * (y - self.media)
+        self.sty -= dt * (y - self.media)
+
+    def limpar(self):
+        self.pontos.clear()
+        self.n = 0
+        self.media_t = self.media = self.stt = self.syy = self.sty = 0.0
+
+    @property
+    def duracao(self):
+        return self.pontos[-1][0] - self.pontos[0][0] if self.n > 1 else 0.0
+
+    @property
+    def variancia(self):
+        return max(self.syy, 0.0) / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def inclinacao(self):
+        """°C/s pela reta de mínimos quadrados da janela."""
+        return self.sty / self.stt if self.n > 1 and self.stt > 0 else 0.0
+
+
+class Detector:
+    """Anomalias da telemetria; `alimentar()` devolve só os alarmes novos.
+
+    No dialeto de texto do FilaBottle_UNO a amostra não traz o alvo nem o
+    estado do aquecedor: o alvo vem de `temp_alvo` (os ajustes da tela) e o
+    aquecedor é deduzido pela mesma histerese do controlarRele.
+    """
+
+    def __init__(self, temp_alvo=260.0, banda=BANDA, desligar=None, janela=20.0,
+                 margem_disparo=15.0, subida_minima=0.1, inercia=30.0, margem_oscilacao=10.0,
+                 partida=30.0, referencia_aquecimento=None, fator_lento=1.5, silencio=5.0,
+                 alfa=0.3):
+        self.temp_alvo = temp_alvo
+        self.banda = banda
+        self.desligar = desligar
+        self.margem_disparo = margem_disparo
+        self.subida_minima = subida_minima
+        self.inercia = inercia
+        self.margem_oscilacao = margem_oscilacao
+        self.partida = partida
+        self.referencia_aquecimento = referencia_aquecimento
+        self.fator_lento = fator_lento
+        self.silencio = silencio
+        self.alfa = alfa
+        self.janela = Janela(janela)
+        self.ativos = {}
+        self.contagem = collections.Counter()
+        self.aquecimentos = []
+        self.desligado = False
+        self.amostras = 0
+        self._novos = []
+        self._limpar_estado()
+
+    def _limpar_estado(self):
+        self.janela.limpar()
+        self.ultima = None
+        self._ewma = None
+        self._subindo = None
+        self._extremo = None
+        self._extremo_anterior = None
+        self.amplitude = 0.0
+        self._em_regime = False
+        self._aquecedor = None
+        self._desde = None  # instante da última troca do aquecedor
+        self._inicio_subida = None
+        self._veio_do_frio = False
+
+    def rearmar(self):
+        """Esquece os alarmes e o estado (nova conexão ou sistema religado)."""
+        self.ativos.clear()
+        self.desligado = False
+        self._limpar_estado()
+
+    def reconectou(self):
+        """A porta voltou sozinha: a janela e o silêncio recomeçam, os alarmes continuam.
+
+        O UNO reinicia ligado quando a porta é reaberta; se uma emergência já
+        tinha desligado o sistema, o desligamento é mandado de novo.
+        """
+        self._limpar_estado()
+        if self.desligado and self.desligar:
+            self.desligar()
+
+    def _levantar(self, tipo, gravidade, instante, temperatura, mensagem):
+        if tipo in self.ativos:
+            return
+        alarme = Alarme(tipo, gravidade, instante, temperatura, mensagem)
+        self.ativos[tipo] = alarme
+        self.contagem[tipo] += 1
+        self._novos.append(alarme)
+        if gravidade == EMERGENCIA and not self.desligado:
+            self.desligado = True
+            if self.desligar:
+                self.desligar()
+
+    def _baixar(self, tipo):
+        # Emergências ficam até o rearmar(): o sistema foi desligado por causa delas
+        alarme = self.ativos.get(tipo)
+        if alarme is not None and alarme.gravidade != EMERGENCIA:
+            del self.ativos[tipo]
+
+    def alimentar(self, amostras, temp_alvo=None, aquecedor=None):
+        """Processa as amostras em ordem e devolve os alarmes que começaram nelas.
+
+        `aquecedor` substitui a histerese inferida no modo texto enquanto o
+        host comanda o relé (SET_HEATER, ver filabottle.autoajuste).
+        """
+        self._novos = []
+        if temp_alvo is not None:
+            self.temp_alvo = temp_alvo
+        for a in amostras:
+            self._amostra(a, aquecedor)
+        self.amostras += len(amostras)
+        return self._novos
+
+    def verificar(self, agora):
+        """Chamado no tick com a porta aberta: percebe quando as amostras param de chegar."""
+        self._novos = []
+        if self.ultima is not None and agora - self.ultima > self.silencio:
+            self._levantar("sem_leitura", EMERGENCIA, agora, None,
+                           f"Sem leitura de temperatura há {agora - self.ultima:.0f} s (termistor?)")
+        return self._novos
+
+    def _amostra(self, a, comandado=None):
+        t = a.instante
+        y = a.temperatura
+        self.ultima = t
+        if y is None or y == -1 or y != y or y < -20.0 or y > 500.0:
+            self._levantar("termistor", EMERGENCIA, t, y, f"Leitura inválida do termistor: {y}")
+            return
+        alvo = a.temp_alvo if a.temp_alvo is not None else self.temp_alvo
+        minimo = alvo - self.banda
+
+        # Aquecedor: o da telemetria, o comandado pelo host ou a histerese do firmware
+        aquecedor = a.aquecedor if a.aquecedor is not None else comandado
+        if aquecedor is None:
+            aquecedor = self._aquecedor
+            if aquecedor is None or (not aquecedor and y <= minimo):
+                aquecedor = y < alvo and not self.desligado
+            elif aquecedor and y >= alvo:
+                aquecedor = False
+        if aquecedor != self._aquecedor:
+            self._aquecedor = aquecedor
+            self._desde = t
+
+        janela = self.janela
+        janela.anexar(t, y)
+        # Inclinação e variância só são calculadas com a janela cheia e quando alguma regra precisa
+        cheia = t - janela.pontos[0][0] >= janela.segundos * 0.9
+        estavel = cheia and t - self._desde > self.inercia
+
+        # Disparo: passou do alvo, ou sobe sem aquecedor depois da inércia térmica
+        if y > alvo + self.margem_disparo:
+            self._levantar("disparo", EMERGENCIA, t, y,
+                           f"Temperatura {y:.1f} °C acima do alvo {alvo:.0f} °C + {self.margem_disparo:.0f}")
+        elif estavel and not aquecedor and janela.inclinacao > 0.5:
+            self._levantar("disparo", EMERGENCIA, t, y,
+                           f"Subindo {janela.inclinacao:.2f} °C/s com o aquecedor desligado (relé colado?)")
+
+        # Aquecedor ligado abaixo da faixa e nada de subir
+        if estavel and aquecedor and y < minimo and not self.desligado:
+            inclinacao = janela.inclinacao
+            if inclinacao < self.subida_minima:
+                self._levantar("aquecimento_parado", EMERGENCIA, t, y,
+                               f"Aquecedor ligado e temperatura parada em {y:.1f} °C ({inclinacao:+.2f} °C/s)")
+
+        # Sensor travado: nenhuma variação numa janela inteira (parado no ambiente é normal)
+        if cheia and y > 50.0:
+            variancia = janela.variancia
+            if variancia < 1e-6:
+                self._levantar("travado", ALERTA, t, y,
+                               f"Temperatura fixa em {y:.2f} °C há {janela.duracao:.0f} s")
+            elif variancia > 1e-4 and self.ativos:
+                self._baixar("travado")
+
+        # Picos e vales da média móvel: o pico a pico de cada meia oscilação
+        ewma = self._ewma = y if self._ewma is None else self._ewma + self.alfa * (y - self._ewma)
+        if self._extremo is None:
+            self._extremo = ewma
+        elif self._subindo is not False and ewma < self._extremo - 0.5:
+            if self._subindo:
+                self._meia_onda(self._extremo, t, alvo)
+            self._subindo = False
+            self._extremo = ewma
+        elif self._subindo is not True and ewma > self._extremo + 0.5:
+            if self._subindo is False:
+                self._meia_onda(self._extremo, t, alvo)
+            self._subindo = True
+            self._extremo = ewma
+        elif (ewma > self._extremo) if self._subindo else (ewma < self._extremo):
+            self._extremo = ewma
+        if y >= minimo and not self._em_regime:
+            # A subida não é oscilação: os extremos contam a partir daqui
+            self._em_regime = True
+            self._extremo_anterior = None
+        elif y < alvo - self.partida:
+            self._em_regime = False
+
+        # Tempo de subida de alvo - partida até a faixa, comparado com a referência
+        if y < alvo - self.partida:
+            self._inicio_subida = None
+            self._veio_do_frio = True
+        elif y < minimo:
+            if self._inicio_subida is None and self._veio_do_frio:
+                self._inicio_subida = t
+            if self._inicio_subida is not None and self.referencia_aquecimento and not self.desligado:
+                limite = self.referencia_aquecimento * self.fator_lento
+                if t - self._inicio_subida > limite:
+                    self._levantar("aquecimento_lento", ALERTA, t, y,
+                                   f"Aquecimento lento: {t - self._inicio_subida:.0f} s para subir"
+                                   f" {self.partida - self.banda:.0f} °C (referência {self.referencia_aquecimento:.0f} s)")
+        else:
+            if self._inicio_subida is not None:
+                duracao = t - self._inicio_subida
+                self.aquecimentos.append(duracao)
+                if self.referencia_aquecimento is None:
+                    self.referencia_aquecimento = duracao
+                self._baixar("aquecimento_lento")
+            self._inicio_subida = None
+            self._veio_do_frio = False
+
+    def _meia_onda(self, extremo, t, alvo):
+        """Um pico ou vale confirmado: compara com o extremo anterior."""
+        anterior = self._extremo_anterior
+        self._extremo_anterior = extremo
+        if anterior is None or not self._em_regime:
+            return
+        self.amplitude = abs(extremo - anterior)
+        if self.amplitude > self.banda + self.margem_oscilacao:
+            self._levantar("oscilacao", ALERTA, t, extremo,
+                           f"Oscilação de {self.amplitude:.1f} °C pico a pico (faixa {self.banda:.0f} °C)")
+        else:
+            self._baixar("oscilacao")
+
+    def resumo(self):
+        """Uma linha para a tela: alarmes ativos ou a amplitude atual."""
+        if self.ativos:
+            return " | ".join(a.mensagem for a in self.ativos.values())
+        texto = f"Sem alarmes (oscilação {self.amplitude:.1f} °C"
+        if self.referencia_aquecimento:
+            texto += f", subida {self.referencia_aquecimento:.0f} s"
+        return texto + ")"
@@ -0,0 +1,443 @@
+"""Autoajuste do aquecimento pelo host (requer NumPy).
+
+O FilaBottle_UNO controla o hotend por histerese fixa (liga em alvo - 5,
+desliga no alvo). Aqui o host assume o relé com SET_HEATER,ON/OFF, repetido
+a taxa fixa (o watchdog do firmware volta para a histerese se o host parar):
+
+1. Experimento de relé: aquece até o alvo e oscila em alvo ± `histerese`.
+2. Ajuste de um modelo de primeira ordem com tempo morto (FOPDT) a todo o
+   registro (aquecimento + oscilação), por mínimos quadrados vetorizados
+   sobre todos os atrasos candidatos.
+3. Proposta: ganhos PID (AMIGO) para o controle no host e a menor banda de
+   histerese que mantém o relé acima de `ciclo_minimo` s por ciclo.
+
+    python -m filabottle.autoajuste --porta COM3 --alvo 260
+    python -m filabottle.autoajuste --porta COM3 --alvo 260 --pid 0.05,0.0002,2.5
+    python -m filabottle.autoajuste --simulado --alvo 260     # contra o ModeloTermico
+
+O controle no host (ControlePID) é proporcional no tempo: a cada `janela` s
+o PID decide a fração de tempo com o relé ligado.
+"""
+import argparse
+import collections
+import math
+import time
+
+import numpy as np
+
+from filabottle.anomalias import BANDA
+
+Modelo = collections.namedtuple("Modelo", "ganho tau atraso ambiente erro")
+Ganhos = collections.namedtuple("Ganhos", "kp ki kd")
+Desempenho = collections.namedtuple("Desempenho", "aquecimento ripple sobressinal")
+
+WATCHDOG_HOST = 2.0  # WATCHDOG_HOST_MS do FilaBottle_UNO
+
+
+class Acionador:
+    """Manda SET_HEATER a taxa fixa: na troca e a cada `periodo` s (mantém o watchdog).
+
+    Sem amostra por mais de `sem_amostras` s (termistor solto, telemetria
+    parada) não renova às cegas: manda SET_HEATER,AUTO uma vez e volta a
+    acionar quando as amostras voltarem.
+    """
+
+    def __init__(self, enviar, periodo=0.5, sem_amostras=WATCHDOG_HOST):
+        self.enviar = enviar
+        self.periodo = periodo
+        self.sem_amostras = sem_amostras
+        self.ligado = None
+        self._ultimo_envio = float("-inf")
+        self._ultima_amostra = None
+        self.terminou = False
+
+    def _chegaram(self, amostras, agora):
+        if amostras or self._ultima_amostra is None:
+            self._ultima_amostra = agora
+
+    def _acionar(self, ligar, agora):
+        if agora - self._ultima_amostra > self.sem_amostras:
+            if self.ligado is not None:
+                self.enviar("SET_HEATER,AUTO")
+                self.ligado = None
+            return
+        if ligar != self.ligado or agora - self._ultimo_envio >= self.periodo:
+            self.enviar("SET_HEATER,ON" if ligar else "SET_HEATER,OFF")
+            self.ligado = ligar
+            self._ultimo_envio = agora
+
+    def parar(self):
+        """Devolve o relé à histerese do firmware."""
+        if not self.terminou:
+            self.terminou = True
+            self.enviar("SET_HEATER,AUTO")
+
+
+class ExperimentoRele(Acionador):
+    """Relé com histerese em torno do alvo; guarda (t, temperatura, relé) de cada amostra.
+
+    Termina depois de `ciclos` oscilações completas (a primeira, logo após
+    o aquecimento, não conta) ou em `tempo_max` s.
+    """
+
+    def __init__(self, enviar, alvo, histerese=2.0, ciclos=4, periodo=0.5, tempo_max=1800.0):
+        super().__init__(enviar, periodo)
+        self.alvo = alvo
+        self.histerese = histerese
+        self.ciclos = ciclos
+        self.tempo_max = tempo_max
+        self.t = []
+        self.temperatura = []
+        self.rele = []
+        self.desligamentos = []  # instante de cada ON -> OFF
+        self._inicio = None
+        self._ligar = True
+
+    def alimentar(self, amostras, agora):
+        if self.terminou:
+            return
+        if self._inicio is None:
+            self._inicio = agora
+        self._chegaram(amostras, agora)
+        for a in amostras:
+            if self._ligar and a.temperatura >= self.alvo + self.histerese:
+                self._ligar = False
+                self.desligamentos.append(a.instante)
+            elif not self._ligar and a.temperatura <= self.alvo - self.histerese:
+                self._ligar = True
+            self.t.append(a.instante)
+            self.temperatura.append(a.temperatura)
+            self.rele.append(self._ligar)
+        self._acionar(self._ligar, agora)
+        if len(self.desligamentos) > self.ciclos + 1 or agora - self._inicio > self.tempo_max:
+            self.parar()
+
+    @property
+    def progresso(self):
+        return f"relé: {max(len(self.desligamentos) - 1, 0)}/{self.ciclos} ciclos"
+
+    def resultado(self, ciclo_minimo=30.0):
+        """Modelo, ganhos e banda propostos a partir do registro."""
+        t = np.asarray(self.t)
+        y = np.asarray(self.temperatura)
+        u = np.asarray(self.rele, dtype=float)
+        modelo = ajustar_fopdt(t, y, u)
+        # Åström-Hägglund: Ku = 4d / (pi a) para um relé de amplitude d = 0,5 (0..1)
+        ku = pu = None
+        if len(self.desligamentos) >= 3:
+            inicio = self.desligamentos[1]
+            trecho = y[t >= inicio]
+            if trecho.size:
+                amplitude = (trecho.max() - trecho.min()) / 2
+                ku = 4 * 0.5 / (math.pi * amplitude) if amplitude > 0 else None
+                pu = float(np.mean(np.diff(self.desligamentos[1:])))
+        # O modelo do registro inteiro serve ao PID (aquecimento incluído); a
+        # histerese só vive perto do alvo, onde um ajuste da oscilação prevê melhor
+        regime = modelo
+        if len(self.desligamentos) >= 3:
+            trecho = t >= self.desligamentos[0]
+            regime = ajustar_fopdt(t[trecho], y[trecho], u[trecho])
+        banda, ripple, periodo = banda_proposta(regime, self.alvo, ciclo_minimo)
+        return {"modelo": modelo, "regime": regime, "ganhos": ganhos_amigo(modelo), "ku": ku, "pu": pu,
+                "banda": banda, "ripple_previsto": ripple, "periodo_previsto": periodo}
+
+
+class ControlePID(Acionador):
+    """PID no host com saída proporcional no tempo (fração da `janela` com o relé ligado).
+
+    A derivada é sobre a medição filtrada por `filtro` s (sem chute quando o
+    alvo muda, sem amplificar o ruído do termistor) e a integral só acumula
+    enquanto a saída não está saturada.
+    """
+
+    def __init__(self, enviar, alvo, ganhos, janela=10.0, filtro=2.0, periodo=0.5):
+        super().__init__(enviar, periodo)
+        self.alvo = alvo
+        self.ganhos = ganhos
+        self.janela = janela
+        self.filtro = filtro
+        self.integral = 0.0
+        self.derivada = 0.0
+        self.saida = 0.0
+        self._anterior = None
+        self._inicio_janela = None
+
+    @property
+    def progresso(self):
+        return f"PID no host: saída {self.saida:.0%}"
+
+    def _pid(self, t, y):
+        kp, ki, kd = self.ganhos
+        erro = self.alvo - y
+        if self._anterior is None:
+            self._anterior = (t, y)
+        dt = t - self._anterior[0]
+        if dt > 0:
+            filtrada = self._anterior[1] + (y - self._anterior[1]) * min(dt / self.filtro, 1.0)
+            self.derivada = -(filtrada - self._anterior[1]) / dt
+            self._anterior = (t, filtrada)
+            integral = self.integral + erro * dt
+            if 0.0 < kp * erro + ki * integral + kd * self.derivada < 1.0:
+                self.integral = integral
+        return min(max(kp * erro + ki * self.integral + kd * self.derivada, 0.0), 1.0)
+
+    def alimentar(self, amostras, agora):
+        if self.terminou:
+            return
+        self._chegaram(amostras, agora)
+        for a in amostras:
+            saida = self._pid(a.instante, a.temperatura)
+            if self._inicio_janela is None or a.instante - self._inicio_janela >= self.janela:
+                self._inicio_janela = a.instante
+                self.saida = saida
+        if self._inicio_janela is None:
+            return
+        self._acionar(agora - self._inicio_janela < self.saida * self.janela, agora)
+
+
+def _reamostrar(t, y, u, dt):
+    grade = np.arange(t[0], t[-1], dt)
+    # Relé: vale o último estado (retenção), temperatura: interpolação linear
+    indices = np.clip(np.searchsorted(t, grade, side="right") - 1, 0, len(u) - 1)
+    return grade, np.interp(grade, t, y), u[indices]
+
+
+def ajustar_fopdt(t, y, u, dt=1.0, atraso_max=60.0):
+    """Ajusta dy/dt = (ganho * u(t - atraso) + ambiente - y) / tau por erro de saída.
+
+    Para cada tau de uma grade, o relé filtrado x (primeira ordem) dá
+    y[k] = y0 phi^k + ganho x[k - d] + ambiente (1 - phi^k), linear em
+    (y0, ganho, ambiente): as equações normais 3x3 de todos os pares
+    (tau, atraso) são montadas de uma vez e resolvidas por np.linalg.solve
+    em lote. Ajustar a saída simulada, e não a derivada, não se deixa
+    enviesar pelo ruído nem pelo atraso do termistor.
+    """
+    t, y, u = _reamostrar(np.asarray(t, float), np.asarray(y, float), np.asarray(u, float), dt)
+    n = len(t)
+    atrasos = np.arange(0, min(int(atraso_max / dt), n // 3) + 1)
+    taus = np.geomspace(5.0, 2000.0, 80)
+    phi = np.exp(-dt / taus)
+    x = np.empty((n, len(taus)))
+    estado = np.zeros(len(taus))
+    for k in range(n):
+        x[k] = estado
+        estado = phi * estado + (1 - phi) * u[k]
+    decaimento = phi[None, :] ** np.arange(n)[:, None]  # (amostras, taus)
+    # x atrasado de d amostras (zero antes do início): (atrasos, amostras, taus)
+    xd = np.zeros((len(atrasos), n, len(taus)))
+    for i, d in enumerate(atrasos):
+        xd[i, d:] = x[:n - d]
+    colunas = [np.broadcast_to(decaimento, xd.shape), xd, np.broadcast_to(1 - decaimento, xd.shape)]
+    matriz = np.empty((len(atrasos), len(taus), 3, 3))
+    lado = np.empty((len(atrasos), len(taus), 3))
+    for i, a in enumerate(colunas):
+        lado[..., i] = np.einsum("dkt,k->dt", a, y)
+        for j in range(i, 3):
+            matriz[..., i, j] = matriz[..., j, i] = np.einsum("dkt,dkt->dt", a, colunas[j])
+    validos = np.abs(np.linalg.det(matriz)) > 1e-9
+    if not validos.any():
+        raise ValueError("o registro não excita o sistema (o relé nunca trocou?)")
+    coef = np.full(lado.shape, np.nan)
+    coef[validos] = np.linalg.solve(matriz[validos], lado[validos][..., None])[..., 0]
+    # Soma dos quadrados dos resíduos sem montar os resíduos: |y|² - 2 coef·lado + coef·M·coef
+    residuo = y @ y - 2 * (coef * lado).sum(-1) + np.einsum("dti,dtij,dtj->dt", coef, matriz, coef)
+    residuo[~validos | (coef[..., 1] <= 0)] = np.inf
+    d, i = np.unravel_index(np.argmin(residuo), residuo.shape)
+    return Modelo(ganho=coef[d, i, 1], tau=float(taus[i]), atraso=float(atrasos[d] * dt),
+                  ambiente=coef[d, i, 2], erro=math.sqrt(max(residuo[d, i], 0.0) / n))
+
+
+def ganhos_amigo(modelo):
+    """PID AMIGO (Åström e Hägglund) para o FOPDT; saída em fração de relé (0..1) por °C."""
+    ganho, tau, atraso = modelo.ganho, modelo.tau, max(modelo.atraso, 1.0)
+    kp = (0.2 + 0.45 * tau / atraso) / ganho
+    ti = (0.4 * atraso + 0.8 * tau) / (atraso + 0.1 * tau) * atraso
+    td = 0.5 * atraso * tau / (0.3 * atraso + tau)
+    return Ganhos(kp, kp / ti, kp * td)
+
+
+def simular_histerese(modelo, alvo, bandas, segundos=1800.0, dt=0.5, inicio=None):
+    """Histerese do firmware no modelo, para várias bandas de uma vez (um vetor por banda).
+
+    Devolve (ripple, período do relé) depois que cada banda entra em regime.
+    """
+    bandas = np.asarray(bandas, float)
+    passos = int(segundos / dt)
+    atraso = max(int(round(modelo.atraso / dt)), 0)
+    y = np.full(bandas.shape, alvo if inicio is None else inicio, float)
+    rele = np.zeros(bandas.shape, bool)
+    fila = np.zeros((atraso + 1,) + bandas.shape, bool)  # relé atrasado pelo tempo morto
+    fator = min(dt / modelo.tau, 1.0)
+    maximo = np.full(bandas.shape, -np.inf)
+    minimo = np.full(bandas.shape, np.inf)
+    trocas = np.zeros(bandas.shape)
+    metade = passos // 2
+    for passo in range(passos):
+        ligar = (~rele & (y <= alvo - bandas)) | (rele & (y < alvo))
+        if passo >= metade:
+            trocas += ligar & ~rele
+            np.maximum(maximo, y, out=maximo)
+            np.minimum(minimo, y, out=minimo)
+        rele = ligar
+        fila = np.roll(fila, 1, axis=0)
+        fila[0] = rele
+        y += (modelo.ganho * fila[-1] + modelo.ambiente - y) * fator
+    periodo = np.where(trocas > 0, (passos - metade) * dt / np.maximum(trocas, 1), np.inf)
+    return maximo - minimo, periodo
+
+
+def banda_proposta(modelo, alvo, ciclo_minimo=30.0):
+    """Menor banda (0,5 a 15 °C) cujo relé fica pelo menos `ciclo_minimo` s por ciclo."""
+    bandas = np.arange(0.5, 15.01, 0.5)
+    ripple, periodo = simular_histerese(modelo, alvo, bandas)
+    aceitas = np.flatnonzero(periodo >= ciclo_minimo)
+    i = int(aceitas[0]) if aceitas.size else len(bandas) - 1
+    return float(bandas[i]), float(ripple[i]), float(periodo[i])
+
+
+def desempenho(t, y, alvo, banda=BANDA, assentamento=120.0):
+    """Aquecimento (s até alvo - banda), ripple e sobressinal depois de `assentamento` s."""
+    t = np.asarray(t, float)
+    y = np.asarray(y, float)
+    chegou = np.flatnonzero(y >= alvo - banda)
+    if not chegou.size:
+        return Desempenho(None, None, None)
+    aquecimento = t[chegou[0]] - t[0]
+    regime = y[t >= t[chegou[0]] + assentamento]
+    if not regime.size:
+        return Desempenho(aquecimento, None, float(y.max() - alvo))
+    return Desempenho(aquecimento, float(regime.max() - regime.min()), float(y.max() - alvo))
+
+
+def simular(alvo, controle=None, segundos=1800.0, modelo=None, taxa=10.0):
+    """Roda o FirmwareUno do simulador com relógio virtual, sem pty.
+
+    `controle(enviar)` cria o ExperimentoRele/ControlePID; None deixa a
+    histerese do firmware. Devolve (t, temperatura, controlador).
+    """
+    from filabottle.protocolo import Amostra
+    from filabottle.simulador import FirmwareUno, ModeloTermico
+
+    modelo = modelo or ModeloTermico(tau_sensor=15.0)
+    firmware = FirmwareUno(modelo)
+    firmware.temp_alvo = alvo
+    relogio = [0.0]
+    firmware.relogio = lambda: relogio[0]
+    controlador = controle(firmware.comando) if controle else None
+    dt = 1.0 / taxa
+    ts = np.arange(0.0, segundos, dt)
+    ys = np.empty_like(ts)
+    for i, agora in enumerate(ts):
+        relogio[0] = agora
+        modelo.passo(dt, firmware.aquecedor)
+        y = ys[i] = modelo.leitura()
+        firmware.controlar(y)
+        if controlador is not None and not controlador.terminou:
+            controlador.alimentar([Amostra(agora, y)], agora)
+    return ts, ys, controlador
+
+
+def relatorio(resultado, alvo):
+    m = resultado["modelo"]
+    g = resultado["ganhos"]
+    linhas = [f"Modelo: ganho {m.ganho:.0f} °C, tau {m.tau:.0f} s, tempo morto {m.atraso:.0f} s,"
+              f" ambiente {m.ambiente:.0f} °C (erro {m.erro:.2f} °C)"]
+    if resultado["ku"]:
+        linhas.append(f"Relé: Ku {resultado['ku']:.3f}/°C, Pu {resultado['pu']:.0f} s")
+    linhas.append(f"PID (AMIGO): --pid {g.kp:.4f},{g.ki:.6f},{g.kd:.3f}")
+    ripple, periodo = simular_histerese(resultado["regime"], alvo, [BANDA])
+    linhas.append(f"Histerese atual ({BANDA:.0f} °C): ripple previsto {ripple[0]:.1f} °C, ciclo {periodo[0]:.0f} s")
+    linhas.append(f"Banda proposta (TEMP_ALVO_MAX - {resultado['banda']:.1f} no firmware):"
+                  f" ripple previsto {resultado['ripple_previsto']:.1f} °C, ciclo {resultado['periodo_previsto']:.0f} s")
+    return "\n".join(linhas)
+
+
+def _comparar(nome, t, y, alvo):
+    d = desempenho(t, y, alvo)
+    aquecimento = f"{d.aquecimento:.0f} s" if d.aquecimento is not None else "não chegou"
+    ripple = f"{d.ripple:.1f} °C" if d.ripple is not None else "-"
+    sobressinal = f"{d.sobressinal:+.1f} °C" if d.sobressinal is not None else "-"
+    print(f"  {nome:<22} aquecimento {aquecimento:>10}, ripple {ripple:>8}, pico {sobressinal:>8}")
+
+
+def main_simulado(args):
+    print(f"Planta: ModeloTermico com termistor atrasado (tau_sensor 15 s), alvo {args.alvo:.0f} °C")
+    _, _, experimento = simular(args.alvo, lambda enviar: ExperimentoRele(enviar, args.alvo, args.histerese),
+                                segundos=args.segundos)
+    resultado = experimento.resultado(args.ciclo_minimo)
+    print(relatorio(resultado, args.alvo))
+    print("A partir do ambiente, 30 min:")
+    t, y, _ = simular(args.alvo)
+    _comparar("antes (histerese 5 °C)", t, y, args.alvo)
+    t, y, _ = simular(args.alvo, lambda enviar: ControlePID(enviar, args.alvo, resultado["ganhos"]))
+    _comparar("depois (PID no host)", t, y, args.alvo)
+
+
+def main():
+    from filabottle.binario import BAUD_TEXTO, ProtocoloAutomatico
+    from filabottle.captura import abrir_porta
+    from filabottle.comandos import FilaComandos
+    from filabottle.conexao import ConexaoServico, ParserAssinante, e_servico
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--porta", help="porta serial do Arduino (ou o serviço, tcp://...)")
+    parser.add_argument("--alvo", type=float, default=260.0)
+    parser.add_argument("--histerese", type=float, default=2.0, help="± em torno do alvo no experimento")
+    parser.add_argument("--ciclo-minimo", type=float, default=30.0, help="período mínimo do relé (vida útil)")
+    parser.add_argument("--pid", metavar="KP,KI,KD", help="em vez do experimento, controla com estes ganhos")
+    parser.add_argument("--segundos", type=float, default=1800.0, help="limite do experimento")
+    parser.add_argument("--simulado", action="store_true", help="roda tudo contra o ModeloTermico, sem serial")
+    args = parser.parse_args()
+    if args.simulado:
+        return main_simulado(args)
+    if not args.porta:
+        parser.error("--porta é obrigatório sem --simulado")
+
+    if e_servico(args.porta):
+        porta, leitor = ConexaoServico(args.porta), ParserAssinante()
+    else:
+        porta = abrir_porta(args.porta, BAUD_TEXTO, timeout=0.1)
+        leitor = ProtocoloAutomatico(porta)
+    fila = FilaComandos(lambda linha: porta.write((linha + "\n").encode()))
+
+    def enviar(linha):
+        fila.enviar("SET_HEATER", linha, rastrear=False)
+
+    if args.pid:
+        controlador = ControlePID(enviar, args.alvo, Ganhos(*(float(g) for g in args.pid.split(","))))
+    else:
+        controlador = ExperimentoRele(enviar, args.alvo, args.histerese, tempo_max=args.segundos)
+    t, y = [], []
+    mostrado = 0.0
+    try:
+        while not controlador.terminou:
+            agora = time.monotonic()
+            amostras = leitor.alimentar(porta.read(max(1, porta.in_waiting)), agora)
+            controlador.alimentar(amostras, agora)
+            fila.bombear(agora)
+            for a in amostras:
+                t.append(a.instante)
+                y.append(a.temperatura)
+            if amostras and agora - mostrado >= 5.0:
+                mostrado = agora
+                print(f"{amostras[-1].temperatura:7.2f} °C  relé {'ON ' if controlador.ligado else 'OFF'}"
+                      f"  {controlador.progresso}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        controlador.parar()
+        limite = time.monotonic() + 1.0  # o AUTO espera o intervalo da chave SET_HEATER
+        while len(fila) and time.monotonic() < limite:
+            time.sleep(0.05)
+            fila.bombear()
+        porta.close()
+    if args.pid:
+        _comparar("PID no host", t, y, args.alvo)
+    elif len(controlador.desligamentos) >= 3:
+        print(relatorio(controlador.resultado(args.ciclo_minimo), args.alvo))
+    else:
+        print("Experimento interrompido antes de oscilar: nada a propor")
+
+
+if __name__ == "__main__":
+    main()
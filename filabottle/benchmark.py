@@ -0,0 +1,663 @@
+"""Microbenchmarks dos caminhos quentes dos clientes.
+
+Uso:
+    python -m filabottle.benchmark protocolo [--linhas N]
+    python -m filabottle.benchmark grafico
+    python -m filabottle.benchmark frota [--maquinas 1,8,32] [--segundos S]
+    python -m filabottle.benchmark partida [--vezes N] [--limite S] [--tk]
+    python -m filabottle.benchmark metricas [--linhas N]
+    python -m filabottle.benchmark replay [ARQUIVO.fbcap] [--segundos S] [--taxa HZ]
+    python -m filabottle.benchmark anomalias [--amostras N]
+    python -m filabottle.benchmark producao [--dias N] [--taxa HZ]
+    python -m filabottle.benchmark tela [--amostras N]
+    python -m filabottle.benchmark cadencia [--segundos S]
+"""
+import argparse
+import io
+import math
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from filabottle.grafico import HistoricoGrafico, quadro
+from filabottle.protocolo import Parser
+
+
+def _fluxo(linhas, tamanho_pedaco=4096):
+    """Gera um fluxo misto (DATA, Temperatura e mensagens de log) cortado em pedaços."""
+    texto = []
+    for i in range(linhas):
+        temp = 200 + (i % 600) / 10
+        if i % 50 == 0:
+            texto.append("Aquecedor LIGADO: Temperatura abaixo do mínimo.\r\n")
+        elif i % 2:
+            texto.append(f"Temperatura: {temp:.2f} °C\r\n")
+        else:
+            texto.append(f"DATA,{temp:.2f},1,0,1,40.00,260.00,180.00\r\n")
+    dados = "".join(texto).encode("utf-8")
+    return [dados[i:i + tamanho_pedaco] for i in range(0, len(dados), tamanho_pedaco)]
+
+
+def _antigo(pedacos):
+    """Parse como era feito em atualizar_display e read_from_arduino."""
+    amostras = []
+    pendente = b""
+    for pedaco in pedacos:
+        linhas = (pendente + pedaco).split(b"\n")
+        pendente = linhas.pop()
+        for bruta in linhas:
+            linha = bruta.decode("utf-8").strip()
+            if linha.startswith("Temperatura:"):
+                amostras.append(float(linha.split(":")[1].strip().replace(" °C", "")))
+            elif linha.startswith("DATA,"):
+                parts = linha.split(",")
+                if len(parts) == 8:
+                    # Conversões que update_ui fazia em seguida
+                    amostras.append((float(parts[1]), parts[2] == "1", parts[3] == "1", parts[4] == "1",
+                                     float(parts[5]), float(parts[6]), float(parts[7])))
+    return len(amostras)
+
+
+def _novo(pedacos):
+    parser = Parser()
+    amostras = 0
+    for pedaco in pedacos:
+        amostras += len(parser.alimentar(memoryview(pedaco)))
+    return amostras
+
+
+class _PortaFalsa(io.RawIOBase):
+    """Imita serial.Serial: RawIOBase sem peek, então readline() lê byte a byte."""
+
+    def __init__(self, dados):
+        self._dados = memoryview(dados)
+        self._pos = 0
+
+    @property
+    def in_waiting(self):
+        return len(self._dados) - self._pos
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        n = min(len(destino), self.in_waiting)
+        destino[:n] = self._dados[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+
+def _antigo_readline(pedacos):
+    """Caminho antigo completo: readline() na porta e parse de cada linha."""
+    porta = _PortaFalsa(b"".join(pedacos))
+    amostras = 0
+    while porta.in_waiting:
+        amostras += _antigo([porta.readline()])
+    return amostras
+
+
+def _novo_em_bloco(pedacos):
+    """Caminho novo completo: read(in_waiting) na porta e Parser."""
+    porta = _PortaFalsa(b"".join(pedacos))
+    parser = Parser()
+    amostras = 0
+    while porta.in_waiting:
+        amostras += len(parser.alimentar(porta.read(min(porta.in_waiting, 4096))))
+    return amostras
+
+
+def _medir(funcao, pedacos, repeticoes=5):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(pedacos)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def bench_protocolo(args):
+    pedacos = _fluxo(args.linhas)
+    assert _antigo(pedacos) == _novo(pedacos) == _antigo_readline(pedacos) == _novo_em_bloco(pedacos)
+    print(f"{args.linhas} linhas em pedaços de 4 KiB")
+    for nome, antigo, novo in (("só parse", _antigo, _novo),
+                               ("porta + parse", _antigo_readline, _novo_em_bloco)):
+        t_antigo = _medir(antigo, pedacos)
+        t_novo = _medir(novo, pedacos)
+        print(f"  {nome}:")
+        print(f"    antigo: {args.linhas / t_antigo:12,.0f} linhas/s")
+        print(f"    Parser: {args.linhas / t_novo:12,.0f} linhas/s  ({t_antigo / t_novo:.2f}x)")
+
+
+def bench_grafico(args):
+    historico = HistoricoGrafico()
+    print("Histórico do gráfico (canvas de 300 px):")
+    anexadas = 0
+    for total in (1_000, 100_000, 1_000_000):
+        inicio = time.perf_counter()
+        for i in range(anexadas, total):
+            temperatura = 252.5 + 8 * math.sin(i / 50)
+            historico.anexar(i * 0.1, temperatura, temperatura >= 250)
+        por_amostra = (time.perf_counter() - inicio) / (total - anexadas)
+        anexadas = total
+        redesenho = _medir(lambda _: quadro(historico, 300, 120, (245, 260)), None, repeticoes=20)
+        print(f"  {total:>9,} amostras: anexar {por_amostra * 1e6:5.2f} µs/amostra, "
+              f"quadro {redesenho * 1000:5.2f} ms")
+
+
+def bench_frota(args):
+    from filabottle.frota import medir
+
+    medir([int(n) for n in args.maquinas.split(",")], segundos=args.segundos)
+
+
+def bench_metricas(args):
+    from filabottle.metricas import Pipeline
+
+    # 4 KiB: leitura em bloco; 64 bytes: ~1 linha por chamada, o pior caso da instrumentação
+    for tamanho in (4096, 64):
+        pedacos = _fluxo(args.linhas, tamanho)
+
+        def puro(pedacos):
+            parser = Parser()
+            for pedaco in pedacos:
+                parser.alimentar(pedaco)
+
+        def medido(pedacos):
+            parser = Parser()
+            metricas = Pipeline()
+            for pedaco in pedacos:
+                metricas.alimentar(parser, pedaco)
+
+        t_puro = _medir(puro, pedacos)
+        t_medido = _medir(medido, pedacos)
+        custo = (t_medido - t_puro) / len(pedacos)
+        print(f"pedaços de {tamanho} bytes ({len(pedacos)} chamadas):")
+        print(f"  sem métricas: {args.linhas / t_puro:12,.0f} linhas/s")
+        print(f"  com métricas: {args.linhas / t_medido:12,.0f} linhas/s"
+              f"  ({(t_medido / t_puro - 1) * 100:+.1f}%, {custo * 1e6:+.2f} µs por chamada)")
+    metricas = Pipeline()
+    for i in range(10_000):
+        metricas.ui.observar(i * 1e-6)
+    inicio = time.perf_counter()
+    texto = metricas.registro.texto()
+    print(f"exportação: {(time.perf_counter() - inicio) * 1000:.2f} ms, {len(texto)} bytes")
+
+
+def _capturar_simulador(caminho, segundos, taxa):
+    """Grava uma captura do simulador, com a negociação do modo binário."""
+    from filabottle.binario import BAUD_TEXTO, ProtocoloAutomatico
+    from filabottle.captura import Captura, abrir_porta
+    from filabottle.simulador import Simulador
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        link = os.path.join(diretorio, "sim")
+        simulador = Simulador("uno", taxa=taxa, link=link)
+        simulador.start()
+        time.sleep(0.2)
+        captura = Captura(caminho)
+        porta = abrir_porta(link, BAUD_TEXTO, timeout=0.05, captura=captura)
+        parser = ProtocoloAutomatico(porta)
+        fim = time.monotonic() + segundos
+        while time.monotonic() < fim:
+            parser.alimentar(porta.read(max(1, porta.in_waiting)), time.monotonic())
+        porta.close()
+        captura.fechar()
+        simulador.parar()
+    return parser.modo
+
+
+def bench_replay(args):
+    from filabottle.binario import ProtocoloAutomatico
+    from filabottle.captura import Replay, resumo
+    from filabottle.metricas import Pipeline
+
+    if args.arquivo is None:
+        with tempfile.TemporaryDirectory() as diretorio:
+            args.arquivo = os.path.join(diretorio, "simulador.fbcap")
+            modo = _capturar_simulador(args.arquivo, args.segundos, args.taxa)
+            print(f"captura do simulador: {args.segundos:.0f} s a {args.taxa:.0f} Hz, modo {modo}")
+            return bench_replay(args)
+    arquivo = args.arquivo
+    r = resumo(arquivo)
+    print(f"{arquivo}: {r['duracao']:.1f} s, {r['recebidos'][0]} leituras, {r['recebidos'][1]:,} bytes")
+
+    # Cada read() do replay devolve um pedaço como veio em campo; o redesenho
+    # a cada leitura com amostras é o pior caso (o Kivy drena uma leitura por tick)
+    for nome, desenhar in (("parser", False), ("parser + gráfico", True)):
+        porta = Replay(arquivo, velocidade=None, timeout=0)
+        parser = ProtocoloAutomatico(porta)
+        metricas = Pipeline()
+        historico = HistoricoGrafico()
+        leituras = amostras = 0
+        inicio = time.perf_counter()
+        while not porta.terminou:
+            dados = porta.read(max(1, porta.in_waiting))
+            leituras += 1
+            lote = metricas.alimentar(parser, dados, time.monotonic())
+            if desenhar and lote:
+                for a in lote:
+                    historico.anexar(a.instante, a.temperatura, bool(a.motor))
+                quadro(historico, 300, 120, (245, 260))
+            amostras += len(lote)
+        duracao = time.perf_counter() - inicio
+        print(f"  {nome} ({parser.modo}): {amostras / duracao:12,.0f} amostras/s,"
+              f" {leituras / duracao:10,.0f} leituras/s, {r['duracao'] / duracao:8,.0f}x o tempo real")
+
+
+def bench_anomalias(args):
+    from filabottle.anomalias import Detector
+    from filabottle.metricas import Pipeline
+    from filabottle.protocolo import Amostra
+    from filabottle.simulador import ModeloTermico
+
+    # Hotend sob a histerese do firmware a 20 Hz (o modo binário), em lotes de 5 como nas leituras
+    modelo = ModeloTermico()
+    aquecedor = False
+    amostras = []
+    for i in range(args.amostras):
+        t = i * 0.05
+        temperatura = modelo.leitura()
+        if not aquecedor and temperatura <= 255:
+            aquecedor = True
+        elif aquecedor and temperatura >= 260:
+            aquecedor = False
+        modelo.passo(0.05, aquecedor)
+        amostras.append(Amostra(t, temperatura, aquecedor, temperatura >= 180, True, 40.0, 260.0, 180.0))
+    lotes = [amostras[i:i + 5] for i in range(0, len(amostras), 5)]
+
+    def detectar(lotes):
+        detector = Detector()
+        for lote in lotes:
+            detector.alimentar(lote)
+            detector.verificar(lote[-1].instante)
+
+    t = _medir(detectar, lotes)
+    print(f"Detector: {t / len(amostras) * 1e6:.2f} µs por amostra ({len(amostras) / t:,.0f} amostras/s,"
+          f" {t / len(amostras) * 20 * 100:.4f}% de um núcleo a 20 Hz)")
+
+    # No caminho de leitura: parse medido, sem detector, com ele em cada leitura
+    # (como era) e só enfileirando para o tique que roda o detector (como é)
+    pedacos = _fluxo(args.amostras, 64)
+
+    def ler(pedacos, detector=None, fila=None):
+        parser = Parser()
+        metricas = Pipeline()
+        for pedaco in pedacos:
+            lote = metricas.alimentar(parser, pedaco)
+            if detector:
+                detector.alimentar(lote)
+            if fila is not None:
+                fila.extend(lote)
+                if len(fila) >= 4:  # o tique leva a fila a cada 0,2 s (4 amostras a 20 Hz)
+                    fila = []
+
+    t_puro = _medir(ler, pedacos)
+    t_detector = _medir(lambda p: ler(p, Detector()), pedacos)
+    t_fila = _medir(lambda p: ler(p, fila=[]), pedacos)
+    print(f"leitura de 64 bytes (~1 linha): {t_puro / len(pedacos) * 1e6:.2f} µs sem detector,"
+          f" {t_detector / len(pedacos) * 1e6:.2f} µs com ele na leitura ({(t_detector / t_puro - 1) * 100:+.1f}%),"
+          f" {t_fila / len(pedacos) * 1e6:.2f} µs enfileirando para o tique ({(t_fila / t_puro - 1) * 100:+.1f}%)")
+
+
+def _corrida_sintetica(diretorio, inicio, horas, taxa, velocidade):
+    """Grava uma corrida do dialeto de texto: aquecimento, histerese e uma pausa no meio."""
+    import numpy as np
+
+    from filabottle.gravador import Gravador
+    from filabottle.protocolo import Amostra
+
+    gravador = Gravador(diretorio, capacidade=1 << 17, nome=time.strftime("%Y%m%d-%H%M%S", time.localtime(inicio)))
+    t = np.arange(0.0, horas * 3600, 1.0 / taxa)
+    temperatura = 25 + 235 * (1 - np.exp(-t / 150)) - 2.5 * (1 + np.sin(t / 8))
+    # Uma hora sem aquecer no meio do turno: esfria e o motor para
+    pausa = (t > horas * 1800) & (t < horas * 1800 + 3600)
+    temperatura[pausa] = np.maximum(25, 255 - (t[pausa] - horas * 1800) * 0.5)
+    instante = t + inicio - gravador._epoca
+    for a in range(0, len(t), 50_000):
+        b = a + 50_000
+        # Como o cliente Tk: o texto só traz a temperatura, a velocidade vem da tela
+        gravador.anexar([Amostra(i, y) for i, y in zip(instante[a:b].tolist(), temperatura[a:b].tolist())],
+                        velocidade=velocidade, temp_alvo=260.0, temp_motor=180.0)
+    gravador.fechar()
+    motor = temperatura >= 180
+    return float(np.sum(motor[:-1] * np.diff(t)) * velocidade / 1000)
+
+
+def bench_producao(args):
+    from filabottle.producao import atualizar
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        print(f"Gravando {args.dias} dias de 16 h a {args.taxa:g} Hz...")
+        hoje = time.localtime()
+
+        def as_7h(dia):
+            return time.mktime((hoje.tm_year, hoje.tm_mon, hoje.tm_mday - args.dias + dia, 7, 0, 0, 0, 0, -1))
+
+        metros = 0.0
+        for dia in range(args.dias):
+            metros += _corrida_sintetica(diretorio, as_7h(dia), 16, args.taxa, 30.0 + dia % 5 * 5)
+        for nome in ("tudo", "nada novo"):
+            t0 = time.perf_counter()
+            ledger, lidas = atualizar(diretorio)
+            print(f"  {nome:<10} {time.perf_counter() - t0:6.2f} s, {lidas:>10,} amostras lidas")
+        metros += _corrida_sintetica(diretorio, as_7h(args.dias), 16, args.taxa, 40.0)
+        t0 = time.perf_counter()
+        ledger, lidas = atualizar(diretorio)
+        print(f"  {'+1 dia':<10} {time.perf_counter() - t0:6.2f} s, {lidas:>10,} amostras lidas")
+        total = sum(c["totais"][3] for c in ledger["corridas"].values())
+        turnos = sum(sum(v[3] for v in c["turnos"].values()) for c in ledger["corridas"].values())
+        print(f"  metros: {total:,.1f} (por turno {turnos:,.1f}, esperado {metros:,.1f})")
+
+
+class _Widget:
+    """Widget de mentira: conta as escritas (o custo real é o do toolkit, que aqui não existe)."""
+    escritas = 0
+
+    def set(self, valor):
+        self.valor = valor
+
+    def config(self, **opcoes):
+        self.opcoes = opcoes
+
+    def __setattr__(self, nome, valor):
+        _Widget.escritas += 1
+        object.__setattr__(self, nome, valor)
+
+
+def _amostras_tela(n):
+    from filabottle.protocolo import Amostra
+    from filabottle.simulador import ModeloTermico
+
+    # Hotend em regime sob a histerese do firmware, a 10 Hz
+    modelo = ModeloTermico(temperatura=255.0)
+    aquecedor = False
+    amostras = []
+    for i in range(n):
+        temperatura = modelo.leitura()
+        if not aquecedor and temperatura <= 255:
+            aquecedor = True
+        elif aquecedor and temperatura >= 260:
+            aquecedor = False
+        modelo.passo(0.1, aquecedor)
+        amostras.append(Amostra(i * 0.1, temperatura, aquecedor, temperatura >= 180, True, 40.0, 260.0, 180.0))
+    return amostras
+
+
+def _tk_antes(amostras, w):
+    # O tique do cliente Tk antes da camada de desenho (5 quadros/s, 2 amostras por quadro)
+    for i in range(1, len(amostras), 2):
+        valor = amostras[i].temperatura
+        cor = "#00FF00"
+        if valor > 36:
+            intensidade = min(int((valor - 36) * 4), 255)
+            cor = f"#{intensidade:02x}{(255-intensidade):02x}00"
+        w["temperatura"].set(f"{valor:.2f} °C")
+        w["display"].config(fg=cor)
+        w["motor"].set(f"{40.0:.2f} mm/s" if valor >= 180 else "OFF")
+        w["contadores"].set(f"Amostras: {i // 10}  Perdidas: 0")
+
+
+def _tk_depois(amostras, w):
+    from filabottle.tela import COR_HEX, Tela, indice_cor
+
+    tela = Tela()
+    display = w["display"]
+
+    def pintar(indice):
+        display.config(fg=COR_HEX[indice])
+
+    for i in range(1, len(amostras), 2):
+        valor = amostras[i].temperatura
+        tela.definir("temperatura", f"{valor:.2f} °C", w["temperatura"].set)
+        tela.definir("cor", indice_cor(valor), pintar)
+        tela.definir("motor", f"{40.0:.2f} mm/s" if valor >= 180 else "OFF", w["motor"].set)
+        tela.definir("contadores", f"Amostras: {i // 10}  Perdidas: 0", w["contadores"].set)
+        tela.desenhar()
+
+
+def _kivy_antes(amostras, w):
+    # update_ui do app Kivy original: reescreve todos os widgets a cada amostra
+    for a in amostras:
+        w["display"].text = f"{float(a.temperatura):.2f} °C"
+        for chave, valor in (("vel", a.velocidade), ("temp_alvo", a.temp_alvo), ("temp_motor", a.temp_motor)):
+            w[chave].param_value = float(valor)
+            w[chave].text = f"{w[chave].param_value:.1f}"
+        for chave, ligado in (("sys", a.sistema), ("heater", a.aquecedor), ("motor", a.motor)):
+            w[chave].background_color = (0.2, 0.8, 0.2, 1) if ligado else (0.8, 0.2, 0.2, 1)
+            w[chave].text = "Desligar" if ligado else "Ligar"
+
+
+def _kivy_por_chave(amostras, w):
+    # Depois da leitura coalescida (user-002): diff por chave, escrita imediata
+    estado = {}
+
+    def mudou(chave, valor):
+        if estado.get(chave) == valor:
+            return False
+        estado[chave] = valor
+        return True
+
+    for a in amostras:
+        if mudou("temp", a.temperatura):
+            w["display"].text = f"{float(a.temperatura):.2f} °C"
+        for chave, valor in (("vel", a.velocidade), ("temp_alvo", a.temp_alvo), ("temp_motor", a.temp_motor)):
+            if mudou(chave, valor):
+                w[chave].param_value = float(valor)
+                w[chave].text = f"{w[chave].param_value:.1f}"
+        for chave, ligado in (("sys", a.sistema), ("heater", a.aquecedor), ("motor", a.motor)):
+            if mudou(chave, bool(ligado)):
+                w[chave].background_color = (0.2, 0.8, 0.2, 1) if ligado else (0.8, 0.2, 0.2, 1)
+                w[chave].text = "Desligar" if ligado else "Ligar"
+
+
+def _kivy_depois(amostras, w):
+    from filabottle.tela import COR_RGBA, indice_cor
+
+    # O update_ui atual: o Kivy já redesenha uma vez por quadro, então sem Tela;
+    # compara por grupo e o caso comum (só a temperatura mudou) para cedo
+    texto = cor = None
+    ajustes = estados = (None, None, None)
+    controles = ("vel", "temp_alvo", "temp_motor")
+    botoes = ("sys", "heater", "motor")
+    for a in amostras:
+        temperatura = float(a.temperatura)
+        novo = f"{temperatura:.2f} °C"
+        if novo != texto:
+            texto = w["display"].text = novo
+            indice = indice_cor(temperatura)
+            if indice != cor:
+                cor = indice
+                w["display"].color = COR_RGBA[indice]
+        novos = (a.velocidade, a.temp_alvo, a.temp_motor)
+        if novos != ajustes:
+            for chave, valor, antes in zip(controles, novos, ajustes):
+                if valor != antes:
+                    w[chave].param_value = float(valor)
+                    w[chave].text = f"{w[chave].param_value:.1f}"
+            ajustes = novos
+        novos = (a.sistema, a.aquecedor, a.motor)
+        if novos != estados:
+            for chave, ligado, antes in zip(botoes, novos, estados):
+                if antes is None or bool(ligado) != bool(antes):
+                    w[chave].background_color = (0.2, 0.8, 0.2, 1) if ligado else (0.8, 0.2, 0.2, 1)
+                    w[chave].text = "Desligar" if ligado else "Ligar"
+            estados = novos
+
+
+def bench_tela(args):
+    amostras = _amostras_tela(args.amostras)
+    por_mil = 1000 / len(amostras)
+
+    def medir(nome, antes, depois, widgets, intermediarios=()):
+        for rotulo, funcao in (("antes", antes),) + intermediarios + (("depois", depois),):
+            _Widget.escritas = 0
+            inicio = time.process_time()
+            funcao(amostras, widgets())
+            cpu = time.process_time() - inicio
+            escritas = f"{_Widget.escritas * por_mil:6.0f} escritas" if _Widget.escritas else ""
+            print(f"  {nome:<25} {rotulo:<9} {cpu * por_mil * 1000:7.2f} ms de CPU por 1000 amostras {escritas}")
+
+    medir("Tk (widgets de mentira)", _tk_antes, _tk_depois,
+          lambda: {nome: _Widget() for nome in ("temperatura", "display", "motor", "contadores")})
+    try:
+        import tkinter as tk
+        raiz = tk.Tk()
+    except Exception:  # sem tela (ou sem Tk): fica só a medida com os widgets de mentira
+        print("  Tk real: sem tela, não medido")
+    else:
+        def widgets_tk():
+            variaveis = {nome: tk.StringVar(raiz) for nome in ("temperatura", "motor", "contadores")}
+            variaveis["display"] = tk.Label(raiz, textvariable=variaveis["temperatura"])
+            variaveis["display"].pack()
+            return variaveis
+
+        medir("Tk", _tk_antes, _tk_depois, widgets_tk)
+        raiz.destroy()
+    medir("Kivy (widgets de mentira)", _kivy_antes, _kivy_depois,
+          lambda: {nome: _Widget() for nome in ("display", "vel", "temp_alvo", "temp_motor", "sys", "heater", "motor")},
+          (("por chave", _kivy_por_chave),))
+
+
+_MARCO = rb"^\s*([\d.]+)\s+%s$"
+
+_TK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Client", "Fila Pet Controller Alpha 0.1.py")
+
+
+def _marco(comando, evento):
+    """Roda uma partida a frio e devolve os segundos até o marco do relatório (ou None)."""
+    saida = subprocess.run(comando, capture_output=True, timeout=60).stdout
+    m = re.search(_MARCO % evento.encode(), saida, re.M)
+    return float(m.group(1)) / 1000 if m else None
+
+
+def bench_partida(args):
+    import importlib.util
+
+    from filabottle.partida import LIMITE_PRIMEIRA_LEITURA, LIMITES_IMPORTACAO
+    from filabottle.simulador import Simulador
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        porta = os.path.join(diretorio, "sim")
+        Simulador("uno", taxa=10, link=porta).start()
+        time.sleep(0.2)
+        partida = [sys.executable, "-m", "filabottle.partida", "--limite", "60"]
+        # (nome, comando, marco, limite); a janela do Tk não tem limite: soma o tempo do servidor gráfico
+        casos = [("sem interface", partida + ["--porta", porta], "primeira temperatura",
+                  args.limite or LIMITE_PRIMEIRA_LEITURA),
+                 ("Tk (importação)", partida + ["--cliente", "tk"], "cliente importado", LIMITES_IMPORTACAO["tk"])]
+        if importlib.util.find_spec("kivy") is None:
+            print("Kivy: não instalado, importação não medida")
+        else:
+            casos.append(("Kivy (importação)", partida + ["--cliente", "kivy"], "cliente importado",
+                          LIMITES_IMPORTACAO["kivy"]))
+        if args.tk:
+            if sys.platform != "win32" and not os.environ.get("DISPLAY"):
+                print("Tk: sem DISPLAY, pulado")
+            else:
+                casos.append(("Tk", [sys.executable, _TK, "--profile-startup", "--sair", "--porta", porta],
+                              "primeira temperatura", None))
+        regressao = False
+        for nome, comando, evento, limite in casos:
+            tempos = [_marco(comando, evento) for _ in range(args.vezes)]
+            validos = [t for t in tempos if t is not None]
+            if not validos:
+                print(f"{nome}: {evento} não chegou")
+                regressao = True
+                continue
+            mediana = statistics.median(validos)
+            print(f"{nome}: {evento} em {mediana * 1000:.0f} ms (mediana de {len(validos)},"
+                  f" máx. {max(validos) * 1000:.0f} ms)")
+            if limite is not None and mediana > limite:
+                print(f"REGRESSÃO: acima do limite de {limite * 1000:.0f} ms")
+                regressao = True
+    if regressao:
+        sys.exit(1)
+
+
+def bench_cadencia(args):
+    """Passos do motor e telemetria por segundo do loop() do FilaBottle_UNO, em texto e em binário.
+
+    Relógio virtual, uma volta do loop() por ms. O controle tem que ficar
+    em 1/INTERVALO_CONTROLE_MS nos dois modos; o BIN só muda a telemetria.
+    """
+    from filabottle.simulador import FirmwareUno, ModeloTermico
+
+    falhas = []
+    controle = {}
+    for binario in (False, True):
+        firmware = FirmwareUno(ModeloTermico(temperatura=200.0, ruido=0.0))  # acima do temp_motor: o motor gira
+        if binario:
+            firmware.comando("BIN,115200")
+        for ms in range(int(args.segundos * 1000)):
+            firmware.relogio = lambda: ms / 1000
+            firmware.modelo.passo(0.001, firmware.aquecedor)
+            firmware.loop(ms, firmware.modelo.leitura())
+        passos = firmware.passos / args.segundos
+        quadros = firmware.quadros / args.segundos
+        esperado_passos = 1000 / FirmwareUno.INTERVALO_CONTROLE_MS
+        esperado_quadros = 1000 / (FirmwareUno.INTERVALO_BINARIO_MS if binario else FirmwareUno.INTERVALO_TEXTO_MS)
+        modo = "binário" if binario else "texto"
+        controle[modo] = firmware.passos
+        print(f"{modo:<8} passos do motor {passos:5.2f}/s (esperado {esperado_passos:g}),"
+              f" telemetria {quadros:5.2f}/s (esperado {esperado_quadros:g})")
+        # Uma volta a menos no fim da janela é arredondamento, não regressão
+        if abs(passos - esperado_passos) * args.segundos > 1:
+            falhas.append(f"{modo}: controle a {passos:.2f}/s")
+        if abs(quadros - esperado_quadros) * args.segundos > 1:
+            falhas.append(f"{modo}: telemetria a {quadros:.2f}/s")
+    if controle["texto"] != controle["binário"]:
+        falhas.append(f"o controle muda com o modo ({controle['texto']} passos em texto,"
+                      f" {controle['binário']} em binário)")
+    if falhas:
+        print("Cadência fora do esperado: " + "; ".join(falhas))
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="caso", required=True)
+    p = sub.add_parser("protocolo", help="Parser de telemetria contra o parse antigo")
+    p.add_argument("--linhas", type=int, default=200_000)
+    p.set_defaults(funcao=bench_protocolo)
+    p = sub.add_parser("grafico", help="Custo de anexar e redesenhar com histórico crescente")
+    p.set_defaults(funcao=bench_grafico)
+    p = sub.add_parser("frota", help="CPU do supervisor por máquina com simuladores a 10 Hz")
+    p.add_argument("--maquinas", default="1,8,32")
+    p.add_argument("--segundos", type=float, default=10.0)
+    p.set_defaults(funcao=bench_frota)
+    p = sub.add_parser("partida", help="Primeira temperatura e importação dos clientes, com limites de regressão")
+    p.add_argument("--vezes", type=int, default=5)
+    p.add_argument("--limite", type=float, help="segundos, sem interface (padrão: partida.LIMITE_PRIMEIRA_LEITURA)")
+    p.add_argument("--tk", action="store_true", help="mede também o cliente Tk (precisa de tela)")
+    p.set_defaults(funcao=bench_partida)
+    p = sub.add_parser("metricas", help="Custo da instrumentação no parse e da exportação")
+    p.add_argument("--linhas", type=int, default=200_000)
+    p.set_defaults(funcao=bench_metricas)
+    p = sub.add_parser("replay", help="Vazão do parser e do gráfico reproduzindo uma captura")
+    p.add_argument("arquivo", nargs="?", help="captura (padrão: grava uma do simulador)")
+    p.add_argument("--segundos", type=float, default=10.0, help="duração da captura do simulador")
+    p.add_argument("--taxa", type=float, default=200.0, help="amostras/s do simulador")
+    p.set_defaults(funcao=bench_replay)
+    p = sub.add_parser("anomalias", help="Custo do detector de anomalias por amostra e na leitura")
+    p.add_argument("--amostras", type=int, default=200_000)
+    p.set_defaults(funcao=bench_anomalias)
+    p = sub.add_parser("producao", help="Relatório de produção sobre meses de gravações, cheio e incremental")
+    p.add_argument("--dias", type=int, default=30)
+    p.add_argument("--taxa", type=float, default=2.0, help="amostras/s das gravações")
+    p.set_defaults(funcao=bench_producao)
+    p = sub.add_parser("tela", help="CPU e escritas em widgets por 1000 amostras, antes e depois da camada de desenho")
+    p.add_argument("--amostras", type=int, default=100_000)
+    p.set_defaults(funcao=bench_tela)
+    p = sub.add_parser("cadencia", help="Controle e telemetria do loop() do firmware em texto e binário")
+    p.add_argument("--segundos", type=float, default=60.0)
+    p.set_defaults(funcao=bench_cadencia)
+    args = parser.parse_args()
+    args.funcao(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Modo binário opcional do protocolo de telemetria.
+
+O host pede o modo com a linha de texto "BIN,<baud>". O firmware que conhece
+o modo responde "BIN,OK,<baud>", troca a velocidade da serial e passa a
+mandar quadros binários; firmware antigo ignora o comando e o host continua
+no protocolo de texto. Comandos do host (SET, SET_TEMP, ...) continuam em texto
+nos dois modos.
+
+Cada quadro é um struct little-endian com CRC-16/CCITT no final, codificado
+em COBS e terminado por 0x00. Como o COBS garante que não há 0x00 dentro do
+quadro, um byte corrompido custa no máximo um quadro: o parser se
+ressincroniza no próximo 0x00.
+"""
+import binascii
+import re
+import struct
+import time
+
+from filabottle.protocolo import Amostra, Parser, _nova_amostra
+
+BAUD_TEXTO = 9600
+BAUD_BINARIO = 115200
+
+QUADRO_TELEMETRIA = 1
+QUADRO_CONFIRMACAO = 2
+
+# tipo, seq, millis, temperatura, estados, velocidade, temp_alvo, temp_motor
+TELEMETRIA = struct.Struct("<BBIfBfff")
+CONFIRMACAO = struct.Struct("<BB")
+
+AQUECEDOR = 0x01
+MOTOR = 0x02
+SISTEMA = 0x04
+
+
+_RESPOSTA_OK = re.compile(rb"BIN,OK,\d+\r?\n")
+
+
+def crc16(dados):
+    """CRC-16/CCITT-FALSE (polinômio 0x1021, início 0xFFFF), o mesmo do firmware."""
+    return binascii.crc_hqx(dados, 0xFFFF)
+
+
+def cobs_codificar(dados):
+    saida = bytearray()
+    inicio = 0
+    while True:
+        zero = dados.find(b"\x00", inicio, inicio + 254)
+        if zero < 0:
+            bloco = dados[inicio:inicio + 254]
+            if len(bloco) == 254 and inicio + 254 < len(dados):
+                saida += b"\xff" + bloco
+                inicio += 254
+                continue
+            saida.append(len(bloco) + 1)
+            saida += bloco
+            return bytes(saida)
+        saida.append(zero - inicio + 1)
+        saida += dados[inicio:zero]
+        inicio = zero + 1
+
+
+def cobs_decodificar(dados):
+    saida = bytearray()
+    pos = 0
+    fim = len(dados)
+    while pos < fim:
+        codigo = dados[pos]
+        if codigo == 0 or pos + codigo > fim + 1:
+            raise ValueError("quadro COBS inválido")
+        saida += dados[pos + 1:pos + codigo]
+        pos += codigo
+        if codigo != 0xFF and pos < fim:
+            saida.append(0)
+    return bytes(saida)
+
+
+def empacotar(carga):
+    """Monta um quadro pronto para a serial (usado pelo simulador e nos testes)."""
+    carga = bytes(carga)
+    return cobs_codificar(carga + crc16(carga).to_bytes(2, "little")) + b"\x00"
+
+
+def quadro_telemetria(seq, ms, temperatura, aquecedor, motor, sistema, velocidade, temp_alvo, temp_motor):
+    estados = (AQUECEDOR if aquecedor else 0) | (MOTOR if motor else 0) | (SISTEMA if sistema else 0)
+    return empacotar(TELEMETRIA.pack(QUADRO_TELEMETRIA, seq & 0xFF, ms & 0xFFFFFFFF, temperatura,
+                                     estados, velocidade, temp_alvo, temp_motor))
+
+
+class ParserBinario:
+    """Mesma interface do Parser de texto, para quadros COBS.
+
+    Cada quadro conta como uma "linha"; quadros com CRC errado contam em
+    `falhas` e buracos na sequência em `perdidos`.
+    """
+
+    def __init__(self, tamanho_max_quadro=64):
+        self.tamanho_max_quadro = tamanho_max_quadro
+        self._buffer = bytearray()
+        self._seq = None
+        self.linhas = 0
+        self.falhas = 0
+        self.ignoradas = 0
+        self.perdidos = 0
+        self.confirmacoes = 0
+
+    @property
+    def pendentes(self):
+        return len(self._buffer)
+
+    def limpar(self):
+        del self._buffer[:]
+        self._seq = None
+
+    def alimentar(self, dados, instante=None):
+        buf = self._buffer
+        buf += dados
+        fim = buf.rfind(b"\x00")
+        if fim < 0:
+            if len(buf) > self.tamanho_max_quadro:
+                del buf[:]
+                self.falhas += 1
+            return []
+
+        if instante is None:
+            instante = time.monotonic()
+        with memoryview(buf) as visao:
+            quadros = bytes(visao[:fim]).split(b"\x00")
+        del buf[:fim + 1]
+
+        amostras = []
+        for quadro in quadros:
+            if not quadro:
+                continue
+            self.linhas += 1
+            try:
+                bruto = cobs_decodificar(quadro)
+            except ValueError:
+                self.falhas += 1
+                continue
+            if len(bruto) < 4 or crc16(bruto[:-2]) != int.from_bytes(bruto[-2:], "little"):
+                self.falhas += 1
+                continue
+            carga = bruto[:-2]
+            self._conferir_seq(carga[1])
+            if carga[0] == QUADRO_TELEMETRIA and len(carga) == TELEMETRIA.size:
+                _, _, _, temperatura, estados, velocidade, temp_alvo, temp_motor = TELEMETRIA.unpack(carga)
+                amostras.append(_nova_amostra(Amostra, (
+                    instante, temperatura, bool(estados & AQUECEDOR), bool(estados & MOTOR),
+                    bool(estados & SISTEMA), velocidade, temp_alvo, temp_motor)))
+            elif carga[0] == QUADRO_CONFIRMACAO and len(carga) == CONFIRMACAO.size:
+                self.confirmacoes += 1
+            else:
+                self.ignoradas += 1
+        return amostras
+
+    def _conferir_seq(self, seq):
+        if self._seq is not None:
+            self.perdidos += (seq - self._seq - 1) & 0xFF
+        self._seq = seq
+
+
+class ProtocoloAutomatico:
+    """Começa no texto e tenta negociar o modo binário sem bloquear o chamador.
+
+    Enquanto a negociação não termina, a telemetria de texto continua
+    chegando normalmente. O pedido é repetido porque o UNO reinicia quando a
+    porta é aberta e só escuta depois do bootloader; se não houver resposta
+    dentro de `timeout`, o cliente fica no texto.
+    """
+
+    def __init__(self, porta, baud=BAUD_BINARIO, timeout=4.0, reenvio=0.5):
+        self.porta = porta
+        self.baud = baud
+        self.parser = Parser()
+        self.modo = "negociando" if baud else "texto"
+        self._limite = time.monotonic() + timeout
+        self._reenvio = reenvio
+        self._ultimo_pedido = None
+        self._eco = b""
+        self._base = (0, 0, 0, 0)
+        if baud:
+            self._pedir()
+
+    # Os contadores somam o parser de texto e o binário
+    @property
+    def linhas(self):
+        return self._base[0] + self.parser.linhas
+
+    @property
+    def falhas(self):
+        return self._base[1] + self.parser.falhas
+
+    @property
+    def ignoradas(self):
+        return self._base[2] + self.parser.ignoradas
+
+    @property
+    def confirmacoes(self):
+        return self._base[3] + self.parser.confirmacoes
+
+    @property
+    def pendentes(self):
+        return self.parser.pendentes
+
+    def limpar(self):
+        self.parser.limpar()
+
+    def _pedir(self):
+        self._ultimo_pedido = time.monotonic()
+        self.porta.write(f"BIN,{self.baud}\n".encode())
+
+    def alimentar(self, dados, instante=None):
+        if self.modo != "negociando":
+            return self.parser.alimentar(dados, instante)
+
+        self._eco = (self._eco + bytes(dados))[-64:]
+        if _RESPOSTA_OK.search(self._eco):
+            # O firmware já trocou de velocidade: o que veio depois do OK é lixo
+            self.porta.baudrate = self.baud
+            self._base = (self.linhas, self.falhas, self.ignoradas, self.confirmacoes)
+            self.parser = ParserBinario()
+            self.modo = "binario"
+            return []
+        amostras = self.parser.alimentar(dados, instante)
+        agora = time.monotonic()
+        if b"BIN,ERRO" in self._eco or agora > self._limite:
+            self.modo = "texto"
+        elif agora - self._ultimo_pedido >= self._reenvio:
+            self._pedir()
+        return amostras
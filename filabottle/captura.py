@@ -0,0 +1,311 @@
+"""Captura dos bytes crus da serial e reprodução acelerada.
+
+Uma captura guarda exatamente o que passou pelo fio (inclusive as linhas de
+log do firmware, lixo e linhas DATA quebradas), como veio em cada read():
+
+    cabeçalho   b"FBCAP\\x01" + <d  (hora de parede do início)
+    registro    <dIB + bytes   (segundos desde o início, tamanho, direção)
+
+direção 0 = recebido do Arduino, 1 = escrito pelo host. Gravar um registro
+é um struct.pack e um write num arquivo com buffer, esvaziado a cada
+segundo (um processo morto perde no máximo o último segundo).
+
+Qualquer lugar que abre a serial aceita uma captura no lugar da porta:
+
+    replay:campo/20250301-080000.fbcap        tempo real (1x)
+    replay:campo/20250301-080000.fbcap@100    100x
+    replay:campo/20250301-080000.fbcap@max    o mais rápido possível
+
+Na reprodução cada read() devolve no máximo um registro, então o parser e a
+negociação veem os mesmos pedaços que viram em campo.
+
+    python -m filabottle.captura gravar --porta COM3 --saida campo.fbcap
+    python -m filabottle.captura info campo.fbcap
+"""
+import os
+import struct
+import threading
+import time
+
+MAGICA = b"FBCAP\x01"
+CABECALHO = struct.Struct("<d")
+REGISTRO = struct.Struct("<dIB")
+RECEBIDO = 0
+ESCRITO = 1
+PREFIXO = "replay:"
+
+
+def e_replay(endereco):
+    return endereco.startswith(PREFIXO)
+
+
+class Captura:
+    """Arquivo de captura aberto para escrita (seguro entre a thread de leitura e a da UI)."""
+
+    def __init__(self, caminho):
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self.caminho = caminho
+        self._arquivo = open(caminho, "wb", buffering=64 * 1024)
+        self._arquivo.write(MAGICA + CABECALHO.pack(time.time()))
+        self._arquivo.flush()
+        self._inicio = time.monotonic()
+        self._esvaziado = self._inicio
+        self._lock = threading.Lock()
+        self.registros = 0
+        self.bytes = 0
+
+    def anotar(self, dados, direcao=RECEBIDO):
+        if not dados:
+            return
+        with self._lock:
+            if self._arquivo is None:
+                return
+            agora = time.monotonic()
+            self._arquivo.write(REGISTRO.pack(agora - self._inicio, len(dados), direcao))
+            self._arquivo.write(dados)
+            self.registros += 1
+            self.bytes += len(dados)
+            if agora - self._esvaziado >= 1.0:
+                self._arquivo.flush()
+                self._esvaziado = agora
+
+    def flush(self):
+        with self._lock:
+            if self._arquivo:
+                self._arquivo.flush()
+
+    def fechar(self):
+        with self._lock:
+            if self._arquivo:
+                self._arquivo.close()
+                self._arquivo = None
+
+
+def nova_captura(diretorio):
+    return Captura(os.path.join(diretorio, time.strftime("%Y%m%d-%H%M%S") + ".fbcap"))
+
+
+class PortaCapturada:
+    """Envolve uma porta (serial.Serial ou parecida) e anota tudo que passa por ela."""
+
+    def __init__(self, porta, captura):
+        self._porta = porta
+        self.captura = captura
+
+    def read(self, tamanho=1):
+        dados = self._porta.read(tamanho)
+        self.captura.anotar(dados, RECEBIDO)
+        return dados
+
+    def write(self, dados):
+        self.captura.anotar(dados, ESCRITO)
+        return self._porta.write(dados)
+
+    def close(self):
+        # A captura continua: numa reconexão a porta nova escreve no mesmo arquivo
+        self._porta.close()
+
+    def fileno(self):
+        return self._porta.fileno()
+
+    @property
+    def in_waiting(self):
+        return self._porta.in_waiting
+
+    @property
+    def is_open(self):
+        return self._porta.is_open
+
+    @property
+    def port(self):
+        return self._porta.port
+
+    @property
+    def baudrate(self):
+        return self._porta.baudrate
+
+    @baudrate.setter
+    def baudrate(self, valor):
+        self._porta.baudrate = valor
+
+    @property
+    def timeout(self):
+        return self._porta.timeout
+
+    @timeout.setter
+    def timeout(self, valor):
+        self._porta.timeout = valor
+
+
+def _cabecalho(f, caminho):
+    """Confere a assinatura e devolve a hora de parede do início."""
+    dados = f.read(len(MAGICA) + CABECALHO.size)
+    if len(dados) < len(MAGICA) + CABECALHO.size or not dados.startswith(MAGICA):
+        raise ValueError(f"{caminho} não é uma captura FilaBottle")
+    return CABECALHO.unpack_from(dados, len(MAGICA))[0]
+
+
+def registros(caminho):
+    """Gera (segundos, direção, bytes) de uma captura, sem carregar o arquivo inteiro."""
+    with open(caminho, "rb") as f:
+        _cabecalho(f, caminho)
+        while True:
+            cabecalho = f.read(REGISTRO.size)
+            if len(cabecalho) < REGISTRO.size:
+                return  # fim (ou registro cortado por um travamento)
+            segundos, tamanho, direcao = REGISTRO.unpack(cabecalho)
+            dados = f.read(tamanho)
+            if len(dados) < tamanho:
+                return
+            yield segundos, direcao, dados
+
+
+class Replay:
+    """Reproduz uma captura com a cara de serial.Serial (read/write/in_waiting).
+
+    `velocidade` multiplica o tempo real; None reproduz o mais rápido
+    possível. O que o host escreve é contado e descartado. No fim da
+    captura a porta fica aberta e muda, como um Arduino que parou de falar.
+    """
+
+    def __init__(self, caminho, velocidade=1.0, timeout=1.0):
+        self.port = PREFIXO + caminho
+        self.velocidade = velocidade
+        self.timeout = timeout
+        self.baudrate = None
+        self.is_open = True
+        self.terminou = False
+        self.escritos = 0
+        self._registros = (r for r in registros(caminho) if r[1] == RECEBIDO)
+        self._atual = b""
+        self._proximo = None
+        self._inicio = time.monotonic()
+        self._carregar()
+
+    def _carregar(self):
+        try:
+            segundos, _, dados = next(self._registros)
+        except StopIteration:
+            self._proximo = None
+            return
+        self._proximo = (segundos, dados)
+
+    def _liberar(self):
+        """Passa para `_atual` o próximo registro se a hora dele já chegou."""
+        if self._atual or self._proximo is None:
+            if self._proximo is None and not self._atual:
+                self.terminou = True
+            return 0.0
+        segundos, dados = self._proximo
+        if self.velocidade:
+            falta = self._inicio + segundos / self.velocidade - time.monotonic()
+            if falta > 0:
+                return falta
+        self._atual = dados
+        self._carregar()
+        return 0.0
+
+    @property
+    def in_waiting(self):
+        self._liberar()
+        return len(self._atual)
+
+    def read(self, tamanho=1):
+        limite = None if self.timeout is None else time.monotonic() + self.timeout
+        while True:
+            falta = self._liberar()
+            if self._atual:
+                dados = self._atual[:tamanho]
+                self._atual = self._atual[tamanho:]
+                return dados
+            if limite is not None and time.monotonic() >= limite:
+                return b""
+            espera = falta if falta and not self.terminou else (self.timeout or 0.1)
+            if limite is not None:
+                espera = min(espera, max(0.0, limite - time.monotonic()))
+            time.sleep(espera)
+
+    def write(self, dados):
+        self.escritos += 1
+        return len(dados)
+
+    def close(self):
+        self.is_open = False
+        self._registros.close()
+
+
+def abrir_porta(endereco, baud, timeout=1.0, captura=None):
+    """Abre uma porta serial ou uma captura (replay:...), opcionalmente capturando."""
+    if e_replay(endereco):
+        caminho, _, velocidade = endereco[len(PREFIXO):].rpartition("@")
+        if not caminho or not (velocidade == "max" or velocidade.replace(".", "", 1).isdigit()):
+            caminho, velocidade = endereco[len(PREFIXO):], "1"
+        porta = Replay(caminho, None if velocidade == "max" else float(velocidade), timeout)
+    else:
+        import serial
+        porta = serial.Serial(endereco, baud, timeout=timeout)
+    return PortaCapturada(porta, captura) if captura else porta
+
+
+def resumo(caminho):
+    with open(caminho, "rb") as f:
+        inicio = _cabecalho(f, caminho)
+    contagem = [0, 0]
+    tamanho = [0, 0]
+    ultimo = 0.0
+    for segundos, direcao, dados in registros(caminho):
+        contagem[direcao] += 1
+        tamanho[direcao] += len(dados)
+        ultimo = segundos
+    return {
+        "inicio": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(inicio)),
+        "duracao": ultimo,
+        "recebidos": (contagem[RECEBIDO], tamanho[RECEBIDO]),
+        "escritos": (contagem[ESCRITO], tamanho[ESCRITO]),
+    }
+
+
+def main():
+    import argparse
+
+    from filabottle.binario import BAUD_TEXTO
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="acao", required=True)
+    p = sub.add_parser("gravar", help="captura uma porta sem abrir nenhum cliente")
+    p.add_argument("--porta", required=True)
+    p.add_argument("--baud", type=int, default=BAUD_TEXTO)
+    p.add_argument("--saida", required=True)
+    p.add_argument("--segundos", type=float, help="para depois de N segundos (padrão: Ctrl+C)")
+    p = sub.add_parser("info", help="resumo de uma captura")
+    p.add_argument("arquivo")
+    args = parser.parse_args()
+
+    if args.acao == "info":
+        try:
+            r = resumo(args.arquivo)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"{args.arquivo}: início {r['inicio']}, {r['duracao']:.1f} s")
+        print(f"  recebidos: {r['recebidos'][0]} registros, {r['recebidos'][1]} bytes")
+        print(f"  escritos:  {r['escritos'][0]} registros, {r['escritos'][1]} bytes")
+        return
+    captura = Captura(args.saida)
+    porta = abrir_porta(args.porta, args.baud, timeout=0.2, captura=captura)
+    fim = time.monotonic() + args.segundos if args.segundos else None
+    print(f"Capturando {args.porta} em {args.saida}. Ctrl+C para parar.")
+    try:
+        while fim is None or time.monotonic() < fim:
+            porta.read(max(1, porta.in_waiting))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        porta.close()
+        captura.fechar()
+    print(f"{captura.registros} registros, {captura.bytes} bytes")
+
+
+if __name__ == "__main__":
+    main()
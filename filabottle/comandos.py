@@ -0,0 +1,132 @@
+"""Fila de comandos para o Arduino com coalescência e limite de taxa.
+
+Segurar um botão de ajuste gera um comando a cada 100 ms, mas só o último
+valor importa: a fila guarda um comando pendente por chave (ex.: "SET_TEMP")
+e um novo valor substitui o anterior ainda não enviado. Cada chave sai no
+máximo uma vez a cada `intervalo` segundos e o último valor sempre sai.
+Isso poupa a serial de 9600 baud e as gravações de EEPROM do firmware.
+
+A fila não tem thread própria: o cliente chama `bombear()` e `observar()`
+no mesmo tick em que lê a serial (Clock do Kivy ou after do Tk).
+"""
+import collections
+import time
+
+
+class Pendente:
+    __slots__ = ("chave", "linha", "esperado", "rastrear", "enviado")
+
+    def __init__(self, chave, linha, esperado, rastrear):
+        self.chave = chave
+        self.linha = linha
+        self.esperado = esperado
+        self.rastrear = rastrear
+        self.enviado = None
+
+
+class FilaComandos:
+    """Comandos coalescidos por chave, com limite de taxa e confirmação.
+
+    `escrever(linha)` manda uma linha de texto para o Arduino. A confirmação
+    vem de duas formas: pelo contador de confirmações do parser (firmware
+    que responde a cada SET) ou, com `esperado=(campo, valor)`, quando a
+    telemetria passa a mostrar o valor pedido.
+    """
+
+    def __init__(self, escrever, intervalo=0.3, timeout_confirmacao=3.0):
+        self.escrever = escrever
+        self.intervalo = intervalo
+        self.timeout_confirmacao = timeout_confirmacao
+        self._fila = collections.OrderedDict()
+        self._ultimo_envio = {}
+        self._aguardando = collections.deque()
+        self._confirmacoes_vistas = None
+        self.enviados = 0
+        self.coalescidos = 0
+        self.confirmados = 0
+        self.expirados = 0
+        self.latencia_confirmacao = 0.0  # média móvel, em segundos
+        # ao_concluir(pendente, rtt): cada comando rastreado confirmado (rtt em s) ou expirado (None)
+        self.ao_concluir = None
+
+    def __len__(self):
+        return len(self._fila)
+
+    def enviar(self, chave, linha, esperado=None, rastrear=True):
+        """Enfileira `linha`; se já havia um comando pendente com a mesma chave, ele é trocado.
+
+        Com `rastrear=False` o comando não espera confirmação (ex.: ligar o
+        aquecedor, cujo efeito depende da histerese). Devolve o Pendente.
+        """
+        pendente = self._fila.get(chave)
+        if pendente is not None:
+            pendente.linha = linha
+            pendente.esperado = esperado
+            pendente.rastrear = rastrear
+            self.coalescidos += 1
+        else:
+            pendente = self._fila[chave] = Pendente(chave, linha, esperado, rastrear)
+        self.bombear()
+        return pendente
+
+    def bombear(self, agora=None):
+        """Escreve os comandos cuja chave já pode sair. Exceções de escrita sobem ao cliente."""
+        if not self._fila:
+            return
+        agora = time.monotonic() if agora is None else agora
+        for chave in list(self._fila):
+            if agora - self._ultimo_envio.get(chave, float("-inf")) < self.intervalo:
+                continue
+            pendente = self._fila.pop(chave, None)
+            if pendente is None:  # a escrita anterior derrubou a conexão e limpou a fila
+                break
+            self.escrever(pendente.linha)
+            pendente.enviado = agora
+            self._ultimo_envio[chave] = agora
+            if pendente.rastrear:
+                self._aguardando.append(pendente)
+            self.enviados += 1
+
+    def observar(self, amostras=(), confirmacoes=None, agora=None):
+        """Confere as confirmações que chegaram desde a última chamada."""
+        agora = time.monotonic() if agora is None else agora
+        if confirmacoes is not None:
+            novas = confirmacoes - (self._confirmacoes_vistas or 0)
+            self._confirmacoes_vistas = confirmacoes
+            for pendente in list(self._aguardando):
+                if novas <= 0:
+                    break
+                if pendente.esperado is None:
+                    self._confirmar(pendente, agora)
+                    novas -= 1
+        if amostras:
+            ultima = amostras[-1]
+            for pendente in list(self._aguardando):
+                if pendente.esperado is None:
+                    continue
+                campo, valor = pendente.esperado
+                atual = getattr(ultima, campo)
+                if atual is not None and abs(atual - valor) < 0.01:
+                    self._confirmar(pendente, agora)
+        while self._aguardando and agora - self._aguardando[0].enviado > self.timeout_confirmacao:
+            pendente = self._aguardando.popleft()
+            self.expirados += 1
+            if self.ao_concluir:
+                self.ao_concluir(pendente, None)
+
+    def _confirmar(self, pendente, agora):
+        self._aguardando.remove(pendente)
+        self.confirmados += 1
+        self.latencia_confirmacao += (agora - pendente.enviado - self.latencia_confirmacao) * 0.2
+        if self.ao_concluir:
+            self.ao_concluir(pendente, agora - pendente.enviado)
+
+    def limpar(self):
+        self._fila.clear()
+        self._aguardando.clear()
+        self._ultimo_envio.clear()
+        self._confirmacoes_vistas = None
+
+    def resumo(self):
+        return (f"Comandos: {self.enviados} enviados, {self.coalescidos} agrupados,"
+                f" {self.confirmados} confirmados")
@@ -0,0 +1,115 @@
+"""Lado do cliente do serviço (python -m filabottle.servico).
+
+Separado do serviço para que os clientes Tk e Kivy não paguem a
+importação do asyncio na partida. ConexaoServico imita serial.Serial e
+ParserAssinante tem a mesma interface do Parser.
+"""
+import json
+import select
+import socket
+import time
+
+from filabottle.protocolo import Amostra, _CAMPOS
+
+ENDERECO_PADRAO = "tcp://127.0.0.1:8765"
+PREFIXOS = ("tcp://", "unix:")
+
+
+def e_servico(endereco):
+    """Diz se o endereço escolhido no cliente é o serviço e não uma porta serial."""
+    return endereco.startswith(PREFIXOS)
+
+
+class ConexaoServico:
+    """Conexão com o serviço com a cara de serial.Serial (read/write/in_waiting)."""
+
+    def __init__(self, endereco=ENDERECO_PADRAO, timeout=1.0):
+        if endereco.startswith("unix:"):
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.connect(endereco[len("unix:"):])
+        else:
+            host, _, porta = endereco[len("tcp://"):].rpartition(":")
+            self._sock = socket.create_connection((host, int(porta)), timeout)
+        self._sock.settimeout(timeout)
+        self._buffer = bytearray()
+        self.port = endereco
+        self.baudrate = None
+        self.is_open = True
+
+    def _receber(self, espera):
+        prontos, _, _ = select.select([self._sock], [], [], espera)
+        if prontos:
+            dados = self._sock.recv(65536)
+            if not dados:
+                self.is_open = False
+                raise ConnectionError("serviço encerrou a conexão")
+            self._buffer += dados
+
+    @property
+    def in_waiting(self):
+        self._receber(0)
+        return len(self._buffer)
+
+    def read(self, tamanho=1):
+        if not self._buffer:
+            self._receber(self._sock.gettimeout())
+        dados = bytes(self._buffer[:tamanho])
+        del self._buffer[:tamanho]
+        return dados
+
+    def write(self, dados):
+        self._sock.sendall(dados)
+        return len(dados)
+
+    def close(self):
+        self.is_open = False
+        self._sock.close()
+
+
+class ParserAssinante:
+    """Mesma interface do Parser, para as linhas JSON do serviço."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self.modo = "servico"
+        self.linhas = 0
+        self.falhas = 0
+        self.ignoradas = 0
+        self.confirmacoes = 0
+        self.estado = {}
+
+    @property
+    def pendentes(self):
+        return len(self._buffer)
+
+    def limpar(self):
+        del self._buffer[:]
+
+    def alimentar(self, dados, instante=None):
+        buf = self._buffer
+        buf += dados
+        fim = buf.rfind(b"\n")
+        if fim < 0:
+            return []
+        if instante is None:
+            instante = time.monotonic()
+        linhas = bytes(buf[:fim]).split(b"\n")
+        del buf[:fim + 1]
+        self.linhas += len(linhas)
+        amostras = []
+        for linha in linhas:
+            try:
+                mensagem = json.loads(linha)
+                tipo = mensagem.pop("tipo")
+            except (ValueError, KeyError, AttributeError):
+                self.falhas += 1
+                continue
+            if tipo == "amostra":
+                mensagem["instante"] = instante
+                amostras.append(Amostra(*(mensagem.get(campo) for campo in _CAMPOS)))
+            elif tipo == "estado":
+                self.estado = mensagem
+                self.confirmacoes = mensagem.get("confirmacoes", self.confirmacoes)
+            else:
+                self.ignoradas += 1
+        return amostras
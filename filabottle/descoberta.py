@@ -0,0 +1,141 @@
+"""Descoberta de portas em segundo plano e reconexão com espera exponencial.
+
+Listar as portas (list_ports.comports(), ou usb4a no Android) pode levar
+centenas de ms em máquinas com muitos dispositivos USB/Bluetooth, então
+isso nunca roda na thread da interface: a Descoberta repete a listagem
+numa thread própria e a interface só lê o resultado em cache. O pyserial
+não tem aviso de hot-plug portável; a troca da lista entre duas varreduras
+é o evento (`versao` muda).
+
+O dispositivo é lembrado por VID/PID/número de série, então um Arduino que
+volta como COM5 em vez de COM3 (ou ttyUSB1 em vez de ttyUSB0) é
+reencontrado. A Reconexao espaça as tentativas (0,5 s, 1 s, 2 s... até
+`maximo`) e guarda quanto durou cada queda.
+"""
+import threading
+import time
+from collections import namedtuple
+
+Dispositivo = namedtuple("Dispositivo", "vid pid serie")
+
+
+def listar_seriais():
+    """Portas do pyserial como (nome, Dispositivo)."""
+    from serial.tools import list_ports
+
+    return [(p.device, Dispositivo(p.vid, p.pid, p.serial_number)) for p in list_ports.comports()]
+
+
+class Descoberta(threading.Thread):
+    def __init__(self, listar=listar_seriais, intervalo=1.0):
+        super().__init__(daemon=True)
+        self._listar = listar
+        self.intervalo = intervalo
+        self.portas = ()  # trocado de uma vez pela thread; quem lê nunca vê lista pela metade
+        self.versao = 0
+        self.erro = None
+        self.pronta = threading.Event()  # setado depois da primeira varredura
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.is_set():
+            try:
+                atual = tuple(self._listar())
+                self.erro = None
+            except Exception as e:
+                atual = self.portas
+                self.erro = str(e)
+            if atual != self.portas:
+                self.portas = atual
+                self.versao += 1
+            self.pronta.set()
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+
+    def atualizar(self):
+        """Pede uma varredura agora (ex.: o usuário clicou em Atualizar)."""
+        self._acordar.set()
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+
+    def nomes(self):
+        return [nome for nome, _ in self.portas]
+
+    def identidade(self, porta):
+        """Dispositivo da porta, ou None se ela não for USB (sem VID/PID)."""
+        for nome, dispositivo in self.portas:
+            if nome == porta:
+                return dispositivo if dispositivo.vid is not None else None
+        return None
+
+    def localizar(self, dispositivo, preferida=None):
+        """Porta onde o dispositivo está agora, preferindo o nome antigo."""
+        if dispositivo is None:
+            # Porta sem identidade (pty, Bluetooth, não listada): só dá para tentar o nome
+            return preferida
+        candidatas = [nome for nome, d in self.portas if d == dispositivo]
+        if preferida in candidatas:
+            return preferida
+        return candidatas[0] if candidatas else None
+
+
+class Reconexao:
+    """Espera exponencial entre tentativas e quanto tempo cada queda custou."""
+
+    def __init__(self, inicial=0.5, maximo=10.0, fator=2.0):
+        self.inicial = inicial
+        self.maximo = maximo
+        self.fator = fator
+        self.ativa = False
+        self.tentativas = 0
+        self.inicio = None
+        self.duracoes = []
+        self._espera = inicial
+        self._proxima = 0.0
+
+    def iniciar(self, agora=None):
+        """Marca a queda; chamar de novo durante a mesma queda não faz nada."""
+        if self.ativa:
+            return
+        agora = time.monotonic() if agora is None else agora
+        self.ativa = True
+        self.tentativas = 0
+        self.inicio = agora
+        self._espera = self.inicial
+        self._proxima = agora + self.inicial
+
+    def pronta(self, agora=None):
+        """Já passou a espera e dá para tentar de novo?"""
+        return self.ativa and (time.monotonic() if agora is None else agora) >= self._proxima
+
+    def espera(self, agora=None):
+        return max(0.0, self._proxima - (time.monotonic() if agora is None else agora))
+
+    def falhou(self, agora=None):
+        agora = time.monotonic() if agora is None else agora
+        self.tentativas += 1
+        self._espera = min(self.maximo, self._espera * self.fator)
+        self._proxima = agora + self._espera
+
+    def conseguiu(self, agora=None):
+        """Encerra a queda e retorna quanto ela durou em segundos."""
+        duracao = (time.monotonic() if agora is None else agora) - self.inicio
+        self.duracoes.append(duracao)
+        self.ativa = False
+        return duracao
+
+    def cancelar(self):
+        self.ativa = False
+
+    @property
+    def total(self):
+        return sum(self.duracoes)
+
+    def resumo(self):
+        texto = f"Reconexões: {len(self.duracoes)} ({self.total:.1f} s parado)"
+        if self.ativa:
+            texto += f" | reconectando, tentativa {self.tentativas + 1} em {self.espera():.1f} s"
+        return texto
@@ -0,0 +1,319 @@
+"""Supervisor de várias extrusoras num único processo.
+
+    python -m filabottle.frota                         # todas as portas seriais
+    python -m filabottle.frota --portas COM3 COM4 --aplicar "SET,40,260,180"
+    python -m filabottle.frota --medir 1,8,32          # CPU por máquina com simuladores
+
+Cada porta vira uma Maquina com leitor assíncrono, ProtocoloAutomatico e
+FilaComandos próprios, todas no mesmo loop asyncio. No Linux/macOS a
+leitura usa loop.add_reader no descritor da serial (nenhuma thread por
+porta); no Windows cai num executor com uma thread por porta. Uma porta que
+cai (ou que ainda não existe) é reaberta com espera exponencial; uma
+Descoberta compartilhada reencontra o Arduino pelo VID/PID/número de série
+se ele voltar com outro nome. Capturas
+(replay:arquivo.fbcap@max) entram como portas e são lidas no executor.
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import glob
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from filabottle.anomalias import Detector
+from filabottle.binario import BAUD_BINARIO, BAUD_TEXTO, ProtocoloAutomatico
+from filabottle.captura import abrir_porta, e_replay
+from filabottle.comandos import FilaComandos
+from filabottle.descoberta import Descoberta, Reconexao
+from filabottle.servico import TIQUE_DETECTOR
+
+
+def listar_portas():
+    from serial.tools import list_ports
+
+    return [port.device for port in list_ports.comports()]
+
+
+class Maquina:
+    """Uma extrusora: porta, parser, fila de comandos e a última amostra."""
+
+    def __init__(self, porta, baud=BAUD_TEXTO, baud_binario=BAUD_BINARIO, descoberta=None):
+        self.porta = porta
+        self.baud = baud
+        self.baud_binario = baud_binario
+        self.descoberta = descoberta
+        self.dispositivo = None  # VID/PID/série da primeira conexão; a porta pode voltar com outro nome
+        self.arduino = None
+        self.parser = None
+        self.comandos = FilaComandos(self._escrever)
+        self.ultima = None
+        self.amostras = 0
+        self.erro = None
+        self.reconexao = Reconexao()
+        self.detector = Detector(desligar=self._desligar)
+        self._a_detectar = []  # o tick do detector consome, fora da leitura
+
+    def _escrever(self, linha):
+        self.arduino.write((linha + "\n").encode())
+
+    def _desligar(self):
+        try:
+            self.comandos.enviar("SET_STATE", "SET_STATE,OFF")
+        except OSError:
+            pass  # a leitura percebe a queda; o reconectou() manda de novo
+
+    def conectar(self):
+        if self.descoberta and self.dispositivo is not None:
+            porta = self.descoberta.localizar(self.dispositivo, self.porta)
+            if porta is None:
+                raise OSError(f"USB {self.dispositivo.vid:04X}:{self.dispositivo.pid:04X} não encontrado")
+            self.porta = porta
+        self.arduino = abrir_porta(self.porta, self.baud, timeout=0)
+        if self.descoberta and self.dispositivo is None and not e_replay(self.porta):
+            self.dispositivo = self.descoberta.identidade(self.porta)
+        self.parser = ProtocoloAutomatico(self.arduino, self.baud_binario)
+        self.comandos.limpar()
+        self._detectar()  # o que chegou antes da queda ainda é da janela anterior
+        self.detector.reconectou()
+        self.erro = None
+
+    def _processar(self, dados):
+        agora = time.monotonic()
+        amostras = self.parser.alimentar(dados, agora)
+        self.comandos.observar(amostras, self.parser.confirmacoes, agora)
+        self.comandos.bombear(agora)
+        if amostras:
+            self.amostras += len(amostras)
+            self.ultima = amostras[-1]
+            self._a_detectar.extend(amostras)
+
+    def _detectar(self):
+        if self._a_detectar:
+            amostras, self._a_detectar = self._a_detectar, []
+            self.detector.alimentar(amostras)
+
+    def detectar(self, agora):
+        """Tick do detector: as amostras acumuladas e, com a porta aberta, o silêncio.
+
+        Os alarmes ativos aparecem no painel.
+        """
+        self._detectar()
+        if self.arduino is not None and self.arduino.is_open:
+            self.detector.verificar(agora)
+
+    async def executar(self, executor=None):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                self.conectar()
+            except Exception as e:
+                self.erro = str(e)
+                self.reconexao.iniciar()
+                self.reconexao.falhou()
+                await asyncio.sleep(self.reconexao.espera())
+                continue
+            if self.reconexao.ativa:
+                self.reconexao.conseguiu()
+            try:
+                if executor is None and not e_replay(self.porta):
+                    await self._ler_com_add_reader(loop)
+                else:
+                    await self._ler_com_executor(loop, executor)
+            except Exception as e:
+                self.erro = str(e)
+            finally:
+                self.arduino.close()
+            self.reconexao.iniciar()
+            await asyncio.sleep(self.reconexao.espera())
+
+    async def _ler_com_add_reader(self, loop):
+        fim = loop.create_future()
+        porta = self.arduino
+
+        def pronto():
+            try:
+                self._processar(porta.read(porta.in_waiting or 1))
+            except Exception as e:
+                loop.remove_reader(porta.fileno())
+                if not fim.done():
+                    fim.set_exception(e)
+
+        loop.add_reader(porta.fileno(), pronto)
+        try:
+            while not fim.done():
+                # Sem dados o leitor não é chamado: a negociação e a fila ainda precisam do tick
+                await asyncio.wait([fim], timeout=0.1)
+                if not fim.done():
+                    self._processar(b"")
+            fim.result()
+        finally:
+            if not fim.done():
+                loop.remove_reader(porta.fileno())
+
+    async def _ler_com_executor(self, loop, executor):
+        porta = self.arduino
+        porta.timeout = 0.1
+        while True:
+            dados = await loop.run_in_executor(executor, lambda: porta.read(max(1, porta.in_waiting)))
+            self._processar(dados)
+
+    async def aplicar(self, linha, timeout=3.0):
+        """Envia um comando e espera a confirmação. Retorna a latência em s, ou None."""
+        confirmados = self.comandos.confirmados
+        inicio = time.monotonic()
+        self.comandos.enviar(linha.split(",", 1)[0], linha)
+        while time.monotonic() - inicio < timeout:
+            if self.comandos.confirmados > confirmados:
+                return time.monotonic() - inicio
+            await asyncio.sleep(0.02)
+        return None
+
+
+class Frota:
+    def __init__(self, portas, baud=BAUD_TEXTO, baud_binario=BAUD_BINARIO):
+        self.descoberta = Descoberta()
+        self.maquinas = [Maquina(p, baud, baud_binario, self.descoberta) for p in portas]
+        self._tarefas = []
+        self._executor = None
+
+    async def iniciar(self):
+        self.descoberta.start()
+        await asyncio.get_running_loop().run_in_executor(None, self.descoberta.pronta.wait, 5.0)
+        if sys.platform == "win32":
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(self.maquinas) or 1)
+        self._tarefas = [asyncio.create_task(m.executar(self._executor)) for m in self.maquinas]
+        self._tarefas.append(asyncio.create_task(self._detectar_periodicamente()))
+
+    async def _detectar_periodicamente(self):
+        while True:
+            await asyncio.sleep(TIQUE_DETECTOR)
+            agora = time.monotonic()
+            for m in self.maquinas:
+                m.detectar(agora)
+
+    async def parar(self):
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+        self.descoberta.parar()
+        if self._executor:
+            self._executor.shutdown(wait=False)
+
+    async def aplicar(self, linha, timeout=3.0):
+        """Manda o mesmo comando para todas as máquinas ao mesmo tempo."""
+        latencias = await asyncio.gather(*(m.aplicar(linha, timeout) for m in self.maquinas if not m.erro))
+        return dict(zip((m.porta for m in self.maquinas if not m.erro), latencias))
+
+    def painel(self):
+        linhas = [f"{'porta':<24}{'modo':<11}{'temp °C':>9}  aq  mot  {'amostras':>9}  {'falhas':>6}  quedas"]
+        for m in self.maquinas:
+            if m.erro:
+                linhas.append(f"{m.porta:<24}erro: {m.erro[:50]}")
+                continue
+            a = m.ultima
+            temp = f"{a.temperatura:9.2f}" if a else f"{'--':>9}"
+            aquecedor = _estado(a.aquecedor) if a else " -"
+            motor = _estado(a.motor) if a else " -"
+            modo = m.parser.modo if m.parser else "-"
+            falhas = m.parser.falhas if m.parser else 0
+            linhas.append(f"{m.porta:<24}{modo:<11}{temp}  {aquecedor}  {motor}   {m.amostras:>9}  {falhas:>6}"
+                          f"  {len(m.reconexao.duracoes)} ({m.reconexao.total:.1f} s)")
+            if m.detector.ativos:
+                linhas.append(f"{'':<24}⚠ {m.detector.resumo()}")
+        return "\n".join(linhas)
+
+
+def _estado(valor):
+    return " -" if valor is None else ("ON" if valor else "  ")
+
+
+async def supervisionar(portas, aplicar=None, intervalo=1.0):
+    frota = Frota(portas)
+    await frota.iniciar()
+    try:
+        if aplicar:
+            await asyncio.sleep(0.5)
+            for porta, latencia in (await frota.aplicar(aplicar)).items():
+                print(f"{porta}: " + (f"confirmado em {latencia * 1000:.0f} ms" if latencia is not None
+                                     else "sem confirmação"))
+        while True:
+            await asyncio.sleep(intervalo)
+            print("\033[2J\033[H" + frota.painel(), flush=True)
+    finally:
+        await frota.parar()
+
+
+def _hospedar_simuladores(quantidade, diretorio, taxa, pronto):
+    """Processo filho: N simuladores, cada um com um symlink em `diretorio`."""
+    from filabottle.simulador import Simulador
+
+    simuladores = [Simulador("uno", taxa=taxa, link=os.path.join(diretorio, f"sim{i:03d}"))
+                   for i in range(quantidade)]
+    for s in simuladores:
+        s.start()
+    pronto.set()
+    for s in simuladores:
+        s.join()
+
+
+async def _medir_frota(portas, segundos):
+    frota = Frota(portas, baud_binario=0)
+    await frota.iniciar()
+    await asyncio.sleep(1.0)  # conexões e primeiros dados fora da medição
+    amostras = sum(m.amostras for m in frota.maquinas)
+    cpu = time.process_time()
+    inicio = time.monotonic()
+    await asyncio.sleep(segundos)
+    cpu = time.process_time() - cpu
+    parede = time.monotonic() - inicio
+    amostras = sum(m.amostras for m in frota.maquinas) - amostras
+    erros = [m.erro for m in frota.maquinas if m.erro]
+    await frota.parar()
+    return cpu / parede * 100, amostras / parede, erros
+
+
+def medir(quantidades, taxa=10.0, segundos=10.0):
+    """Mede a CPU do supervisor com N simuladores rodando em outro processo."""
+    print(f"Telemetria a {taxa:.0f} Hz por máquina, {segundos:.0f} s por medição")
+    for n in quantidades:
+        with tempfile.TemporaryDirectory() as diretorio:
+            pronto = multiprocessing.Event()
+            filho = multiprocessing.Process(target=_hospedar_simuladores,
+                                            args=(n, diretorio, taxa, pronto), daemon=True)
+            filho.start()
+            pronto.wait(30)
+            portas = sorted(glob.glob(os.path.join(diretorio, "sim*")))
+            cpu, vazao, erros = asyncio.run(_medir_frota(portas, segundos))
+            filho.terminate()
+            filho.join()
+        print(f"  {n:3d} máquinas: CPU {cpu:6.2f}% total, {cpu / n:5.3f}% por máquina,"
+              f" {vazao:8.1f} amostras/s" + (f", {len(erros)} com erro" if erros else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--portas", nargs="*", help="portas (aceita curingas); padrão: todas as seriais")
+    parser.add_argument("--aplicar", metavar="COMANDO", help="comando enviado a todas as máquinas ao iniciar")
+    parser.add_argument("--medir", metavar="N,N,...", help="mede a CPU com N simuladores (ex.: 1,8,32)")
+    parser.add_argument("--segundos", type=float, default=10.0, help="duração de cada medição")
+    args = parser.parse_args()
+
+    if args.medir:
+        medir([int(n) for n in args.medir.split(",")], segundos=args.segundos)
+        return
+    portas = []
+    for padrao in args.portas or listar_portas():
+        portas += sorted(glob.glob(padrao)) or [padrao]
+    if not portas:
+        parser.error("nenhuma porta serial encontrada")
+    try:
+        asyncio.run(supervisionar(portas, args.aplicar))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Histórico do gráfico de temperatura com custo de redesenho constante.
+
+O HistoricoGrafico não guarda as amostras: guarda um envelope mín/máx com
+no máximo 2 × `resolucao` baldes. Quando enche, junta os baldes dois a dois
+e dobra quantas amostras cabem em cada um. Anexar custa O(1) amortizado e
+desenhar custa O(resolucao), seja a corrida de um minuto ou de um milhão
+de amostras. Na hora de desenhar, `lttb` reduz o envelope à largura do
+canvas em pixels.
+"""
+
+# Índices de um balde
+_T_INI, _T_FIM, _T_MIN, _Y_MIN, _T_MAX, _Y_MAX, _MOTOR, _N = range(8)
+
+
+class HistoricoGrafico:
+    def __init__(self, resolucao=1024):
+        self.resolucao = resolucao
+        self.passo = 1  # amostras por balde
+        self.total = 0
+        self._baldes = []
+        self._atual = None
+
+    def __len__(self):
+        return self.total
+
+    def limpar(self):
+        self.passo = 1
+        self.total = 0
+        self._baldes = []
+        self._atual = None
+
+    def anexar(self, t, temperatura, motor):
+        b = self._atual
+        if b is None:
+            b = self._atual = [t, t, t, temperatura, t, temperatura, 1 if motor else 0, 1]
+        else:
+            b[_T_FIM] = t
+            if temperatura < b[_Y_MIN]:
+                b[_T_MIN] = t
+                b[_Y_MIN] = temperatura
+            elif temperatura > b[_Y_MAX]:
+                b[_T_MAX] = t
+                b[_Y_MAX] = temperatura
+            if motor:
+                b[_MOTOR] += 1
+            b[_N] += 1
+        self.total += 1
+        if b[_N] >= self.passo:
+            self._baldes.append(b)
+            self._atual = None
+            if len(self._baldes) >= 2 * self.resolucao:
+                self._compactar()
+
+    def _compactar(self):
+        baldes = self._baldes
+        juntos = []
+        for i in range(0, len(baldes) - 1, 2):
+            a, b = baldes[i], baldes[i + 1]
+            m = a[:]
+            m[_T_FIM] = b[_T_FIM]
+            if b[_Y_MIN] < a[_Y_MIN]:
+                m[_T_MIN], m[_Y_MIN] = b[_T_MIN], b[_Y_MIN]
+            if b[_Y_MAX] > a[_Y_MAX]:
+                m[_T_MAX], m[_Y_MAX] = b[_T_MAX], b[_Y_MAX]
+            m[_MOTOR] += b[_MOTOR]
+            m[_N] += b[_N]
+            juntos.append(m)
+        if len(baldes) % 2:
+            juntos.append(baldes[-1])
+        self._baldes = juntos
+        self.passo *= 2
+
+    def _todos(self):
+        return self._baldes + [self._atual] if self._atual else self._baldes
+
+    def envelope(self):
+        """Pontos (t, temperatura) do mín/máx de cada balde, em ordem de tempo."""
+        pontos = []
+        for b in self._todos():
+            a = (b[_T_MIN], b[_Y_MIN])
+            c = (b[_T_MAX], b[_Y_MAX])
+            if a[0] > c[0]:
+                a, c = c, a
+            pontos.append(a)
+            if c != a:
+                pontos.append(c)
+        return pontos
+
+    def motor(self):
+        """Trechos (t_ini, t_fim) em que o motor ficou ligado na maior parte do balde."""
+        trechos = []
+        anterior = False
+        for b in self._todos():
+            ligado = b[_MOTOR] * 2 >= b[_N]
+            if ligado and anterior:
+                trechos[-1][1] = b[_T_FIM]
+            elif ligado:
+                trechos.append([b[_T_INI], b[_T_FIM]])
+            anterior = ligado
+        return [tuple(t) for t in trechos]
+
+    def limites(self):
+        """(t_ini, t_fim, y_min, y_max) de tudo que está no histórico, ou None."""
+        todos = self._todos()
+        if not todos:
+            return None
+        return (todos[0][_T_INI], todos[-1][_T_FIM],
+                min(b[_Y_MIN] for b in todos), max(b[_Y_MAX] for b in todos))
+
+
+def lttb(pontos, alvo):
+    """Largest-Triangle-Three-Buckets: reduz `pontos` (t, y) a `alvo` pontos."""
+    n = len(pontos)
+    if alvo >= n or alvo < 3:
+        return list(pontos)
+    saida = [pontos[0]]
+    largura = (n - 2) / (alvo - 2)
+    a = 0
+    for i in range(alvo - 2):
+        inicio = int(i * largura) + 1
+        fim = int((i + 1) * largura) + 1
+        # Média do próximo balde: terceiro vértice do triângulo
+        prox_ini = fim
+        prox_fim = min(int((i + 2) * largura) + 1, n)
+        cont = prox_fim - prox_ini
+        media_t = sum(p[0] for p in pontos[prox_ini:prox_fim]) / cont
+        media_y = sum(p[1] for p in pontos[prox_ini:prox_fim]) / cont
+        at, ay = pontos[a]
+        maior = -1.0
+        escolhido = inicio
+        for j in range(inicio, fim):
+            t, y = pontos[j]
+            area = abs((at - media_t) * (y - ay) - (at - t) * (media_y - ay))
+            if area > maior:
+                maior = area
+                escolhido = j
+        saida.append(pontos[escolhido])
+        a = escolhido
+    saida.append(pontos[-1])
+    return saida
+
+
+class Escala:
+    """Converte (t, temperatura) em pixels; `inverter_y` para o Tk (y cresce para baixo)."""
+
+    def __init__(self, largura, altura, t0, t1, y0, y1, inverter_y=True, margem=2):
+        self.largura = largura
+        self.altura = altura
+        self.t0 = t0
+        self.y0 = y0
+        self.inverter_y = inverter_y
+        self.margem = margem
+        self._kx = (largura - 2 * margem) / ((t1 - t0) or 1.0)
+        self._ky = (altura - 2 * margem) / ((y1 - y0) or 1.0)
+
+    def x(self, t):
+        return self.margem + (t - self.t0) * self._kx
+
+    def y(self, valor):
+        y = self.margem + (valor - self.y0) * self._ky
+        return self.altura - y if self.inverter_y else y
+
+    def pontos(self, pontos):
+        """Lista plana [x0, y0, x1, y1, ...], formato que Tk e Kivy aceitam."""
+        plano = []
+        for t, valor in pontos:
+            plano.append(self.x(t))
+            plano.append(self.y(valor))
+        return plano
+
+
+def quadro(historico, largura, altura, faixa, inverter_y=True):
+    """Calcula tudo que um frame do gráfico precisa, já em pixels.
+
+    Retorna None sem dados, ou um dicionário com `temperatura` (pontos
+    planos), `faixa` (y do mínimo e do máximo da histerese) e `motor`
+    (pontos planos de uma linha em degrau na base do gráfico, alta onde o
+    motor estava ligado). Cada série é uma única linha, então o cliente só
+    atualiza as coordenadas de três itens por frame.
+    """
+    limites = historico.limites()
+    if limites is None:
+        return None
+    t0, t1, y0, y1 = limites
+    faixa_min, faixa_max = faixa
+    y0 = min(y0, faixa_min) - 5
+    y1 = max(y1, faixa_max) + 5
+    escala = Escala(largura, altura, t0, t1, y0, y1, inverter_y)
+    pontos = lttb(historico.envelope(), max(3, int(largura)))
+    desligado, ligado = (altura - 2, altura - 10) if inverter_y else (2, 10)
+    motor = [escala.x(t0), desligado]
+    for ini, fim in historico.motor():
+        x_ini, x_fim = escala.x(ini), escala.x(fim)
+        motor += [x_ini, desligado, x_ini, ligado, x_fim, ligado, x_fim, desligado]
+    motor += [escala.x(t1), desligado]
+    return {
+        "temperatura": escala.pontos(pontos),
+        "faixa": (escala.y(faixa_min), escala.y(faixa_max)),
+        "motor": motor,
+    }
@@ -0,0 +1,242 @@
+"""Gravador colunar da telemetria para corridas longas de extrusão.
+
+Cada gravação é um diretório com um arquivo .npy por coluna e por bloco
+("chunk"). Os arquivos são criados já no tamanho final e mapeados em
+memória, então escrever uma amostra é só copiar bytes para páginas do
+sistema operacional: o uso de RAM não cresce com a duração da corrida e
+a gravação sobrevive a um travamento do cliente até o último flush.
+
+    gravacoes/20250301-080000/
+        gravacao.json          esquema, capacidade, linhas por bloco, quedas do link e trocas de perfil
+        00000/tempo.npy ...    um .npy por coluna (np.load(..., mmap_mode="r") abre direto)
+        00001/...
+
+Requer NumPy.
+"""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+# (nome, dtype). Estados usam -1 quando o dialeto não informa o valor.
+COLUNAS = (
+    ("tempo", "<f8"),         # segundos desde a época (relógio de parede)
+    ("temperatura", "<f4"),
+    ("aquecedor", "i1"),
+    ("motor", "i1"),
+    ("sistema", "i1"),
+    ("velocidade", "<f4"),    # mm/s
+    ("temp_alvo", "<f4"),
+    ("temp_motor", "<f4"),
+)
+ESTADOS = ("aquecedor", "motor", "sistema")
+META = "gravacao.json"
+VERSAO = 1
+
+
+def _criar_diretorio(diretorio, nome):
+    """Cria o diretório da gravação. Sem `nome`, usa a hora e acrescenta -2, -3...
+    se já houver uma gravação naquele segundo (reconexão rápida)."""
+    if nome:
+        caminho = os.path.join(diretorio, nome)
+        os.makedirs(caminho)
+        return caminho
+    base = os.path.join(diretorio, time.strftime("%Y%m%d-%H%M%S"))
+    os.makedirs(diretorio, exist_ok=True)
+    caminho, n = base, 1
+    while True:
+        try:
+            os.mkdir(caminho)
+            return caminho
+        except FileExistsError:
+            n += 1
+            caminho = f"{base}-{n}"
+
+
+class Gravador:
+    """Grava lotes de Amostras em blocos mapeados em memória.
+
+    `anexar` é chamado pela thread de leitura; uma thread própria faz o
+    flush a cada `intervalo_flush` segundos. Depois do `fechar`, `anexar`
+    não faz nada.
+    """
+
+    def __init__(self, diretorio, capacidade=1 << 18, intervalo_flush=5.0, nome=None):
+        self.diretorio = _criar_diretorio(diretorio, nome)
+        self.capacidade = capacidade
+        # Amostra.instante vem de time.monotonic(); a gravação guarda hora de parede
+        self._epoca = time.time() - time.monotonic()
+        self._blocos = []
+        self._colunas = None
+        self._linhas = 0
+        self._quedas = []
+        self._trocas = []
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._novo_bloco()
+        self._salvar_meta()
+        self._flusher = threading.Thread(target=self._flush_periodico, args=(intervalo_flush,), daemon=True)
+        self._flusher.start()
+
+    @property
+    def linhas(self):
+        return self.capacidade * (len(self._blocos) - 1) + self._linhas
+
+    def _novo_bloco(self):
+        pasta = os.path.join(self.diretorio, f"{len(self._blocos):05d}")
+        os.makedirs(pasta)
+        self._colunas = {
+            nome: np.lib.format.open_memmap(os.path.join(pasta, nome + ".npy"), mode="w+",
+                                            dtype=dtype, shape=(self.capacidade,))
+            for nome, dtype in COLUNAS
+        }
+        self._blocos.append(0)
+        self._linhas = 0
+
+    def anexar(self, amostras, **padrao):
+        """Grava um lote de Amostras.
+
+        `padrao` preenche campos que o dialeto não traz (ex.: o cliente Tk
+        passa velocidade/temp_alvo/temp_motor configurados na tela).
+        """
+        if not amostras or self._parar.is_set():
+            return
+        # Transpõe o lote de uma vez: uma tupla por campo da Amostra
+        campos = dict(zip(amostras[0]._fields, zip(*amostras)))
+        valores = {}
+        for nome, dtype in COLUNAS:
+            if nome == "tempo":
+                valores[nome] = np.array(campos["instante"], dtype="<f8") + self._epoca
+                continue
+            coluna = np.array(campos[nome], dtype="<f8")  # None vira NaN
+            if nome in padrao and padrao[nome] is not None:
+                coluna[np.isnan(coluna)] = padrao[nome]
+            if nome in ESTADOS:
+                coluna = np.nan_to_num(coluna, nan=-1)
+            valores[nome] = coluna.astype(dtype)
+
+        with self._lock:
+            if self._parar.is_set():  # fechado enquanto o lote era montado
+                return
+            feito = 0
+            total = len(amostras)
+            while feito < total:
+                if self._linhas == self.capacidade:
+                    self._fechar_bloco()
+                    self._novo_bloco()
+                n = min(total - feito, self.capacidade - self._linhas)
+                for nome, coluna in self._colunas.items():
+                    coluna[self._linhas:self._linhas + n] = valores[nome][feito:feito + n]
+                self._linhas += n
+                self._blocos[-1] = self._linhas
+                feito += n
+
+    def anotar_queda(self, inicio, duracao):
+        """Registra uma queda do link (`inicio` em time.monotonic(), duração em s)."""
+        with self._lock:
+            self._quedas.append([inicio + self._epoca, duracao])
+            self._salvar_meta()
+
+    def anotar_troca(self, troca):
+        """Registra uma troca de configuração (filabottle.perfis.Troca) e o seu RTT."""
+        with self._lock:
+            self._trocas.append([troca.instante + self._epoca, troca.perfil, troca.versao, troca.alterados, troca.rtt])
+            self._salvar_meta()
+
+    def _fechar_bloco(self):
+        for coluna in self._colunas.values():
+            coluna.flush()
+        self._colunas = None  # solta o mapeamento do bloco cheio
+        self._salvar_meta()
+
+    def _salvar_meta(self):
+        meta = {
+            "versao": VERSAO,
+            "colunas": [list(c) for c in COLUNAS],
+            "capacidade": self.capacidade,
+            "blocos": list(self._blocos),
+            "quedas": list(self._quedas),
+            "trocas": list(self._trocas),
+        }
+        temporario = os.path.join(self.diretorio, META + ".tmp")
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(temporario, os.path.join(self.diretorio, META))
+
+    def flush(self):
+        with self._lock:
+            if self._colunas is None:
+                return
+            for coluna in self._colunas.values():
+                coluna.flush()
+            self._salvar_meta()
+
+    def _flush_periodico(self, intervalo):
+        while not self._parar.wait(intervalo):
+            self.flush()
+
+    def fechar(self):
+        self._parar.set()
+        self.flush()
+        with self._lock:
+            self._colunas = None
+
+
+class Gravacao:
+    """Leitura de uma gravação (inclusive uma que ainda está sendo escrita)."""
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        with open(os.path.join(diretorio, META), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta["versao"] > VERSAO:
+            raise ValueError(f"Gravação versão {self.meta['versao']} não suportada")
+        self.colunas = [nome for nome, _ in self.meta["colunas"]]
+        # (início em segundos desde a época, duração em s); gravações antigas não têm
+        self.quedas = [tuple(q) for q in self.meta.get("quedas", ())]
+        # (instante, perfil, versão, {parâmetro: valor}, rtt em s ou None)
+        self.trocas = [tuple(t) for t in self.meta.get("trocas", ())]
+        self._blocos = []
+        for i, linhas in enumerate(self.meta["blocos"]):
+            if not linhas:
+                continue
+            pasta = os.path.join(diretorio, f"{i:05d}")
+            self._blocos.append({
+                nome: np.load(os.path.join(pasta, nome + ".npy"), mmap_mode="r")[:linhas]
+                for nome in self.colunas
+            })
+
+    def __len__(self):
+        return sum(len(b["tempo"]) for b in self._blocos)
+
+    def segmentos(self, inicio=None, fim=None):
+        """Gera, bloco a bloco, dicionários de views (sem cópia) dentro de [inicio, fim)."""
+        for bloco in self._blocos:
+            tempo = bloco["tempo"]
+            a = 0 if inicio is None else int(np.searchsorted(tempo, inicio, "left"))
+            b = len(tempo) if fim is None else int(np.searchsorted(tempo, fim, "left"))
+            if a < b:
+                yield {nome: coluna[a:b] for nome, coluna in bloco.items()}
+
+    def intervalo(self, inicio=None, fim=None):
+        """Colunas dentro de [inicio, fim).
+
+        São views sem cópia quando o intervalo cai num só bloco; só se
+        copia quando é preciso juntar blocos.
+        """
+        partes = list(self.segmentos(inicio, fim))
+        if len(partes) == 1:
+            return partes[0]
+        if not partes:
+            return {nome: np.empty(0, dtype=dtype) for nome, dtype in self.meta["colunas"]}
+        return {nome: np.concatenate([p[nome] for p in partes]) for nome in self.colunas}
+
+
+def gravacoes(diretorio):
+    """Diretórios de gravação dentro de `diretorio`, do mais antigo para o mais novo."""
+    if not os.path.isdir(diretorio):
+        return []
+    return sorted(os.path.join(diretorio, d) for d in os.listdir(diretorio)
+                  if os.path.exists(os.path.join(diretorio, d, META)))
@@ -0,0 +1,280 @@
+"""Métricas do caminho serial -> parser -> tela, no formato do Prometheus.
+
+Contadores e histogramas são só atributos e listas de inteiros: medir uma
+etapa custa dois perf_counter() e um bisect, pouco o bastante para ficar
+ligado em produção. Cada métrica deve ter um único escritor (a thread de
+leitura ou a da interface); quem exporta só lê.
+
+    metricas = Pipeline()
+    amostras = metricas.alimentar(parser, dados)      # bytes, linhas, falhas, parse
+    metricas.ui.observar(segundos)
+    metricas.exibida(amostras[-1])                    # atraso: da leitura até a tela
+    metricas.servir(9464)                              # GET http://127.0.0.1:9464/metrics
+    metricas.gravar_periodicamente("filabottle.prom")  # coletor textfile do node_exporter
+
+`resumo()` é o texto curto da sobreposição de depuração dos clientes.
+"""
+import bisect
+import os
+import threading
+import time
+
+# 10 µs, 20 µs, 40 µs... ~10 s: cobre de um parse a uma reconexão
+LIMITES_PADRAO = tuple(1e-5 * 2 ** i for i in range(21))
+
+
+def _rotulos(rotulos, extra=None):
+    itens = list(rotulos.items()) + ([extra] if extra else [])
+    if not itens:
+        return ""
+    return "{" + ",".join(f'{chave}="{valor}"' for chave, valor in itens) + "}"
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    tipo = "counter"
+
+    def __init__(self, rotulos):
+        self.rotulos = rotulos
+        self.valor = 0
+
+    def exportar(self, nome):
+        yield f"{nome}{_rotulos(self.rotulos)} {_numero(self.valor)}"
+
+
+class Funcao:
+    """Valor lido na hora da exportação (ex.: FilaComandos.enviados): custo zero no caminho quente."""
+
+    def __init__(self, tipo, funcao, rotulos):
+        self.tipo = tipo
+        self.funcao = funcao
+        self.rotulos = rotulos
+
+    def exportar(self, nome):
+        yield f"{nome}{_rotulos(self.rotulos)} {_numero(self.funcao())}"
+
+
+class Histograma:
+    tipo = "histogram"
+
+    def __init__(self, rotulos, limites=LIMITES_PADRAO):
+        self.rotulos = rotulos
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)  # a última é +Inf
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect.bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def quantil(self, q):
+        """Estimativa por interpolação dentro do balde, como o histogram_quantile()."""
+        if not self.total:
+            return None
+        alvo = q * self.total
+        acumulado = 0
+        for i, n in enumerate(self.contagens):
+            if acumulado + n >= alvo and n:
+                if i == len(self.limites):
+                    return self.limites[-1]
+                inferior = self.limites[i - 1] if i else 0.0
+                return inferior + (self.limites[i] - inferior) * (alvo - acumulado) / n
+            acumulado += n
+        return self.limites[-1]
+
+    def exportar(self, nome):
+        acumulado = 0
+        for limite, n in zip(self.limites + (None,), list(self.contagens)):
+            acumulado += n
+            le = ("le", "+Inf" if limite is None else f"{limite:.6g}")
+            yield f"{nome}_bucket{_rotulos(self.rotulos, le)} {acumulado}"
+        yield f"{nome}_sum{_rotulos(self.rotulos)} {self.soma!r}"
+        yield f"{nome}_count{_rotulos(self.rotulos)} {acumulado}"
+
+
+class Registro:
+    def __init__(self):
+        self._familias = {}  # nome -> [tipo, ajuda, {rótulos: métrica}]
+        self._lock = threading.Lock()
+
+    def _obter(self, nome, ajuda, rotulos, criar):
+        chave = tuple(sorted(rotulos.items()))
+        familia = self._familias.get(nome)
+        if familia is not None and chave in familia[2]:
+            return familia[2][chave]
+        with self._lock:
+            metrica = criar()
+            familia = self._familias.setdefault(nome, [metrica.tipo, ajuda, {}])
+            return familia[2].setdefault(chave, metrica)
+
+    def contador(self, nome, ajuda, **rotulos):
+        return self._obter(nome, ajuda, rotulos, lambda: Contador(rotulos))
+
+    def histograma(self, nome, ajuda, limites=LIMITES_PADRAO, **rotulos):
+        return self._obter(nome, ajuda, rotulos, lambda: Histograma(rotulos, limites))
+
+    def funcao(self, nome, ajuda, funcao, tipo="gauge", **rotulos):
+        """Registra (ou troca) um valor calculado na exportação."""
+        chave = tuple(sorted(rotulos.items()))
+        with self._lock:
+            familia = self._familias.setdefault(nome, [tipo, ajuda, {}])
+            familia[2][chave] = Funcao(tipo, funcao, rotulos)
+
+    def texto(self):
+        """Formato de exposição em texto do Prometheus (versão 0.0.4)."""
+        with self._lock:
+            familias = [(nome, f[0], f[1], list(f[2].values())) for nome, f in self._familias.items()]
+        linhas = []
+        for nome, tipo, ajuda, metricas in familias:
+            linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+            for metrica in metricas:
+                try:
+                    linhas.extend(metrica.exportar(nome))
+                except Exception:  # uma Funcao cujo objeto já foi fechado
+                    pass
+        return "\n".join(linhas) + "\n"
+
+    def servir(self, porta, host="127.0.0.1"):
+        """Serve GET /metrics numa thread própria; retorna o servidor."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registro = self
+
+        class Pedido(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                corpo = registro.texto().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *args):
+                pass
+
+        servidor = ThreadingHTTPServer((host, porta), Pedido)
+        servidor.daemon_threads = True
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        return servidor
+
+    def gravar(self, caminho):
+        temporario = caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(self.texto())
+        os.replace(temporario, caminho)
+
+    def gravar_periodicamente(self, caminho, intervalo=10.0):
+        def repetir():
+            while True:
+                try:
+                    self.gravar(caminho)
+                except OSError as e:
+                    print("Erro ao gravar métricas:", e)
+                time.sleep(intervalo)
+
+        threading.Thread(target=repetir, daemon=True).start()
+
+
+class Pipeline:
+    """As métricas padrão dos clientes e do serviço, num Registro."""
+
+    def __init__(self, registro=None):
+        r = self.registro = registro or Registro()
+        self.bytes = r.contador("filabottle_bytes_lidos_total", "Bytes lidos da serial (ou do serviço)")
+        self.linhas = r.contador("filabottle_linhas_total", "Linhas ou quadros completos recebidos")
+        self.falhas = r.contador("filabottle_falhas_parse_total", "Linhas ou quadros que não foram entendidos")
+        self.amostras = r.contador("filabottle_amostras_total", "Amostras de temperatura decodificadas")
+        ajuda = "Duração de cada etapa do caminho serial -> tela"
+        self.leitura = r.histograma("filabottle_etapa_segundos", ajuda, etapa="leitura")
+        self.parse = r.histograma("filabottle_etapa_segundos", ajuda, etapa="parse")
+        self.ui = r.histograma("filabottle_etapa_segundos", ajuda, etapa="ui")
+        self.grafico = r.histograma("filabottle_etapa_segundos", ajuda, etapa="grafico")
+        # atraso: de Amostra.instante (o momento em que os bytes foram lidos da
+        # serial) até a amostra estar na tela; medido só pelo exibida(), igual
+        # nos dois clientes. espera: quanto os bytes ficaram no buffer da serial
+        # antes da leitura (estimativa de quem lê por polling, como o Kivy; com a
+        # leitura bloqueante do Tk é ~0 e não é medida). A soma dos dois é o
+        # atraso do Arduino até a tela.
+        self.atraso = r.histograma("filabottle_atraso_segundos",
+                                   "Da leitura da amostra na serial até ela aparecer na tela")
+        self.espera = r.histograma("filabottle_espera_segundos",
+                                   "Tempo estimado dos bytes no buffer da serial antes da leitura")
+        self.troca = r.histograma("filabottle_troca_config_segundos",
+                                  "Da troca de configuração (perfil) até a confirmação do Arduino")
+        self._erros = {}
+        self._alarmes = {}
+        self.servir = r.servir
+        self.gravar_periodicamente = r.gravar_periodicamente
+
+    def alimentar(self, parser, dados, instante=None):
+        """parser.alimentar() medido: conta bytes, linhas, falhas, amostras e o tempo do parse."""
+        linhas, falhas = parser.linhas, parser.falhas
+        inicio = time.perf_counter()
+        amostras = parser.alimentar(dados, instante)
+        if dados:  # chamadas vazias só deixam a negociação expirar
+            self.parse.observar(time.perf_counter() - inicio)
+            self.bytes.valor += len(dados)
+        self.linhas.valor += parser.linhas - linhas
+        self.falhas.valor += parser.falhas - falhas
+        self.amostras.valor += len(amostras)
+        return amostras
+
+    def erro(self, etapa):
+        """Conta um erro da etapa (leitura, conexao, ui...)."""
+        contador = self._erros.get(etapa)
+        if contador is None:
+            contador = self._erros[etapa] = self.registro.contador("filabottle_erros_total", "Erros por etapa",
+                                                                   etapa=etapa)
+        contador.valor += 1
+
+    def alarme(self, tipo):
+        """Conta um alarme novo do Detector de anomalias."""
+        contador = self._alarmes.get(tipo)
+        if contador is None:
+            contador = self._alarmes[tipo] = self.registro.contador("filabottle_alarmes_total",
+                                                                    "Alarmes da telemetria por tipo", tipo=tipo)
+        contador.valor += 1
+
+    def exibida(self, amostra, agora=None):
+        """A amostra acabou de ir para a tela: observa o atraso desde a leitura."""
+        self.atraso.observar((time.monotonic() if agora is None else agora) - amostra.instante)
+
+    def troca_config(self, troca):
+        """Uma troca do filabottle.perfis: o RTT, ou um erro se não foi confirmada."""
+        if troca.rtt is None:
+            self.erro("perfil")
+        else:
+            self.troca.observar(troca.rtt)
+
+    def comandos(self, fila):
+        """Exporta os contadores de uma FilaComandos (lidos só na exportação)."""
+        r = self.registro
+        r.funcao("filabottle_comandos_escritos_total", "Comandos escritos na serial",
+                 lambda: fila.enviados, tipo="counter")
+        r.funcao("filabottle_comandos_agrupados_total", "Comandos substituídos por um mais novo na fila",
+                 lambda: fila.coalescidos, tipo="counter")
+        r.funcao("filabottle_comandos_confirmados_total", "Comandos confirmados pelo Arduino",
+                 lambda: fila.confirmados, tipo="counter")
+        r.funcao("filabottle_comandos_expirados_total", "Comandos sem confirmação no prazo",
+                 lambda: fila.expirados, tipo="counter")
+
+    def resumo(self):
+        """Texto curto para a sobreposição de depuração."""
+        linhas = []
+        for nome, h in (("leitura", self.leitura), ("parse", self.parse), ("ui", self.ui),
+                        ("gráfico", self.grafico), ("espera", self.espera), ("atraso", self.atraso)):
+            if h.total:
+                linhas.append(f"{nome:<8} p50 {h.quantil(0.5) * 1000:6.2f} ms  p99 {h.quantil(0.99) * 1000:6.2f} ms")
+        erros = sum(c.valor for c in self._erros.values())
+        linhas.append(f"bytes {self.bytes.valor}  linhas {self.linhas.valor}  falhas {self.falhas.valor}"
+                      f"  erros {erros}")
+        return "\n".join(linhas)
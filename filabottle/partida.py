@@ -0,0 +1,161 @@
+"""Perfil de partida: tempo de cada importação e até a primeira temperatura.
+
+Os pontos de entrada importam este módulo antes de qualquer outro pesado
+(ele só usa a biblioteca padrão que o interpretador já carregou), então
+`INICIO` marca o começo do script. Com `--profile-startup` os clientes
+chamam `perfil.instalar()`, que mede as importações feitas pela thread
+principal, e imprimem o relatório na primeira temperatura:
+
+    Importações (ms, inclusivo; >= 1 ms):
+       22.4  tkinter
+       ...
+    Marcos (ms desde o início do script):
+      131.0  janela
+      640.2  primeira temperatura
+
+A partida sem interface (`python -m filabottle.partida --porta ...`) faz o
+mesmo caminho dos clientes até a primeira amostra e falha (código 1) se
+passar de `LIMITE_PRIMEIRA_LEITURA`. `--cliente tk|kivy` importa o módulo
+do cliente de verdade, sem rodar o main (não precisa de tela), e falha se
+passar de `LIMITES_IMPORTACAO`; `benchmark partida` roda os dois contra o
+simulador.
+"""
+import builtins
+import os
+import sys
+import threading
+import time
+
+INICIO = time.perf_counter()
+
+# Limite de regressão da partida sem interface contra o simulador a 10 Hz.
+# Mediana medida: ~0,06 s, quase tudo espera pela amostra; o limite dá folga
+# para máquinas lentas.
+LIMITE_PRIMEIRA_LEITURA = 0.5
+
+_RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CLIENTES = {
+    "tk": os.path.join(_RAIZ, "Client", "Fila Pet Controller Alpha 0.1.py"),
+    "kivy": os.path.join(_RAIZ, "ClienteAndroid", "main.py"),
+}
+# Limites da importação a frio de cada cliente (do início do interpretador até o
+# módulo carregado). Medianas medidas: tk ~0,05 s, kivy ~0,42 s; folga para máquinas lentas.
+LIMITES_IMPORTACAO = {"tk": 0.3, "kivy": 1.5}
+
+
+class Perfil:
+    def __init__(self, inicio=INICIO):
+        self.inicio = inicio
+        self.ativo = False
+        self.importacoes = []  # [profundidade, nome, segundos] na ordem em que começaram
+        self.marcos = {}  # evento -> segundos desde o início
+        self._profundidade = 0
+        self._original = None
+
+    def instalar(self):
+        self.ativo = True
+        self._original = builtins.__import__
+        builtins.__import__ = self._importar
+
+    def desinstalar(self):
+        if self._original is not None:
+            builtins.__import__ = self._original
+            self._original = None
+
+    # Mesmos nomes de parâmetro do builtins.__import__: há quem o chame com fromlist=/level=
+    def _importar(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # Módulo já carregado ou importação de outra thread (ex.: descoberta de portas): não mede
+        if (level == 0 and name in sys.modules) or threading.current_thread() is not threading.main_thread():
+            return self._original(name, globals, locals, fromlist, level)
+        registro = [self._profundidade, name, 0.0]
+        self.importacoes.append(registro)
+        self._profundidade += 1
+        comeco = time.perf_counter()
+        try:
+            return self._original(name, globals, locals, fromlist, level)
+        finally:
+            registro[2] = time.perf_counter() - comeco
+            self._profundidade -= 1
+
+    def marcar(self, evento):
+        """Registra o evento só na primeira vez; diz se foi a primeira."""
+        if evento in self.marcos:
+            return False
+        self.marcos[evento] = time.perf_counter() - self.inicio
+        return True
+
+    def relatorio(self, minimo=0.001, profundidade=2):
+        linhas = [f"Importações (ms, inclusivo; >= {minimo * 1000:.0f} ms):"]
+        for nivel, nome, segundos in self.importacoes:
+            if segundos >= minimo and nivel < profundidade:
+                linhas.append(f"  {segundos * 1000:7.1f}  {'  ' * nivel}{nome}")
+        total = sum(segundos for nivel, _, segundos in self.importacoes if nivel == 0)
+        linhas.append(f"  {total * 1000:7.1f}  total")
+        linhas.append("Marcos (ms desde o início do script):")
+        for evento, segundos in sorted(self.marcos.items(), key=lambda item: item[1]):
+            linhas.append(f"  {segundos * 1000:7.1f}  {evento}")
+        return "\n".join(linhas)
+
+
+perfil = Perfil()
+
+
+def primeira_leitura(porta, timeout=10.0):
+    """Caminho dos clientes sem a interface: abre, negocia e espera a primeira amostra."""
+    import serial
+
+    from filabottle.binario import BAUD_TEXTO, ProtocoloAutomatico
+
+    perfil.marcar("importações")
+    arduino = serial.Serial(porta, BAUD_TEXTO, timeout=0.1)
+    try:
+        parser = ProtocoloAutomatico(arduino)
+        perfil.marcar("conectado")
+        limite = time.monotonic() + timeout
+        while time.monotonic() < limite:
+            if parser.alimentar(arduino.read(max(1, arduino.in_waiting))):
+                perfil.marcar("primeira temperatura")
+                return perfil.marcos["primeira temperatura"]
+        return None
+    finally:
+        arduino.close()
+
+
+def importar_cliente(nome):
+    """Carrega o módulo do cliente como os pontos de entrada fazem, mas sem o main."""
+    import importlib.util
+
+    caminho = CLIENTES[nome]
+    sys.argv = [caminho]  # os clientes olham o sys.argv ao serem importados
+    spec = importlib.util.spec_from_file_location("cliente_" + nome, caminho)
+    spec.loader.exec_module(importlib.util.module_from_spec(spec))
+    perfil.marcar("cliente importado")
+    return perfil.marcos["cliente importado"]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tempo até a primeira temperatura, sem interface")
+    destino = parser.add_mutually_exclusive_group(required=True)
+    destino.add_argument("--porta")
+    destino.add_argument("--cliente", choices=sorted(CLIENTES), help="mede a importação do cliente")
+    parser.add_argument("--limite", type=float, help="segundos")
+    args = parser.parse_args()
+    perfil.instalar()
+    if args.cliente:
+        evento, limite = "importação", args.limite or LIMITES_IMPORTACAO[args.cliente]
+        segundos = importar_cliente(args.cliente)
+    else:
+        evento, limite = "primeira temperatura", args.limite or LIMITE_PRIMEIRA_LEITURA
+        segundos = primeira_leitura(args.porta)
+    perfil.desinstalar()
+    print(perfil.relatorio())
+    if segundos is None or segundos > limite:
+        print(f"REGRESSÃO: {evento} {'não chegou' if segundos is None else f'em {segundos:.3f} s'}"
+              f" (limite {limite:.3f} s)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
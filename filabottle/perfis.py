@@ -0,0 +1,231 @@
+"""Perfis de material versionados e troca de configuração só com o que mudou.
+
+Os perfis ficam num JSON do host (ex.: ~/FilaBottle/perfis.json). Salvar
+um perfil com valores novos cria uma versão nova; as antigas continuam lá
+("PET@2" aplica a versão 2).
+
+O Configurador conhece o último estado do Arduino (telemetria binária ou
+DATA, ou a última troca confirmada) e manda só os parâmetros diferentes.
+No FilaBottle_UNO a troca é um único `CFG,VEL=..,TMAX=..,TMOTOR=..`: tudo
+ou nada, uma confirmação e uma gravação na EEPROM. O dialeto do app Kivy
+não tem comando em lote: lá saem só os SET_* que mudaram. Cada troca vira
+uma Troca com o RTT (do envio à confirmação), que os clientes gravam junto
+da telemetria.
+
+    python -m filabottle.perfis                        # lista
+    python -m filabottle.perfis salvar PETG --temp-alvo 240 --temp-motor 170 --velocidade 35
+    python -m filabottle.perfis historico PET
+"""
+import argparse
+import collections
+import json
+import os
+import time
+
+PARAMETROS = ("velocidade", "temp_alvo", "temp_motor")  # os nomes dos campos da Amostra
+# Chaves do CFG do FilaBottle_UNO e faixas aceitas (as mesmas do carregarConfiguracoes)
+CHAVES_CFG = {"velocidade": "VEL", "temp_alvo": "TMAX", "temp_motor": "TMOTOR"}
+FAIXAS_UNO = {"velocidade": (1.0, 100.0), "temp_alvo": (100.0, 300.0), "temp_motor": (100.0, 300.0)}
+# Comandos do dialeto Kivy, um por parâmetro
+COMANDOS_KIVY = {"velocidade": "SET_VEL", "temp_alvo": "SET_TEMP", "temp_motor": "SET_MOTOR_TEMP"}
+TOLERANCIA = 0.01  # a mesma da confirmação pela telemetria na FilaComandos
+VERSAO = 1
+# Ponto de partida quando ainda não há arquivo
+PADRAO = {
+    "PET": {"velocidade": 40.0, "temp_alvo": 260.0, "temp_motor": 180.0},
+    "PETG": {"velocidade": 35.0, "temp_alvo": 240.0, "temp_motor": 170.0},
+}
+
+Perfil = collections.namedtuple("Perfil", "nome versao parametros criado")
+# instante em time.monotonic(); rtt None = sem confirmação no prazo
+Troca = collections.namedtuple("Troca", "instante perfil versao alterados rtt")
+
+
+class Perfis:
+    """Os perfis salvos num arquivo JSON, cada um com todas as suas versões.
+
+    Com `caminho=None` ficam só os PADRAO, em memória (ex.: o arquivo não pôde
+    ser lido e o cliente segue sem ele).
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        try:
+            if caminho is None:
+                raise FileNotFoundError
+            with open(caminho, encoding="utf-8") as f:
+                dados = json.load(f)
+        except FileNotFoundError:
+            dados = {"versao": VERSAO, "perfis": {}}
+            for nome, parametros in PADRAO.items():
+                dados["perfis"][nome] = [{"versao": 1, "criado": None, "parametros": parametros}]
+        if dados.get("versao", 0) > VERSAO:
+            raise ValueError(f"Arquivo de perfis versão {dados['versao']} não suportado")
+        self._perfis = dados["perfis"]
+
+    def nomes(self):
+        return sorted(self._perfis)
+
+    def historico(self, nome):
+        return [Perfil(nome, v["versao"], v["parametros"], v["criado"]) for v in self._perfis[nome]]
+
+    def obter(self, nome, versao=None):
+        """A última versão, ou a pedida. Aceita "NOME@VERSAO". KeyError se não existe."""
+        if versao is None and "@" in nome:
+            nome, _, versao = nome.rpartition("@")
+            versao = int(versao)
+        versoes = self.historico(nome)
+        if versao is None:
+            return versoes[-1]
+        for perfil in versoes:
+            if perfil.versao == versao:
+                return perfil
+        raise KeyError(f"{nome}@{versao}")
+
+    def salvar(self, nome, parametros):
+        """Cria uma versão nova se algum valor mudou; devolve o Perfil atual."""
+        parametros = {p: float(parametros[p]) for p in PARAMETROS}
+        versoes = self._perfis.setdefault(nome, [])
+        if versoes and not diferenca(parametros, versoes[-1]["parametros"]):
+            return self.obter(nome)
+        versoes.append({"versao": len(versoes) + 1, "criado": time.strftime("%Y-%m-%d %H:%M:%S"),
+                        "parametros": parametros})
+        if self.caminho is None:
+            return self.obter(nome)
+        os.makedirs(os.path.dirname(os.path.abspath(self.caminho)), exist_ok=True)
+        temporario = self.caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({"versao": VERSAO, "perfis": self._perfis}, f, indent=1, ensure_ascii=False)
+        os.replace(temporario, self.caminho)
+        return self.obter(nome)
+
+
+def diferenca(parametros, estado):
+    """Os parâmetros cujo valor no `estado` é desconhecido (None) ou diferente."""
+    return {p: v for p, v in parametros.items()
+            if estado.get(p) is None or abs(estado[p] - v) >= TOLERANCIA}
+
+
+def comando_cfg(alterados):
+    """A linha CFG do FilaBottle_UNO. ValueError fora das faixas que o firmware aceita."""
+    for p, v in alterados.items():
+        minimo, maximo = FAIXAS_UNO[p]
+        if not minimo <= v <= maximo:
+            raise ValueError(f"{p} = {v} fora de {minimo:g}..{maximo:g}")
+    return "CFG," + ",".join(f"{CHAVES_CFG[p]}={alterados[p]:.2f}" for p in PARAMETROS if p in alterados)
+
+
+class Configurador:
+    """Aplica perfis pela FilaComandos mandando só o que difere do estado do Arduino.
+
+    Assume a `ao_concluir` da fila. `observar(amostras)` vai no mesmo tique
+    do `fila.observar`; `esquecer()` depois de (re)abrir a porta, porque o
+    UNO reinicia e volta aos valores da EEPROM.
+    """
+
+    def __init__(self, fila, dialeto="uno", ao_concluir=None):
+        self.fila = fila
+        self.dialeto = dialeto
+        self.ao_concluir = ao_concluir  # chamado com cada Troca, confirmada ou não
+        self.estado = dict.fromkeys(PARAMETROS)
+        self.trocas = collections.deque(maxlen=100)
+        self._em_curso = []
+        fila.ao_concluir = self._pendente_concluido
+
+    def observar(self, amostras):
+        """A telemetria binária e a DATA trazem os valores em uso."""
+        if amostras and amostras[-1].temp_alvo is not None:
+            ultima = amostras[-1]
+            for p in PARAMETROS:
+                self.estado[p] = getattr(ultima, p)
+
+    def esquecer(self):
+        self.estado = dict.fromkeys(PARAMETROS)
+        self._em_curso = []
+
+    def aplicar(self, parametros, perfil=None, versao=None):
+        """Enfileira a troca e devolve os parâmetros que vão sair ({} se nada muda)."""
+        alterados = diferenca(parametros, self.estado)
+        if not alterados:
+            return alterados
+        if self.dialeto == "uno":
+            pendentes = [self.fila.enviar("CFG", comando_cfg(alterados))]
+        else:
+            pendentes = [self.fila.enviar(COMANDOS_KIVY[p], f"{COMANDOS_KIVY[p]},{v:.2f}", esperado=(p, v))
+                         for p, v in alterados.items()]
+        # Um comando ainda na fila é reaproveitado com a linha nova: a troca anterior perde esse pedaço
+        for troca in self._em_curso:
+            troca["pendentes"].difference_update(pendentes)
+        self._em_curso = [t for t in self._em_curso if t["pendentes"]]
+        self._em_curso.append({"perfil": perfil, "versao": versao, "alterados": alterados,
+                               "inicio": time.monotonic(), "pendentes": set(pendentes)})
+        return alterados
+
+    def _pendente_concluido(self, pendente, rtt):
+        for troca in self._em_curso:
+            if pendente not in troca["pendentes"]:
+                continue
+            troca["pendentes"].discard(pendente)
+            if rtt is None:
+                troca["falhou"] = True
+            if troca["pendentes"]:
+                return
+            self._em_curso.remove(troca)
+            falhou = troca.get("falhou", False)
+            for p, v in troca["alterados"].items():
+                # Sem confirmação não se sabe o que o Arduino tem
+                self.estado[p] = None if falhou else v
+            fim = pendente.enviado + rtt if not falhou else None
+            concluida = Troca(troca["inicio"], troca["perfil"], troca["versao"], troca["alterados"],
+                              None if falhou else fim - troca["inicio"])
+            self.trocas.append(concluida)
+            if self.ao_concluir:
+                self.ao_concluir(concluida)
+            return
+
+
+def descrever(troca):
+    nome = f"{troca.perfil} v{troca.versao}" if troca.versao else (troca.perfil or "Configuração")
+    mudou = ", ".join(f"{p} {v:g}" for p, v in troca.alterados.items())
+    if troca.rtt is None:
+        return f"{nome}: sem confirmação ({mudou})"
+    return f"{nome}: {mudou} em {troca.rtt * 1000:.0f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--arquivo", default=os.path.join(os.path.expanduser("~"), "FilaBottle", "perfis.json"))
+    sub = parser.add_subparsers(dest="acao")
+    p = sub.add_parser("salvar", help="cria ou atualiza um perfil (versão nova se algo mudou)")
+    p.add_argument("nome")
+    for parametro in PARAMETROS:
+        p.add_argument("--" + parametro.replace("_", "-"), type=float)
+    p = sub.add_parser("historico", help="todas as versões de um perfil")
+    p.add_argument("nome")
+    args = parser.parse_args()
+    try:
+        perfis = Perfis(args.arquivo)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.acao == "salvar":
+        atual = perfis.obter(args.nome).parametros if args.nome in perfis.nomes() else {}
+        parametros = {p: getattr(args, p) if getattr(args, p) is not None else atual.get(p) for p in PARAMETROS}
+        faltando = [p for p, v in parametros.items() if v is None]
+        if faltando:
+            parser.error("perfil novo: informe " + ", ".join("--" + p.replace("_", "-") for p in faltando))
+        perfil = perfis.salvar(args.nome, parametros)
+        print(f"{perfil.nome} v{perfil.versao}: {perfil.parametros}")
+    elif args.acao == "historico":
+        if args.nome not in perfis.nomes():
+            parser.error(f"perfil {args.nome} não existe")
+        for perfil in perfis.historico(args.nome):
+            print(f"v{perfil.versao}  {perfil.criado or '(padrão)':<19}  {perfil.parametros}")
+    else:
+        for nome in perfis.nomes():
+            perfil = perfis.obter(nome)
+            print(f"{nome:<10} v{perfil.versao}  {perfil.parametros}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""Produção por corrida e por turno a partir das gravações de telemetria (requer NumPy).
+
+Metros = integral de (motor ligado x velocidade) no tempo; gramas e garrafas
+saem do diâmetro e da densidade do filamento. "Espera" é o tempo com o
+sistema ligado e o motor parado porque a temperatura está abaixo de
+temp_motor (o firmware só puxa com o hotend quente).
+
+    python -m filabottle.producao ~/FilaBottle/gravacoes
+    python -m filabottle.producao ~/FilaBottle/gravacoes --corridas --por dia
+    python -m filabottle.producao DIR --turnos 07:00,19:00 --garrafa 25
+
+Cada amostra vale até a seguinte, então cada grandeza vira uma integral
+acumulada nos instantes das amostras, linear entre eles: o total de
+qualquer intervalo (um turno, um dia) é a diferença de np.interp nas
+bordas, sem laço por amostra. Intervalos maiores que `lacuna` (link
+caído, cliente fechado) não contam.
+
+Os totais por corrida e por turno ficam em DIR/producao.json; na próxima
+execução só as linhas novas de cada gravação são lidas.
+"""
+import argparse
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from filabottle.gravador import META, Gravacao, gravacoes
+
+LEDGER = "producao.json"
+VERSAO = 1
+# Grandezas integradas, nesta ordem, nos totais do ledger
+GRANDEZAS = ("dados", "motor", "espera", "metros")  # s, s, s, m
+TURNOS = ("06:00", "14:00", "22:00")
+VELOCIDADE = 40.0    # mm/s, o padrão do cliente Tk quando a gravação não traz
+TEMP_MOTOR = 180.0
+LACUNA = 5.0         # s
+DIAMETRO = 1.75      # mm
+DENSIDADE = 1.38     # g/cm³ (PET)
+GARRAFA = 20.0       # g aproveitados por garrafa (sem gargalo e fundo)
+
+
+def taxas(colunas, velocidade=VELOCIDADE, temp_motor=TEMP_MOTOR):
+    """Taxa de cada grandeza em cada amostra: matriz (amostras, 4).
+
+    Dialetos sem o estado do motor (-1) usam a regra do firmware: liga com
+    a temperatura em temp_motor e o sistema ligado.
+    """
+    temperatura = colunas["temperatura"]
+    motor = colunas["motor"]
+    sistema = colunas["sistema"] != 0
+    limite = np.where(np.isnan(colunas["temp_motor"]), temp_motor, colunas["temp_motor"])
+    mm_s = np.where(np.isnan(colunas["velocidade"]), velocidade, colunas["velocidade"])
+    ligado = np.where(motor >= 0, motor == 1, (temperatura >= limite) & sistema)
+    espera = ~ligado & sistema & (temperatura < limite)
+    saida = np.empty((len(temperatura), len(GRANDEZAS)))
+    saida[:, 0] = 1.0
+    saida[:, 1] = ligado
+    saida[:, 2] = espera
+    saida[:, 3] = ligado * mm_s / 1000.0
+    return saida
+
+
+def inicios_turno(inicio, fim, turnos=TURNOS):
+    """Instantes (época) em que começa cada turno, do dia anterior a `inicio` até `fim`."""
+    minutos = sorted(int(h) * 60 + int(m) for h, m in (turno.split(":") for turno in turnos))
+    dia = time.localtime(inicio)
+    inicios = []
+    for d in range(-1, int((fim - inicio) // 86400) + 2):
+        for minuto in minutos:
+            # mktime normaliza dia e minuto fora da faixa e acerta o horário de verão
+            inicios.append(time.mktime((dia.tm_year, dia.tm_mon, dia.tm_mday + d, 0, minuto, 0, 0, 0, -1)))
+    return np.array(sorted(inicios))
+
+
+class Integrador:
+    """Acumula as grandezas de uma corrida, segmento a segmento, totais e por turno."""
+
+    def __init__(self, turnos=TURNOS, lacuna=LACUNA, ultimo=None):
+        self.turnos = turnos
+        self.lacuna = lacuna
+        self.ultimo = ultimo  # [t, taxas...] da última amostra: vale até a próxima
+        self.totais = np.zeros(len(GRANDEZAS))
+        self.por_turno = {}
+        self.inicio = None
+
+    def anexar(self, tempo, taxas):
+        if not len(tempo):
+            return
+        if self.inicio is None:
+            self.inicio = float(tempo[0])
+        if self.ultimo is not None:
+            tempo = np.concatenate([[self.ultimo[0]], tempo])
+            taxas = np.vstack([self.ultimo[1:], taxas])
+        dt = np.diff(tempo)
+        dt[(dt > self.lacuna) | (dt < 0)] = 0.0
+        acumulado = np.zeros((len(tempo), len(GRANDEZAS)))
+        np.cumsum(taxas[:-1] * dt[:, None], axis=0, out=acumulado[1:])
+        # Bordas de turno dentro do segmento: o valor acumulado nelas sai por interpolação
+        inicios = inicios_turno(tempo[0], tempo[-1], self.turnos)
+        bordas = inicios[(inicios > tempo[0]) & (inicios < tempo[-1])]
+        pontos = np.concatenate([[tempo[0]], bordas, [tempo[-1]]])
+        valores = np.column_stack([np.interp(pontos, tempo, acumulado[:, j]) for j in range(len(GRANDEZAS))])
+        pedacos = np.diff(valores, axis=0)
+        donos = inicios[np.searchsorted(inicios, pontos[:-1], side="right") - 1]
+        for dono, pedaco in zip(donos, pedacos):
+            chave = str(int(dono))
+            self.por_turno[chave] = self.por_turno.get(chave, 0.0) + pedaco
+        self.totais += acumulado[-1]
+        self.ultimo = [float(tempo[-1])] + [float(x) for x in taxas[-1]]
+
+
+def _ledger_vazio(parametros):
+    return {"versao": VERSAO, "parametros": parametros, "corridas": {}}
+
+
+def carregar_ledger(caminho, parametros):
+    """Ledger salvo, ou um vazio se não existe ou foi feito com outros parâmetros."""
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            ledger = json.load(f)
+    except (OSError, ValueError):
+        return _ledger_vazio(parametros)
+    if ledger.get("versao") != VERSAO or ledger.get("parametros") != parametros:
+        return _ledger_vazio(parametros)
+    return ledger
+
+
+def salvar_ledger(caminho, ledger):
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(ledger, f)
+    os.replace(temporario, caminho)
+
+
+def atualizar(diretorio, velocidade=VELOCIDADE, temp_motor=TEMP_MOTOR, turnos=TURNOS, lacuna=LACUNA,
+              ledger=None):
+    """Integra as linhas novas de cada gravação em `diretorio`.
+
+    Devolve (ledger, amostras lidas). De gravações sem linhas novas desde
+    o último ledger só o gravacao.json é lido.
+    """
+    parametros = {"velocidade": velocidade, "temp_motor": temp_motor, "turnos": list(turnos), "lacuna": lacuna}
+    caminho = ledger or os.path.join(diretorio, LEDGER)
+    dados = carregar_ledger(caminho, parametros)
+    lidas = 0
+    for pasta in gravacoes(diretorio):
+        nome = os.path.basename(pasta)
+        corrida = dados["corridas"].get(nome)
+        try:
+            with open(os.path.join(pasta, META), encoding="utf-8") as f:
+                linhas = sum(json.load(f)["blocos"])
+            if corrida and corrida["linhas"] == linhas:
+                continue
+            gravacao = Gravacao(pasta)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"{nome}: ignorada ({e})")
+            continue
+        integrador = Integrador(turnos, lacuna, corrida["ultimo"] if corrida else None)
+        if corrida:
+            integrador.inicio = corrida["inicio"]
+            integrador.totais[:] = corrida["totais"]
+            integrador.por_turno = {k: np.array(v) for k, v in corrida["turnos"].items()}
+        # Só as amostras depois da última já integrada
+        desde = math.nextafter(corrida["ultimo"][0], math.inf) if corrida else None
+        for segmento in gravacao.segmentos(inicio=desde):
+            integrador.anexar(segmento["tempo"], taxas(segmento, velocidade, temp_motor))
+            lidas += len(segmento["tempo"])
+        if integrador.ultimo is None:
+            continue
+        dados["corridas"][nome] = {
+            "linhas": linhas,
+            "inicio": integrador.inicio,
+            "fim": integrador.ultimo[0],
+            "ultimo": integrador.ultimo,
+            "totais": integrador.totais.tolist(),
+            "turnos": {k: v.tolist() for k, v in integrador.por_turno.items()},
+        }
+    salvar_ledger(caminho, dados)
+    return dados, lidas
+
+
+def gramas_por_metro(diametro=DIAMETRO, densidade=DENSIDADE):
+    # mm² x 1000 mm = cm³ por metro
+    return densidade * math.pi * (diametro / 2) ** 2
+
+
+def por_turno(ledger, por="turno"):
+    """Soma os turnos de todas as corridas: {início do turno (ou do dia): totais}."""
+    soma = {}
+    for corrida in ledger["corridas"].values():
+        for chave, valores in corrida["turnos"].items():
+            inicio = float(chave)
+            if por == "dia":
+                dia = time.localtime(inicio)
+                inicio = time.mktime((dia.tm_year, dia.tm_mon, dia.tm_mday, 0, 0, 0, 0, 0, -1))
+            soma[inicio] = soma.get(inicio, 0.0) + np.asarray(valores)
+    return dict(sorted(soma.items()))
+
+
+def _linha(rotulo, valores, g_m, garrafa):
+    dados, motor, espera, metros = valores
+    horas = dados / 3600
+    por_hora = metros / horas if horas else 0.0
+    uso = 100 * motor / dados if dados else 0.0
+    gramas = metros * g_m
+    return (f"{rotulo:<17} {horas:6.1f} h {uso:5.0f}% {espera / 60:7.0f} min {metros:9.1f} m"
+            f" {por_hora:7.1f} m/h {gramas / 1000:7.2f} kg {gramas / garrafa:8.0f}")
+
+
+def relatorio(ledger, por="turno", corridas=False, diametro=DIAMETRO, densidade=DENSIDADE, garrafa=GARRAFA):
+    g_m = gramas_por_metro(diametro, densidade)
+    cabecalho = (f"{'':<17} {'dados':>8} {'motor':>6} {'espera':>11} {'metros':>11} {'vazão':>11}"
+                 f" {'massa':>10} {'garrafas':>7}")
+    linhas = [f"Filamento {diametro} mm a {densidade} g/cm³: {g_m:.2f} g/m,"
+              f" {garrafa / g_m:.1f} m por garrafa de {garrafa:.0f} g"]
+    if corridas:
+        linhas += ["", "Corridas", cabecalho]
+        for nome, corrida in sorted(ledger["corridas"].items()):
+            linhas.append(_linha(nome, corrida["totais"], g_m, garrafa))
+    linhas += ["", "Por dia" if por == "dia" else "Por turno (início)", cabecalho]
+    formato = "%Y-%m-%d" if por == "dia" else "%Y-%m-%d %H:%M"
+    total = np.zeros(len(GRANDEZAS))
+    for inicio, valores in por_turno(ledger, por).items():
+        linhas.append(_linha(time.strftime(formato, time.localtime(inicio)), valores, g_m, garrafa))
+        total += valores
+    linhas.append(_linha("Total", total, g_m, garrafa))
+    return "\n".join(linhas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("diretorio", help="diretório das gravações (ex.: ~/FilaBottle/gravacoes)")
+    parser.add_argument("--turnos", default=",".join(TURNOS), help="início de cada turno, HH:MM separados por vírgula")
+    parser.add_argument("--por", choices=("turno", "dia"), default="turno")
+    parser.add_argument("--corridas", action="store_true", help="lista também cada gravação")
+    parser.add_argument("--velocidade", type=float, default=VELOCIDADE,
+                        help="mm/s quando a gravação não traz a velocidade")
+    parser.add_argument("--temp-motor", type=float, default=TEMP_MOTOR,
+                        help="°C quando a gravação não traz temp_motor")
+    parser.add_argument("--lacuna", type=float, default=LACUNA, help="intervalos maiores (s) não contam")
+    parser.add_argument("--diametro", type=float, default=DIAMETRO, help="mm")
+    parser.add_argument("--densidade", type=float, default=DENSIDADE, help="g/cm³")
+    parser.add_argument("--garrafa", type=float, default=GARRAFA, help="gramas aproveitados por garrafa")
+    parser.add_argument("--ledger", help=f"arquivo dos totais (padrão: DIRETORIO/{LEDGER})")
+    args = parser.parse_args()
+    diretorio = os.path.expanduser(args.diretorio)
+    if not os.path.isdir(diretorio):
+        parser.error(f"{diretorio} não existe")
+    turnos = tuple(t.strip() for t in args.turnos.split(","))
+    if not all(len(t.split(":")) == 2 and all(p.isdigit() for p in t.split(":")) for t in turnos):
+        parser.error("--turnos espera HH:MM separados por vírgula")
+    inicio = time.perf_counter()
+    ledger, lidas = atualizar(diretorio, args.velocidade, args.temp_motor, turnos, args.lacuna, args.ledger)
+    print(f"{len(ledger['corridas'])} gravações, {lidas} amostras novas lidas"
+          f" em {time.perf_counter() - inicio:.2f} s")
+    print(relatorio(ledger, args.por, args.corridas, args.diametro, args.densidade, args.garrafa))
+
+
+if __name__ == "__main__":
+    main()
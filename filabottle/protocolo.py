@@ -0,0 +1,110 @@
+"""Protocolo de telemetria do FilaBottle.
+
+O firmware fala dois dialetos de texto, um por cliente:
+
+    Temperatura: 123.45 °C                                  (cliente Tk)
+    DATA,temp,aquecedor,motor,sistema,vel,temp_alvo,temp_motor   (cliente Kivy)
+
+O Parser recebe os pedaços crus (bytes/memoryview) do jeito que saem da
+porta, junta num único bytearray reaproveitado e converte os campos direto
+dos bytes com float(), sem nunca decodificar o pedaço inteiro para str.
+"""
+import time
+from collections import namedtuple
+
+PREFIXO_TEMPERATURA = b"Temperatura:"
+PREFIXO_DATA = b"DATA,"
+# Resposta do FilaBottle_UNO a cada SET aplicado
+CONFIRMACAO = "Configurações atualizadas.".encode("utf-8")
+
+_CAMPOS = ("instante", "temperatura", "aquecedor", "motor", "sistema",
+           "velocidade", "temp_alvo", "temp_motor")
+
+
+class Amostra(namedtuple("Amostra", _CAMPOS, defaults=(None,) * 6)):
+    """Uma leitura do Arduino. Campos ausentes no dialeto recebido ficam None.
+
+    Sem __dict__ por instância: os campos moram na própria tupla.
+    """
+    __slots__ = ()
+
+
+# Cria a Amostra direto da tupla, sem passar pelo __new__ gerado em Python
+_nova_amostra = tuple.__new__
+
+
+class Parser:
+    """Quebra o fluxo da serial em linhas e devolve as amostras reconhecidas.
+
+    Linhas que não são telemetria (ex.: "Aquecedor LIGADO...") são contadas
+    em `ignoradas`; linhas de telemetria mal formadas contam em `falhas`;
+    respostas de SET aplicado contam em `confirmacoes`.
+    """
+
+    def __init__(self, tamanho_max_linha=256):
+        self.tamanho_max_linha = tamanho_max_linha
+        self._buffer = bytearray()
+        self.linhas = 0
+        self.falhas = 0
+        self.ignoradas = 0
+        self.confirmacoes = 0
+
+    @property
+    def pendentes(self):
+        """Bytes de uma linha que ainda não terminou."""
+        return len(self._buffer)
+
+    def limpar(self):
+        del self._buffer[:]
+
+    def alimentar(self, dados, instante=None):
+        """Processa um pedaço cru da serial e retorna a lista de Amostras completas."""
+        buf = self._buffer
+        buf += dados
+        fim = buf.rfind(b"\n")
+        if fim < 0:
+            # Lixo sem quebra de linha não pode crescer para sempre
+            if len(buf) > self.tamanho_max_linha:
+                del buf[:]
+                self.falhas += 1
+            return []
+
+        if instante is None:
+            instante = time.monotonic()
+        # Uma única cópia para bytes: bytes.split é bem mais barato que bytearray.split
+        with memoryview(buf) as visao:
+            linhas = bytes(visao[:fim]).split(b"\n")
+        del buf[:fim + 1]
+        self.linhas += len(linhas)
+
+        amostras = []
+        anexar = amostras.append
+        falhas = 0
+        ignoradas = 0
+        for linha in linhas:
+            if linha.startswith(PREFIXO_DATA):
+                campos = linha.split(b",")
+                if len(campos) != 8:
+                    falhas += 1
+                    continue
+                try:
+                    anexar(_nova_amostra(Amostra, (
+                        instante, float(campos[1]),
+                        campos[2] == b"1", campos[3] == b"1", campos[4] == b"1",
+                        float(campos[5]), float(campos[6]), float(campos[7]))))
+                except ValueError:
+                    falhas += 1
+            elif linha.startswith(PREFIXO_TEMPERATURA):
+                # b"Temperatura: 123.45 \xc2\xb0C" -> b"123.45"
+                campos = linha.split(None, 2)
+                try:
+                    anexar(_nova_amostra(Amostra, (instante, float(campos[1]), None, None, None, None, None, None)))
+                except (ValueError, IndexError):
+                    falhas += 1
+            elif linha.startswith(CONFIRMACAO):
+                self.confirmacoes += 1
+            else:
+                ignoradas += 1
+        self.falhas += falhas
+        self.ignoradas += ignoradas
+        return amostras
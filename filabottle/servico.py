@@ -0,0 +1,301 @@
+"""Serviço sem interface que é dono da porta serial e distribui a telemetria.
+
+    python -m filabottle.servico --porta /dev/ttyUSB0 [--tcp 127.0.0.1:8765] [--unix /tmp/filabottle.sock]
+
+Um único leitor fala com o Arduino (com negociação do modo binário, fila de
+comandos e, opcionalmente, gravação) e qualquer número de clientes assina a
+telemetria. Para o assinante, cada mensagem é uma linha JSON:
+
+    {"tipo": "amostra", "temperatura": 231.5, "aquecedor": true, ...}
+    {"tipo": "estado", "modo": "binario", "confirmacoes": 3, ...}   (1 por segundo)
+
+e o que o assinante escreve são as mesmas linhas de comando da serial
+("SET,40,260,180", "SET_TEMP,120.00"...), que entram na fila de comandos do
+serviço. Um assinante lento nunca segura o leitor: se o buffer de saída dele
+passa de `LIMITE_BUFFER`, as amostras seguintes são puladas para ele.
+
+Se a serial cai (cabo USB, reset do Arduino), o serviço continua no ar e
+reabre a porta com espera exponencial, procurando o mesmo dispositivo por
+VID/PID/série caso ele volte com outro nome. Comandos que chegam durante
+a queda são descartados.
+
+O lado do cliente (ConexaoServico e ParserAssinante) fica em
+filabottle.conexao, que não importa asyncio.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from filabottle.anomalias import Detector
+from filabottle.binario import BAUD_BINARIO, BAUD_TEXTO, ProtocoloAutomatico
+from filabottle.captura import abrir_porta, nova_captura
+from filabottle.comandos import FilaComandos
+from filabottle.conexao import ENDERECO_PADRAO
+from filabottle.descoberta import Descoberta, Reconexao
+from filabottle.metricas import Pipeline
+
+LIMITE_BUFFER = 64 * 1024
+# O detector roda numa tarefa própria com o que chegou desde o tique anterior,
+# fora do caminho de leitura (como no tique do Tk)
+TIQUE_DETECTOR = 0.2
+
+
+class Assinante:
+    __slots__ = ("escritor", "enviadas", "puladas")
+
+    def __init__(self, escritor):
+        self.escritor = escritor
+        self.enviadas = 0
+        self.puladas = 0
+
+
+class Servico:
+    def __init__(self, porta_serial, baud=BAUD_TEXTO, baud_binario=BAUD_BINARIO, gravador=None, captura=None):
+        self.porta_serial = porta_serial
+        self.baud = baud
+        self.baud_binario = baud_binario
+        self.gravador = gravador
+        self.captura = captura
+        self.arduino = None
+        self.parser = None
+        self.comandos = FilaComandos(self._escrever)
+        self.assinantes = set()
+        self.amostras = 0
+        self.descoberta = None
+        self.dispositivo = None
+        self.reconexao = Reconexao()
+        self.metricas = Pipeline()
+        self.metricas.comandos(self.comandos)
+        # O serviço roda sem ninguém olhando: emergência desliga o sistema (--sem-desligar evita)
+        self.detector = Detector(desligar=self._desligar)
+        self._a_detectar = []
+        self.publicar = self.metricas.registro.histograma(
+            "filabottle_etapa_segundos", "Duração de cada etapa do caminho serial -> tela", etapa="publicar")
+        self.metricas.registro.funcao("filabottle_assinantes", "Assinantes conectados", lambda: len(self.assinantes))
+        self.metricas.registro.funcao("filabottle_reconexoes_total", "Quedas da serial recuperadas",
+                                      lambda: len(self.reconexao.duracoes), tipo="counter")
+        self.metricas.registro.funcao("filabottle_tempo_parado_segundos_total", "Tempo sem serial somando as quedas",
+                                      lambda: self.reconexao.total, tipo="counter")
+
+    def _escrever(self, linha):
+        self.arduino.write((linha + "\n").encode())
+
+    def _desligar(self):
+        try:
+            self.comandos.enviar("SET_STATE", "SET_STATE,OFF")
+        except OSError:
+            pass  # a leitura percebe a queda; o reconectou() manda de novo
+
+    def _alarmes(self, alarmes):
+        for alarme in alarmes:
+            print(f"Alarme: {alarme.mensagem}")
+            self.metricas.alarme(alarme.tipo)
+            self._publicar(json.dumps({"tipo": "alarme", "alarme": alarme.tipo, "gravidade": alarme.gravidade,
+                                       "temperatura": alarme.temperatura, "mensagem": alarme.mensagem}).encode()
+                           + b"\n")
+
+    def _detectar(self):
+        if self._a_detectar:
+            amostras, self._a_detectar = self._a_detectar, []
+            self._alarmes(self.detector.alimentar(amostras))
+
+    async def _detectar_periodicamente(self):
+        while True:
+            await asyncio.sleep(TIQUE_DETECTOR)
+            self._detectar()
+
+    def _abrir(self):
+        self.arduino = abrir_porta(self.porta_serial, self.baud, timeout=0.1, captura=self.captura)
+        self.parser = ProtocoloAutomatico(self.arduino, self.baud_binario)
+
+    async def _reconectar(self):
+        self.arduino.close()
+        self.reconexao.iniciar()
+        print(f"Serial {self.porta_serial} caiu; reconectando")
+        while True:
+            await asyncio.sleep(self.reconexao.espera())
+            porta = self.descoberta.localizar(self.dispositivo, self.porta_serial)
+            if porta:
+                try:
+                    self.porta_serial = porta
+                    self._abrir()
+                    break
+                except OSError:
+                    pass
+            self.reconexao.falhou()
+        duracao = self.reconexao.conseguiu()
+        self.comandos.limpar()
+        self._detectar()  # o que chegou antes da queda ainda é da janela anterior
+        self.detector.reconectou()
+        if self.gravador:
+            try:
+                self.gravador.anotar_queda(self.reconexao.inicio, duracao)
+            except OSError as e:
+                print(f"Erro na gravação: {e}")
+                self.metricas.erro("gravacao")
+        print(f"Reconectado a {self.porta_serial} em {duracao:.1f} s")
+
+    async def _ler_serial(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            porta = self.arduino
+            try:
+                # pyserial não é assíncrono: a leitura bloqueante roda no executor
+                dados = await loop.run_in_executor(None, lambda: porta.read(max(1, porta.in_waiting)))
+            except OSError:  # SerialException herda de OSError
+                self.metricas.erro("leitura")
+                await self._reconectar()
+                continue
+            agora = time.monotonic()
+            amostras = self.metricas.alimentar(self.parser, dados, agora)
+            self.comandos.observar(amostras, self.parser.confirmacoes, agora)
+            self.comandos.bombear(agora)
+            if not amostras:
+                continue
+            self.amostras += len(amostras)
+            if self.gravador:
+                try:
+                    self.gravador.anexar(amostras)
+                except OSError as e:  # disco cheio etc.: perde a gravação, não a leitura
+                    print(f"Erro na gravação: {e}")
+                    self.metricas.erro("gravacao")
+            inicio = time.perf_counter()
+            self._publicar(b"".join(_linha_amostra(a) for a in amostras))
+            self.publicar.observar(time.perf_counter() - inicio)
+            self._a_detectar.extend(amostras)
+
+    def _publicar(self, dados):
+        for assinante in self.assinantes:
+            transporte = assinante.escritor.transport
+            if transporte.is_closing():
+                continue
+            if transporte.get_write_buffer_size() > LIMITE_BUFFER:
+                assinante.puladas += 1
+                continue
+            assinante.escritor.write(dados)
+            assinante.enviadas += 1
+
+    def estado(self):
+        return {
+            "tipo": "estado",
+            "modo": self.parser.modo if self.parser else None,
+            "amostras": self.amostras,
+            "falhas": self.parser.falhas if self.parser else 0,
+            "confirmacoes": self.parser.confirmacoes if self.parser else 0,
+            "comandos_enviados": self.comandos.enviados,
+            "comandos_agrupados": self.comandos.coalescidos,
+            "assinantes": len(self.assinantes),
+            "conectado": not self.reconexao.ativa,
+            "reconexoes": len(self.reconexao.duracoes),
+            "tempo_parado": round(self.reconexao.total, 3),
+            "alarmes": [a.mensagem for a in self.detector.ativos.values()],
+        }
+
+    async def _anunciar_estado(self):
+        while True:
+            await asyncio.sleep(1.0)
+            if not self.reconexao.ativa:
+                self._alarmes(self.detector.verificar(time.monotonic()))
+            self._publicar(json.dumps(self.estado()).encode() + b"\n")
+
+    async def _atender(self, leitor, escritor):
+        assinante = Assinante(escritor)
+        self.assinantes.add(assinante)
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                comando = linha.decode("utf-8", "replace").strip()
+                if comando and self.reconexao.ativa:
+                    print(f"Comando descartado durante a queda: {comando}")
+                    self.metricas.erro("comando")
+                elif comando:
+                    # A chave é o nome do comando: SET_TEMP repetido substitui o anterior
+                    try:
+                        self.comandos.enviar(comando.split(",", 1)[0], comando)
+                    except OSError:
+                        pass  # a leitura percebe a queda e reconecta
+        except ConnectionError:
+            pass
+        finally:
+            self.assinantes.discard(assinante)
+            escritor.close()
+
+    async def executar(self, tcp=None, unix=None):
+        self._abrir()
+        self.descoberta = Descoberta()
+        self.descoberta.start()
+        await asyncio.get_running_loop().run_in_executor(None, self.descoberta.pronta.wait, 5.0)
+        self.dispositivo = self.descoberta.identidade(self.porta_serial)
+        servidores = []
+        if tcp:
+            host, _, porta = tcp.rpartition(":")
+            servidores.append(await asyncio.start_server(self._atender, host or "127.0.0.1", int(porta)))
+        if unix:
+            if os.path.exists(unix):
+                os.remove(unix)
+            servidores.append(await asyncio.start_unix_server(self._atender, unix))
+        try:
+            await asyncio.gather(self._ler_serial(), self._anunciar_estado(), self._detectar_periodicamente(),
+                                 *(s.serve_forever() for s in servidores))
+        finally:
+            for s in servidores:
+                s.close()
+            self.descoberta.parar()
+            self.arduino.close()
+            if self.gravador:
+                self.gravador.fechar()
+            if self.captura:
+                self.captura.fechar()
+
+
+def _linha_amostra(amostra):
+    campos = amostra._asdict()
+    del campos["instante"]  # o relógio do assinante pode ser outro
+    campos["tipo"] = "amostra"
+    return json.dumps(campos).encode() + b"\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--porta", required=True, help="porta serial do Arduino (ou replay:arquivo.fbcap[@100|@max])")
+    parser.add_argument("--baud", type=int, default=BAUD_TEXTO)
+    parser.add_argument("--baud-binario", type=int, default=BAUD_BINARIO,
+                        help="velocidade pedida no modo binário (0 desliga)")
+    parser.add_argument("--tcp", default=ENDERECO_PADRAO[len("tcp://"):], help="host:porta ('' desliga)")
+    parser.add_argument("--unix", help="caminho de um socket Unix")
+    parser.add_argument("--gravar", metavar="DIRETORIO", help="grava a telemetria (requer NumPy)")
+    parser.add_argument("--captura", metavar="DIRETORIO", help="grava os bytes crus da serial (ver filabottle.captura)")
+    parser.add_argument("--temp-alvo", type=float, default=260.0,
+                        help="alvo para os alarmes quando a telemetria não traz o ajuste (dialeto de texto)")
+    parser.add_argument("--sem-desligar", action="store_true",
+                        help="alarmes de emergência só avisam, sem mandar SET_STATE,OFF")
+    parser.add_argument("--metricas", type=int, metavar="PORTA", help="serve as métricas em http://127.0.0.1:PORTA/metrics")
+    parser.add_argument("--metricas-arquivo", metavar="CAMINHO", help="grava as métricas (formato Prometheus) a cada 10 s")
+    args = parser.parse_args()
+
+    gravador = None
+    if args.gravar:
+        from filabottle.gravador import Gravador
+        gravador = Gravador(args.gravar)
+    captura = nova_captura(args.captura) if args.captura else None
+    servico = Servico(args.porta, args.baud, args.baud_binario, gravador, captura)
+    servico.detector.temp_alvo = args.temp_alvo
+    if args.sem_desligar:
+        servico.detector.desligar = None
+    if args.metricas:
+        servico.metricas.servir(args.metricas)
+    if args.metricas_arquivo:
+        servico.metricas.gravar_periodicamente(args.metricas_arquivo)
+    print(f"Serviço lendo {args.porta}; assinantes em {args.tcp or '-'} {args.unix or ''}")
+    try:
+        asyncio.run(servico.executar(args.tcp, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,452 @@
+"""Simulador do Arduino numa pty, para testar e medir os clientes sem hardware.
+
+    python -m filabottle.simulador --dialeto uno --taxa 1000 --link /tmp/filabottle
+    python -m filabottle.simulador --dialeto kivy --carga 10
+
+Fala os dois dialetos de firmware:
+
+    uno   SET,vel,tmax,tmotor, CFG, SET_STATE, SET_HEATER e BIN,<baud>  ->  "Temperatura: X °C" (ou quadros binários)
+    kivy  SET_TEMP, SET_MOTOR_TEMP, SET_VEL, SET_STATE, SET_HEATER, SET_MOTOR  ->  DATA,...
+
+O hotend é um modelo térmico de primeira ordem sob a mesma histerese do
+controlarRele (liga em alvo - 5, desliga no alvo) e o motor segue o
+controlarMotor (só gira acima de TEMP_MIN_MOTOR); `tau_sensor` dá ao
+termistor o atraso que um hotend de verdade tem. Falhas podem ser
+injetadas: lixo na linha, linhas cortadas ao meio e desconexões.
+"""
+import abc
+import argparse
+import collections
+import os
+import random
+import threading
+import time
+import tty
+
+from filabottle import binario
+
+TEMPERATURA_AMBIENTE = 25.0
+
+
+class ModeloTermico:
+    """Hotend de primeira ordem: tende a `temp_regime` com o aquecedor ligado e ao ambiente sem ele.
+
+    Com `tau_sensor` o termistor segue o bloco com atraso de primeira ordem.
+    """
+
+    def __init__(self, temperatura=TEMPERATURA_AMBIENTE, temp_regime=400.0, tau=150.0, ruido=0.1, tau_sensor=0.0):
+        self.temperatura = temperatura
+        self.temp_regime = temp_regime
+        self.tau = tau
+        self.ruido = ruido
+        self.tau_sensor = tau_sensor
+        self.sensor = temperatura
+
+    def passo(self, dt, aquecedor):
+        alvo = self.temp_regime if aquecedor else TEMPERATURA_AMBIENTE
+        self.temperatura += (alvo - self.temperatura) * min(dt / self.tau, 1.0)
+        if self.tau_sensor:
+            self.sensor += (self.temperatura - self.sensor) * min(dt / self.tau_sensor, 1.0)
+        else:
+            self.sensor = self.temperatura
+
+    def leitura(self):
+        return self.sensor + random.gauss(0.0, self.ruido) if self.ruido else self.sensor
+
+
+class Firmware(abc.ABC):
+    """Estado comum aos dois firmwares: ajustes, relé e motor."""
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self.velocidade = 40.0
+        self.temp_alvo = 260.0
+        self.temp_motor = 180.0
+        self.aquecedor = False
+        self.motor = False
+        self.aquecedor_habilitado = True
+        self.motor_habilitado = True
+        self.sistema = True
+        self.binario = False
+        self.seq = 0
+
+    def controlar(self, temperatura):
+        """controlarRele + controlarMotor. Retorna as mensagens de log do relé."""
+        mensagens = []
+        if not self.aquecedor_habilitado:
+            self.aquecedor = False
+        elif not self.aquecedor and temperatura <= self.temp_alvo - 5:
+            self.aquecedor = True
+            mensagens.append("Aquecedor LIGADO: Temperatura abaixo do mínimo.")
+        elif self.aquecedor and temperatura >= self.temp_alvo:
+            self.aquecedor = False
+            mensagens.append("Aquecedor DESLIGADO: Temperatura acima do máximo.")
+        self.motor = self.motor_habilitado and temperatura >= self.temp_motor
+        return mensagens
+
+    @abc.abstractmethod
+    def comando(self, linha):
+        """Trata uma linha recebida e devolve os bytes da resposta."""
+
+    @abc.abstractmethod
+    def telemetria(self, temperatura, marca=None):
+        """Os bytes de uma leitura no formato do dialeto."""
+
+    def log(self, mensagem):
+        return b"" if self.binario else mensagem.encode("utf-8") + b"\r\n"
+
+
+class FirmwareUno(Firmware):
+    """O FilaBottle_UNO.ino deste repositório."""
+
+    WATCHDOG_HOST = 2.0
+    LIMITE_HOST = 10.0
+    INTERVALO_CONTROLE_MS = 500
+    INTERVALO_TEXTO_MS = 500
+    INTERVALO_BINARIO_MS = 50
+
+    def __init__(self, modelo):
+        super().__init__(modelo)
+        self.host = None  # SET_HEATER: None = histerese, True/False = relé comandado pelo host
+        self.ultimo_host = 0.0
+        self.relogio = time.monotonic  # trocado por um relógio virtual nas simulações sem pty
+        self.gravacoes_eeprom = 0  # salvarConfiguracoes com algum valor mudado
+        self.ultimo_controle = self.ultima_telemetria = 0
+        self.passos = 0  # passos do motor dados pelo loop()
+        self.quadros = 0  # telemetrias mandadas pelo loop()
+
+    def loop(self, millis, temperatura):
+        """Uma volta do loop() do .ino, com os seus dois timers; devolve o que sai na serial.
+
+        `millis` é o millis() do Arduino (inteiro). Relé e motor a cada
+        INTERVALO_CONTROLE_MS (o controlarMotor dá no máximo um passo por vez),
+        telemetria no intervalo do modo. O Simulador emite à `taxa` pedida;
+        isto é para conferir a cadência do firmware.
+        """
+        saida = b""
+        if millis - self.ultimo_controle >= self.INTERVALO_CONTROLE_MS:
+            self.ultimo_controle = millis
+            for mensagem in self.controlar(temperatura):
+                saida += self.log(mensagem)
+            self.passos += self.motor
+        if millis - self.ultima_telemetria >= (self.INTERVALO_BINARIO_MS if self.binario else self.INTERVALO_TEXTO_MS):
+            self.ultima_telemetria = millis
+            if temperatura != -1:
+                saida += self.telemetria(temperatura)
+                self.quadros += 1
+        return saida
+
+    def controlar(self, temperatura):
+        if self.host is not None and self.relogio() - self.ultimo_host > self.WATCHDOG_HOST:
+            self.host = None
+        if temperatura == -1:  # termistor solto: o relé do host desliga, a histerese não mexe
+            if self.host is not None and self.sistema:
+                self.aquecedor = False
+            return []
+        if self.host is None or not self.sistema:
+            return super().controlar(temperatura)
+        self.aquecedor = self.host and temperatura < self.temp_alvo + self.LIMITE_HOST
+        self.motor = self.motor_habilitado and temperatura >= self.temp_motor
+        return []
+
+    def comando(self, linha):
+        if linha.startswith("BIN,"):
+            baud = int(linha[4:] or 0)
+            if baud in (19200, 38400, 57600, 115200, 250000, 500000, 1000000):
+                resposta = f"BIN,OK,{baud}\r\n".encode()
+                self.binario = True
+                return resposta
+            return b"BIN,ERRO\r\n"
+        if linha.startswith("SET_HEATER,"):
+            self.host = None if linha.endswith(",AUTO") else linha.endswith(",ON")
+            self.ultimo_host = self.relogio()
+            return b""
+        if linha.startswith("CFG,"):
+            valores = {"VEL": self.velocidade, "TMAX": self.temp_alvo, "TMOTOR": self.temp_motor}
+            try:
+                for par in filter(None, linha[4:].split(",")):
+                    chave, valor = par.split("=")
+                    if chave not in valores:
+                        raise ValueError(chave)
+                    valores[chave] = float(valor)
+            except ValueError:
+                valores = None
+            if (valores is None or not 1 <= valores["VEL"] <= 100 or not 100 <= valores["TMAX"] <= 300
+                    or not 100 <= valores["TMOTOR"] <= 300):
+                return b"" if self.binario else b"CFG,ERRO\r\n"
+            self._aplicar(valores["VEL"], valores["TMAX"], valores["TMOTOR"])
+            return self._confirmar()
+        if linha.startswith("SET_STATE,"):
+            self.sistema = self.aquecedor_habilitado = self.motor_habilitado = linha.endswith(",ON")
+            return self._confirmar()
+        if linha.startswith("SET"):
+            partes = linha.split(",")
+            if len(partes) == 4:
+                self._aplicar(*(float(p) for p in partes[1:]))
+                return self._confirmar()
+        return b""
+
+    def _aplicar(self, velocidade, temp_alvo, temp_motor):
+        if (velocidade, temp_alvo, temp_motor) != (self.velocidade, self.temp_alvo, self.temp_motor):
+            self.gravacoes_eeprom += 1
+        self.velocidade, self.temp_alvo, self.temp_motor = velocidade, temp_alvo, temp_motor
+
+    def _confirmar(self):
+        if self.binario:
+            self.seq += 1
+            return binario.empacotar(binario.CONFIRMACAO.pack(binario.QUADRO_CONFIRMACAO, self.seq & 0xFF))
+        return "Configurações atualizadas.\r\n".encode("utf-8")
+
+    def telemetria(self, temperatura, marca=None):
+        self.seq += 1
+        if self.binario:
+            return binario.quadro_telemetria(self.seq, int(time.monotonic() * 1000), temperatura,
+                                             self.aquecedor, self.motor, self.sistema,
+                                             self.velocidade if marca is None else marca,
+                                             self.temp_alvo, self.temp_motor)
+        return f"Temperatura: {temperatura:.2f} °C\r\n".encode("utf-8")
+
+
+class FirmwareKivy(Firmware):
+    """O firmware que o cliente Android espera (linhas DATA e comandos SET_*)."""
+
+    def __init__(self, modelo):
+        super().__init__(modelo)
+        self.sistema = False
+        self.aquecedor_habilitado = False
+        self.motor_habilitado = False
+        self.temp_alvo = 120.0
+        self.temp_motor = 90.0
+
+    def comando(self, linha):
+        nome, _, valor = linha.partition(",")
+        ligar = valor == "ON"
+        if nome == "SET_TEMP":
+            self.temp_alvo = float(valor)
+        elif nome == "SET_MOTOR_TEMP":
+            self.temp_motor = float(valor)
+        elif nome == "SET_VEL":
+            self.velocidade = float(valor)
+        elif nome == "SET_STATE":
+            self.sistema = self.aquecedor_habilitado = self.motor_habilitado = ligar
+        elif nome == "SET_HEATER":
+            self.aquecedor_habilitado = ligar
+        elif nome == "SET_MOTOR":
+            self.motor_habilitado = ligar
+        return b""
+
+    def telemetria(self, temperatura, marca=None):
+        self.seq += 1
+        velocidade = self.velocidade if marca is None else marca
+        return (f"DATA,{temperatura:.2f},{int(self.aquecedor)},{int(self.motor)},{int(self.sistema)},"
+                f"{velocidade:.2f},{self.temp_alvo:.2f},{self.temp_motor:.2f}\r\n").encode()
+
+
+FIRMWARES = {"uno": FirmwareUno, "kivy": FirmwareKivy}
+
+
+class Simulador(threading.Thread):
+    """Roda o firmware escolhido numa pty.
+
+    `porta` é o caminho que o cliente abre. Com `link`, um symlink estável
+    aponta para a pty atual, inclusive depois das desconexões simuladas.
+    Com `marcar`, o campo velocidade leva o número da linha, para a carga
+    medir perda e latência.
+    """
+
+    def __init__(self, dialeto="uno", taxa=2.0, acelerar=1.0, lixo=0.0, parcial=0.0,
+                 desconectar=None, pausa=1.0, link=None, marcar=False, modelo=None, semente=None):
+        super().__init__(daemon=True)
+        if semente is not None:
+            random.seed(semente)
+        self.modelo = modelo or ModeloTermico()
+        self.firmware = FIRMWARES[dialeto](self.modelo)
+        self.taxa = taxa
+        self.acelerar = acelerar
+        self.lixo = lixo
+        self.parcial = parcial
+        self.desconectar = desconectar
+        self.pausa = pausa
+        self.link = link
+        self.marcar = marcar
+        self.emitidas = 0
+        self.descartadas = 0  # linhas que não couberam no buffer da pty
+        self.desconexoes = 0
+        self.comandos = 0
+        self.emissoes = collections.deque(maxlen=1 << 20)  # instante de cada linha marcada
+        self._parar = threading.Event()
+        self._mestre = None
+        self.porta = None
+        self._abrir()
+
+    def _abrir(self):
+        mestre, escravo = os.openpty()
+        tty.setraw(mestre)
+        tty.setraw(escravo)
+        os.set_blocking(mestre, False)
+        self._mestre = mestre
+        self._escravo = escravo
+        self.porta = os.ttyname(escravo)
+        if self.link:
+            temporario = self.link + ".tmp"
+            if os.path.lexists(temporario):
+                os.remove(temporario)
+            os.symlink(self.porta, temporario)
+            os.replace(temporario, self.link)
+
+    def _fechar(self):
+        for fd in (self._mestre, self._escravo):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self._mestre = None
+
+    def parar(self):
+        self._parar.set()
+
+    def _escrever(self, dados):
+        try:
+            os.write(self._mestre, dados)
+            return True
+        except (BlockingIOError, OSError):
+            return False
+
+    def run(self):
+        pendente = b""
+        anterior = inicio = time.monotonic()
+        proxima_queda = inicio + self.desconectar if self.desconectar else None
+        while not self._parar.is_set():
+            agora = time.monotonic()
+            if proxima_queda and agora >= proxima_queda:
+                self._fechar()
+                self.desconexoes += 1
+                if self._parar.wait(self.pausa):
+                    break
+                self._abrir()
+                agora = anterior = inicio = time.monotonic()
+                self.emitidas = 0
+                proxima_queda = agora + self.desconectar
+
+            try:
+                pendente += os.read(self._mestre, 4096)
+            except (BlockingIOError, OSError):
+                pass
+            saida = bytearray()
+            while b"\n" in pendente:
+                linha, pendente = pendente.split(b"\n", 1)
+                self.comandos += 1
+                try:
+                    saida += self.firmware.comando(linha.decode("utf-8").strip())
+                except ValueError:
+                    pass
+
+            self.modelo.passo((agora - anterior) * self.acelerar, self.firmware.aquecedor)
+            anterior = agora
+            temperatura = self.modelo.leitura()
+            for mensagem in self.firmware.controlar(temperatura):
+                saida += self.firmware.log(mensagem)
+
+            devidas = int((agora - inicio) * self.taxa) - self.emitidas
+            no_lote = 0
+            for _ in range(max(devidas, 0)):
+                marca = None
+                if self.marcar:
+                    marca = float(len(self.emissoes))
+                    self.emissoes.append(agora)
+                linha = self.firmware.telemetria(temperatura, marca)
+                if self.lixo and random.random() < self.lixo:
+                    saida += bytes(random.getrandbits(8) for _ in range(random.randint(1, 16)))
+                self.emitidas += 1
+                no_lote += 1
+                if self.parcial and random.random() < self.parcial:
+                    # Metade da linha agora, o resto depois de uma pausa
+                    corte = len(linha) // 2
+                    saida += linha[:corte]
+                    if not self._escrever(bytes(saida)):
+                        self.descartadas += no_lote
+                    time.sleep(0.002)
+                    saida = bytearray(linha[corte:])
+                    no_lote = 1
+                else:
+                    saida += linha
+            if saida and not self._escrever(bytes(saida)):
+                self.descartadas += no_lote
+            time.sleep(0.001)
+        self._fechar()
+
+
+def carga(simulador, segundos, tamanho_leitura=4096):
+    """Lê a pty como os clientes (read em bloco + Parser) e mede vazão, perda e latência."""
+    from filabottle.protocolo import Parser
+
+    fd = os.open(simulador.porta, os.O_RDWR | os.O_NOCTTY)
+    tty.setraw(fd)
+    parser = Parser()
+    latencias = []
+    recebidas = 0
+    fim = time.monotonic() + segundos
+    simulador.start()
+    try:
+        while time.monotonic() < fim:
+            dados = os.read(fd, tamanho_leitura)
+            for amostra in parser.alimentar(dados):
+                recebidas += 1
+                if amostra.velocidade is not None and 0 <= amostra.velocidade < len(simulador.emissoes):
+                    latencias.append(amostra.instante - simulador.emissoes[int(amostra.velocidade)])
+    finally:
+        simulador.parar()
+        simulador.join()
+        os.close(fd)
+    latencias.sort()
+    emitidas = simulador.emitidas
+    print(f"{segundos:.0f} s a {simulador.taxa:.0f} linhas/s:")
+    print(f"  emitidas {emitidas}, recebidas {recebidas}, perdidas {max(emitidas - recebidas, 0)}"
+          f" ({parser.falhas} falhas de parse, {parser.ignoradas} linhas irreconhecíveis,"
+          f" {simulador.descartadas} descartadas na pty)")
+    print(f"  vazão {recebidas / segundos:,.0f} amostras/s")
+    if latencias:
+        print(f"  latência p50 {latencias[len(latencias) // 2] * 1000:.2f} ms,"
+              f" p99 {latencias[int(len(latencias) * 0.99)] * 1000:.2f} ms,"
+              f" máx {latencias[-1] * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dialeto", choices=sorted(FIRMWARES), default="uno")
+    parser.add_argument("--taxa", type=float, default=2.0, help="linhas de telemetria por segundo")
+    parser.add_argument("--acelerar", type=float, default=1.0, help="multiplica o tempo do modelo térmico")
+    parser.add_argument("--lixo", type=float, default=0.0, help="probabilidade de bytes aleatórios por linha")
+    parser.add_argument("--parcial", type=float, default=0.0, help="probabilidade de cortar uma linha ao meio")
+    parser.add_argument("--desconectar", type=float, help="derruba a pty a cada N segundos")
+    parser.add_argument("--pausa", type=float, default=1.0, help="segundos desconectado")
+    parser.add_argument("--link", help="symlink estável para a pty atual")
+    parser.add_argument("--carga", type=float, metavar="SEGUNDOS",
+                        help="mede vazão, perda e latência lendo a própria pty")
+    parser.add_argument("--semente", type=int)
+    args = parser.parse_args()
+
+    simulador = Simulador(args.dialeto, args.taxa, args.acelerar, args.lixo, args.parcial,
+                          args.desconectar, args.pausa, args.link, marcar=bool(args.carga),
+                          semente=args.semente)
+    if args.carga:
+        if args.dialeto == "uno":
+            parser.error("--carga precisa do dialeto kivy (a marca vai no campo velocidade)")
+        carga(simulador, args.carga)
+        return
+
+    print(f"Simulador ({args.dialeto}) em {args.link or simulador.porta}. Ctrl+C para sair.")
+    simulador.start()
+    try:
+        while simulador.is_alive():
+            time.sleep(5)
+            print(f"{simulador.modelo.temperatura:7.2f} °C  aquecedor={int(simulador.firmware.aquecedor)}"
+                  f"  motor={int(simulador.firmware.motor)}  emitidas={simulador.emitidas}"
+                  f"  comandos={simulador.comandos}  quedas={simulador.desconexoes}")
+    except KeyboardInterrupt:
+        simulador.parar()
+        simulador.join()
+
+
+if __name__ == "__main__":
+    main()
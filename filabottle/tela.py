@@ -0,0 +1,74 @@
+"""Camada de desenho dos clientes: só toca nos widgets cujo valor mudou.
+
+A Tela (usada pelo cliente Tk) guarda o último valor desenhado de cada
+chave. `definir` não toca no widget: só anota a mudança (a última de cada
+chave no mesmo quadro vence) e `desenhar` aplica todas de uma vez, no fim
+do tique. Valor igual ao já desenhado não custa nada além da comparação.
+O app Kivy não precisa dela: o Kivy já junta as mudanças num redesenho por
+quadro, e lá a update_ui compara o estado por grupo, que sai mais barato.
+
+A cor da temperatura sai de tabelas prontas (hex para o Tk, RGBA para o
+Kivy) indexadas por `indice_cor`, em vez de montar a string a cada amostra.
+"""
+
+# Abaixo disto o display fica verde; cada °C acima soma 4 ao vermelho
+TEMP_VERDE = 36.0
+PASSOS_COR = 256
+
+
+def _rampa(i):
+    return i, 255 - i, 0
+
+
+COR_HEX = tuple("#{:02x}{:02x}{:02x}".format(*_rampa(i)) for i in range(PASSOS_COR))
+COR_RGBA = tuple((r / 255, g / 255, b / 255, 1.0) for r, g, b in map(_rampa, range(PASSOS_COR)))
+
+
+def indice_cor(temperatura):
+    """Índice em COR_HEX/COR_RGBA: 0 (verde) até 36 °C, 255 (vermelho) a partir de ~100 °C."""
+    if temperatura <= TEMP_VERDE:
+        return 0
+    return min(int((temperatura - TEMP_VERDE) * 4), PASSOS_COR - 1)
+
+
+_NADA = object()
+
+
+class Tela:
+    """Último estado desenhado e as mudanças do quadro atual."""
+
+    def __init__(self):
+        self._desenhado = {}
+        self._pendente = {}
+        self.aplicadas = 0  # widgets tocados desde o início
+
+    def definir(self, chave, valor, aplicar):
+        """Agenda `aplicar(valor)` para o próximo quadro se `valor` difere do desenhado."""
+        if self._desenhado.get(chave, _NADA) == valor:
+            if self._pendente:
+                self._pendente.pop(chave, None)  # voltou ao que está na tela antes do quadro
+            return
+        self._pendente[chave] = (valor, aplicar)
+
+    @property
+    def pendentes(self):
+        return len(self._pendente)
+
+    def desenhar(self):
+        """Aplica as mudanças do quadro. Devolve quantos widgets foram tocados.
+
+        Uma chave só conta como desenhada depois que `aplicar` volta sem
+        exceção: um valor que falhou é tentado de novo no próximo `definir`.
+        """
+        if not self._pendente:
+            return 0
+        pendentes, self._pendente = self._pendente, {}
+        for chave, (valor, aplicar) in pendentes.items():
+            aplicar(valor)
+            self._desenhado[chave] = valor
+        self.aplicadas += len(pendentes)
+        return len(pendentes)
+
+    def esquecer(self):
+        """Esquece o que foi desenhado (ex.: widgets recriados): tudo é redesenhado."""
+        self._desenhado.clear()